@@ -0,0 +1,190 @@
+import os
+import math
+import time
+import threading
+from urllib.parse import parse_qs
+
+# Controllo di ammissione a corsie (lane) per classe di richiesta.
+#
+# Ogni richiesta viene classificata in una corsia con concorrenza massima, coda limitata e attesa
+# massima propria:
+#   - cheap:  ping, header, grafici, metriche, pagine e asset statici
+#   - normal: liste eventi paginate, ricerca, riepilogo nodo, stato export, ...
+#   - heavy:  liste con limit grande, bootstrap, upload, export, download, re-ingestione
+# Le richieste pesanti non possono quindi occupare i thread che servono /api/ping: oltre la coda
+# (o oltre l'attesa massima) la risposta e' 429 con Retry-After stimato dai tempi di servizio.
+#
+# Configurazione: DW_LANE_<NOME>="concorrenza,coda,attesa_s" (es. DW_LANE_HEAVY="2,16,30"),
+# DW_HEAVY_LIMIT soglia di limit oltre cui una lista e' pesante, DW_ADMISSION=0 disattiva.
+
+ADMISSION_ENABLED = os.environ.get('DW_ADMISSION', '1') != '0'
+HEAVY_LIMIT = int(os.environ.get('DW_HEAVY_LIMIT', '2000'))
+
+DEFAULT_LANES = {
+    'cheap': (16, 256, 5.0),
+    'normal': (8, 64, 10.0),
+    'heavy': (2, 16, 30.0),
+}
+
+CHEAP_PATHS = {'/api/ping', '/api/stats/header', '/api/charts/summary', '/api/metrics'}
+HEAVY_PATHS = {'/api/bootstrap', '/api/files/upload', '/api/files/delete', '/api/admin/profile/ingest',
+               '/export/start', '/export/download'}
+LIMITED_PATHS = {'/api/lga', '/api/lge', '/api/lgd', '/api/lgd_metrics', '/api/search',
+                 '/api/history/lga', '/api/history/lge', '/api/history/lgd'}
+EXEMPT_PATHS = {'/api/events'}     # stream SSE di lunga durata: non occupano una corsia
+
+
+def lane_config(name, default):
+    raw = os.environ.get(f'DW_LANE_{name.upper()}', '')
+    if not raw:
+        return default
+    try:
+        conc, size, wait = [x.strip() for x in raw.split(',')]
+        return max(1, int(conc)), max(0, int(size)), max(0.0, float(wait))
+    except ValueError:
+        return default
+
+
+def classify(method, path, query=''):
+    """Corsia della richiesta ('cheap' | 'normal' | 'heavy') oppure None se esente."""
+    if method == 'OPTIONS' or path in EXEMPT_PATHS:
+        return None
+    if path in CHEAP_PATHS or path.startswith('/api/admin/profiles'):
+        return 'cheap'
+    if path in HEAVY_PATHS:
+        return 'heavy'
+    if path in LIMITED_PATHS:
+        try:
+            limit = int(parse_qs(query).get('limit', ['0'])[0] or 0)
+        except ValueError:
+            limit = 0
+        return 'heavy' if limit > HEAVY_LIMIT else 'normal'
+    if not path.startswith(('/api/', '/export/')):
+        return 'cheap'
+    return 'normal'
+
+
+class Lane:
+    """Corsia con concorrenza e coda limitate. I contatori sono condivisi tra l'attesa bloccante
+    (server threaded: acquire/release) e l'uso a passi dell'executor asyncio (enqueue/start/finish).
+    """
+
+    def __init__(self, name, concurrency, queue_size, max_wait):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.inflight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self._service_ewma = 0.0
+        self._cond = threading.Condition()
+
+    # --- uso a passi (executor dedicato alla corsia) ---------------------------------------
+
+    def enqueue(self):
+        """Prenota un posto in coda; False se la coda e' piena (richiesta da rifiutare)."""
+        with self._cond:
+            if self.waiting >= self.queue_size + max(0, self.concurrency - self.inflight):
+                self.rejected += 1
+                return False
+            self.waiting += 1
+            return True
+
+    def start(self, waited):
+        """Passaggio coda -> esecuzione; False se l'attesa ha superato max_wait."""
+        with self._cond:
+            self.waiting -= 1
+            if waited > self.max_wait:
+                self.timeouts += 1
+                self.rejected += 1
+                return False
+            self.inflight += 1
+            self.admitted += 1
+            self.wait_seconds += waited
+            return True
+
+    def finish(self, service_seconds):
+        with self._cond:
+            self.inflight -= 1
+            # media mobile esponenziale del tempo di servizio (per Retry-After)
+            a = 0.2
+            self._service_ewma = service_seconds if not self._service_ewma else \
+                (1 - a) * self._service_ewma + a * service_seconds
+            self._cond.notify()
+
+    # --- uso bloccante (un thread per richiesta) -------------------------------------------
+
+    def acquire(self):
+        """Attende un posto libero; ritorna i secondi attesi oppure None se la richiesta va rifiutata."""
+        t0 = time.perf_counter()
+        with self._cond:
+            if self.inflight < self.concurrency and not self.waiting:
+                self.inflight += 1
+                self.admitted += 1
+                return 0.0
+            if self.waiting >= self.queue_size:
+                self.rejected += 1
+                return None
+            self.waiting += 1
+            deadline = t0 + self.max_wait
+            while self.inflight >= self.concurrency:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    self.waiting -= 1
+                    self.timeouts += 1
+                    self.rejected += 1
+                    return None
+                self._cond.wait(remaining)
+            self.waiting -= 1
+            self.inflight += 1
+            self.admitted += 1
+            waited = time.perf_counter() - t0
+            self.wait_seconds += waited
+            return waited
+
+    def release(self, service_seconds):
+        self.finish(service_seconds)
+
+    # --- stato ---------------------------------------------------------------------------
+
+    def retry_after(self):
+        """Secondi suggeriti al client: tempo per smaltire la coda attuale (minimo 1)."""
+        with self._cond:
+            backlog = self.waiting + self.inflight + 1
+            est = self._service_ewma * backlog / max(1, self.concurrency)
+        return max(1, min(60, int(math.ceil(est))))
+
+    def stats(self):
+        with self._cond:
+            return {
+                'concurrency': self.concurrency,
+                'queueSize': self.queue_size,
+                'maxWaitSeconds': self.max_wait,
+                'inflight': self.inflight,
+                'waiting': self.waiting,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+                'avgWaitMs': round(1000.0 * self.wait_seconds / self.admitted, 2) if self.admitted else 0.0,
+                'avgServiceMs': round(1000.0 * self._service_ewma, 2),
+            }
+
+
+class Admission:
+    def __init__(self, lanes=None, enabled=ADMISSION_ENABLED):
+        self.enabled = enabled
+        cfg = lanes or {name: lane_config(name, d) for name, d in DEFAULT_LANES.items()}
+        self.lanes = {name: Lane(name, *c) for name, c in cfg.items()}
+
+    def lane_for(self, method, path, query=''):
+        if not self.enabled:
+            return None
+        name = classify(method, path, query)
+        return self.lanes.get(name) if name else None
+
+    def stats(self):
+        return {name: lane.stats() for name, lane in self.lanes.items()}
@@ -0,0 +1,223 @@
+import heapq
+import itertools
+
+import analytics
+import correlation
+
+# Aggregazioni ad-hoc sugli eventi (/api/aggregate): raggruppamento per una o due dimensioni con
+# conteggio, somma delle durate, primo/ultimo istante e numero di nodi distinti per gruppo.
+#
+# Le righe da aggregare sono le posizioni selezionate dal motore di query (indici per campo,
+# filtro residuo solo dove serve). Sulle viste colonnari dello snapshot le chiavi di gruppo si
+# calcolano dagli id delle colonne: ogni valore distinto viene derivato (nodo, sito, giorno, ...)
+# una sola volta, le righe non vengono mai materializzate. Con NumPy (analytics.py) lo stesso
+# raggruppamento e' vettoriale sulle colonne codificate, con risultato identico. Il top-K finale
+# usa un heap come cell_outages.top.
+#
+# Dimensioni: node, site, region (da fileName, con la mappa siti di correlation), day e month
+# (da dateIso), oppure un campo della riga del dataset (FIELDS: severity, title, object, typeReason,
+# ...); un nome sconosciuto e' un errore con l'elenco delle dimensioni ammesse.
+
+def _raw(v):
+    return (v or '').strip() or 'N/D'
+
+
+def _node(v):
+    return correlation.node_base(v) or 'N/D'
+
+
+# dimensione -> (campo sorgente, derivazione del valore); site e region dipendono dalla mappa
+# siti e sono risolte in dimensions(), gli altri nomi sono campi grezzi della riga
+DIMENSIONS = {
+    'node': ('fileName', _node),
+    'day': ('dateIso', _raw),
+    'month': ('dateIso', lambda v: _raw(v)[:7]),
+}
+
+# campi della riga raggruppabili per dataset (chiave di EVENT_ENDPOINTS in server.py)
+_EVENT_FIELDS = ('fileName', 'dateIso', 'time', 'type', 'severity', 'object', 'title', 'detail')
+FIELDS = {
+    'lga': _EVENT_FIELDS,
+    'lge': _EVENT_FIELDS,
+    'lgdRestarts': ('fileName', 'dateIso', 'time', 'typeReason', 'value', 'comment', 'duration',
+                    'restartType', 'reason', 'percent', 'rat', 'cells'),
+    'lgd': ('fileName', 'metric', 'nodeUpgrade', 'nodeManual', 'nodeSpontaneous', 'allNodeRestarts',
+            'partialOutages'),
+}
+
+# ordinamento -> (chiave del gruppo, decrescente di default)
+SORTS = {
+    'count': (lambda g: g['count'], True),
+    'duration': (lambda g: g['durationSeconds'], True),
+    'nodes': (lambda g: g['nodes'], True),
+    'first': (lambda g: g['first'], False),
+    'last': (lambda g: g['last'], True),
+    'key': (lambda g: g['_key'], False),
+}
+
+MAX_DIMENSIONS = 2
+
+
+def dimensions(by, field_name, site_map=None, fields=None):
+    """[(nome, campo, derivazione)] per il parametro by= ('node', 'site,severity', ...).
+    fields: campi ammessi come dimensione grezza (FIELDS del dataset; None = qualsiasi)."""
+    names = [b.strip() for b in (by or '').split(',') if b.strip()]
+    if not names:
+        raise ValueError('by deve indicare almeno una dimensione')
+    if len(names) > MAX_DIMENSIONS:
+        raise ValueError(f'by accetta al massimo {MAX_DIMENSIONS} dimensioni')
+    out = []
+    for name in names:
+        if name in ('site', 'region'):
+            derive = lambda v, g=name: correlation.group_of(v, g, site_map) or 'N/D'
+            out.append((name, 'fileName', derive))
+        elif name in DIMENSIONS:
+            field, derive = DIMENSIONS[name]
+            out.append((name, field, derive))
+        elif name.isidentifier() and (fields is None or field_name(name) in fields):
+            out.append((name, field_name(name), _raw))
+        else:
+            allowed = [*DIMENSIONS, 'site', 'region', *(fields or ())]
+            raise ValueError(f'dimensione non valida: {name} (ammesse: {", ".join(dict.fromkeys(allowed))})')
+    return out
+
+
+def _tuples(dataset, positions, fields):
+    """(posizione, valori) delle righe in positions: id di colonna sulle viste dello snapshot
+    (None per i campi assenti), valori grezzi sulle liste di dict."""
+    rows = dataset.rows
+    full = isinstance(positions, range) and positions == range(len(rows))
+    if dataset.columnar:
+        cols = [rows.column(f) for f in fields]
+        if full:
+            streams = [c if c is not None else itertools.repeat(None) for c in cols]
+        else:
+            streams = [map(c.__getitem__, positions) if c is not None else itertools.repeat(None)
+                       for c in cols]
+        return zip(positions, zip(*streams))
+    if full:
+        return ((pos, tuple(map(it.get, fields))) for pos, it in enumerate(rows))
+    return ((pos, tuple(map(rows[pos].get, fields))) for pos in positions)
+
+
+def _decoder(dataset):
+    """Valore testuale di un elemento prodotto da _tuples."""
+    if not dataset.columnar:
+        return lambda v: v or ''
+    value = dataset.rows.value
+    return lambda sid: value(sid) if sid is not None else ''
+
+
+def group(dataset, positions, dims, duration=None, frame=None):
+    """Gruppi {chiave: [conteggio, secondi, primo, ultimo, nodi distinti]} delle righe in positions.
+    duration: funzione testo -> secondi per il campo 'duration' (None = non sommare);
+    frame: colonne codificate del dataset (analytics.Frame) per il calcolo vettoriale.
+
+    Prima passata sui valori grezzi (o id di colonna) delle dimensioni piu' fileName, poi
+    derivazione e fusione per gruppo: ogni valore distinto si decodifica e deriva una volta sola.
+    Sui dataset time_sorted (blocchi per file ordinati per tempo) primo e ultimo istante di una
+    chiave grezza sono la prima e l'ultima posizione vista: niente confronti per riga."""
+    if frame is not None:
+        return analytics.group(frame, positions, dims, duration, node=_node)
+    fields = [field for _name, field, _derive in dims] + ['fileName']
+    if duration is not None:
+        fields.append('duration')
+    decode = _decoder(dataset)
+    when = dataset.time_key()
+    ordered = dataset.time_sorted
+    secs_memo = {}
+    raw = {}
+    width = len(dims) + 1
+    for pos, vals in _tuples(dataset, positions, fields):
+        rk = vals[:width]
+        secs = 0
+        if duration is not None:
+            d = vals[width]
+            secs = secs_memo.get(d)
+            if secs is None:
+                secs = secs_memo[d] = duration(decode(d))
+        g = raw.get(rk)
+        if ordered:
+            if g is None:
+                raw[rk] = [1, secs, pos, pos]
+            else:
+                g[0] += 1
+                g[1] += secs
+                g[3] = pos
+            continue
+        at = when(pos)
+        if g is None:
+            raw[rk] = [1, secs, at, at]
+            continue
+        g[0] += 1
+        g[1] += secs
+        if at < g[2]:
+            g[2] = at
+        if at > g[3]:
+            g[3] = at
+    derived = [{} for _d in dims]
+    nodes = {}
+    groups = {}
+    for rk, (count, secs, first, last) in raw.items():
+        key = []
+        for i, (_name, _field, derive) in enumerate(dims):
+            memo = derived[i]
+            k = memo.get(rk[i])
+            if k is None:
+                k = memo[rk[i]] = derive(decode(rk[i]))
+            key.append(k)
+        key = tuple(key)
+        node = nodes.get(rk[-1])
+        if node is None:
+            node = nodes[rk[-1]] = _node(decode(rk[-1]))
+        if ordered:
+            first, last = when(first), when(last)
+        first = (first[0] + ' ' + first[1]).strip()
+        last = (last[0] + ' ' + last[1]).strip()
+        g = groups.get(key)
+        if g is None:
+            groups[key] = [count, secs, first, last, {node}]
+            continue
+        g[0] += count
+        g[1] += secs
+        if first < g[2]:
+            g[2] = first
+        if last > g[3]:
+            g[3] = last
+        g[4].add(node)
+    for g in groups.values():
+        g[4] = len(g[4])
+    return groups
+
+
+def rows(groups, dims):
+    """Gruppi come dict di risposta (campo _key per l'ordinamento per chiave)."""
+    names = [d[0] for d in dims]
+    out = []
+    for k, (count, secs, first, last, nodes) in groups.items():
+        g = dict(zip(names, k))
+        g.update({
+            'count': count,
+            'durationSeconds': secs,
+            'first': first,
+            'last': last,
+            'nodes': nodes,
+            '_key': k,
+        })
+        out.append(g)
+    return out
+
+
+def top(items, sort, limit, offset=0, descending=None):
+    """Pagina [offset, offset+limit) dei gruppi ordinati per sort (heap); a parita' resta
+    l'ordine di prima comparsa."""
+    key, default_desc = SORTS[sort]
+    desc = default_desc if descending is None else descending
+    n = offset + limit
+    if n >= len(items):
+        page = sorted(items, key=key, reverse=desc)[offset:]
+    else:
+        page = (heapq.nlargest if desc else heapq.nsmallest)(n, items, key=key)[offset:]
+    for g in page:
+        del g['_key']
+    return page
@@ -0,0 +1,283 @@
+import io
+import os
+import json
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+# Modalita' di servizio asyncio (solo libreria standard): HTTP/1.1 con connessioni persistenti e
+# concorrenza limitata. Gli handler esistenti (BaseHTTPRequestHandler) vengono eseguiti invariati
+# in un executor su una richiesta gia' letta; la risposta bufferizzata viene riformattata come
+# HTTP/1.1 con Content-Length. Le route "native" (ping, SSE, download) girano direttamente sul
+# loop, cosi' client lenti e download grandi non occupano thread e non bloccano /api/ping.
+
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = int(os.environ.get('DW_AIO_MAX_BODY', str(1024 * 1024 * 1024)))
+KEEPALIVE_TIMEOUT = float(os.environ.get('DW_AIO_KEEPALIVE', '15'))
+CHUNK_SIZE = 256 * 1024
+
+STATUS_TEXT = {
+    200: 'OK', 204: 'No Content', 206: 'Partial Content', 304: 'Not Modified', 400: 'Bad Request',
+    404: 'Not Found', 408: 'Request Timeout', 413: 'Payload Too Large', 416: 'Range Not Satisfiable',
+    429: 'Too Many Requests', 431: 'Request Header Fields Too Large', 500: 'Internal Server Error',
+    501: 'Not Implemented', 503: 'Service Unavailable',
+}
+
+
+class Request:
+    def __init__(self, method, target, version, headers, body, raw):
+        self.method = method
+        self.target = target
+        self.path = target.split('?', 1)[0]
+        self.version = version
+        self.headers = headers      # chiavi minuscole
+        self.body = body
+        self.raw = raw              # richiesta completa (head + body) per l'handler bufferizzato
+
+    @property
+    def keep_alive(self):
+        conn = self.headers.get('connection', '').lower()
+        if self.version == 'HTTP/1.0':
+            return conn == 'keep-alive'
+        return conn != 'close'
+
+
+def build_head(status, headers, keep_alive):
+    lines = [f'HTTP/1.1 {status} {STATUS_TEXT.get(status, "")}']
+    for k, v in headers:
+        lines.append(f'{k}: {v}')
+    lines.append('Connection: ' + ('keep-alive' if keep_alive else 'close'))
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+
+async def send(writer, status, headers, body=b'', keep_alive=True):
+    headers = list(headers)
+    if status not in (204, 304) and not any(k.lower() == 'content-length' for k, _ in headers):
+        headers.append(('Content-Length', str(len(body))))
+    writer.write(build_head(status, headers, keep_alive) + body)
+    await writer.drain()
+
+
+async def send_json(writer, status, obj, keep_alive=True, extra_headers=None):
+    headers = [('Content-Type', 'application/json'), ('Access-Control-Allow-Origin', '*')]
+    headers.extend((extra_headers or {}).items())
+    await send(writer, status, headers, json.dumps(obj).encode('utf-8'), keep_alive)
+
+
+async def send_file(writer, path, headers, keep_alive=True, offset=0, length=None, status=200):
+    """Invia un file a blocchi con backpressure (drain), senza caricarlo in memoria."""
+    size = os.path.getsize(path)
+    if length is None:
+        length = size - offset
+    headers = list(headers) + [('Content-Length', str(length))]
+    writer.write(build_head(status, headers, keep_alive))
+    loop = asyncio.get_running_loop()
+    with open(path, 'rb') as fp:
+        try:
+            # zero-copy quando il transport lo consente
+            await loop.sendfile(writer.transport, fp, offset, length)
+            return
+        except (NotImplementedError, AttributeError, RuntimeError):
+            pass
+        fp.seek(offset)
+        remaining = length
+        while remaining > 0:
+            chunk = await loop.run_in_executor(None, fp.read, min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            writer.write(chunk)
+            await writer.drain()
+
+
+class LoopQueue:
+    """Coda asyncio alimentabile da altri thread (compatibile con EventHub.publish)."""
+
+    def __init__(self, loop, maxsize=64):
+        self._loop = loop
+        self._q = asyncio.Queue(maxsize=maxsize)
+
+    def put_nowait(self, item):
+        def _put():
+            if not self._q.full():
+                self._q.put_nowait(item)
+        self._loop.call_soon_threadsafe(_put)
+
+    async def get(self, timeout):
+        return await asyncio.wait_for(self._q.get(), timeout)
+
+
+def run_buffered(handler_class, raw, client_address):
+    """Esegue un BaseHTTPRequestHandler su una richiesta in memoria e ritorna i byte di risposta."""
+    h = handler_class.__new__(handler_class)
+    h.request = None
+    h.server = None
+    h.client_address = client_address
+    h.rfile = io.BytesIO(raw)
+    h.wfile = io.BytesIO()
+    h.close_connection = True
+    h.buffered = True
+    h.handle_one_request()
+    return h.wfile.getvalue()
+
+
+def run_in_lane(lane, handler_class, raw, client_address, queued_at):
+    """Esecuzione nell'executor della corsia: None se l'attesa in coda ha superato il massimo."""
+    t0 = time.perf_counter()
+    if not lane.start(t0 - queued_at):
+        return None
+    try:
+        return run_buffered(handler_class, raw, client_address)
+    finally:
+        lane.finish(time.perf_counter() - t0)
+
+
+def reframe(raw_response, keep_alive):
+    """Riformatta una risposta HTTP/1.0 bufferizzata in HTTP/1.1 con Content-Length."""
+    head, sep, body = raw_response.partition(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    try:
+        status = int(lines[0].split(' ', 2)[1])
+    except Exception:
+        status = 500
+    headers = []
+    for line in lines[1:]:
+        k, _, v = line.partition(':')
+        if k.lower() in ('connection', 'keep-alive'):
+            continue
+        headers.append((k, v.strip()))
+    return status, headers, body
+
+
+class AsyncHTTPServer:
+    def __init__(self, handler_class, host='0.0.0.0', port=9000, max_concurrency=32,
+                 max_connections=1024, routes=None, keepalive_timeout=KEEPALIVE_TIMEOUT, admission=None):
+        self.handler_class = handler_class
+        self.host = host
+        self.port = port
+        self.routes = routes or {}   # path -> async fn(request, writer, keep_alive) -> keep_alive
+        self.keepalive_timeout = keepalive_timeout
+        self.max_connections = max_connections
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='aio-handler')
+        self._slots = asyncio.Semaphore(max_concurrency)
+        # corsie di ammissione (admission.Admission): un executor dedicato per corsia
+        self.admission = admission
+        self._lane_executors = {}
+        if admission is not None:
+            for name, lane in admission.lanes.items():
+                self._lane_executors[name] = ThreadPoolExecutor(max_workers=lane.concurrency,
+                                                                thread_name_prefix=f'aio-{name}')
+        self._connections = 0
+        self.server = None
+
+    async def _read_request(self, reader):
+        head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), self.keepalive_timeout)
+        lines = head.decode('latin-1').split('\r\n')
+        parts = lines[0].split()
+        if len(parts) != 3:
+            raise ValueError('request line')
+        method, target, version = parts
+        headers = {}
+        for line in lines[1:]:
+            if not line:
+                continue
+            k, _, v = line.partition(':')
+            headers[k.strip().lower()] = v.strip()
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            raise NotImplementedError('chunked')
+        length = int(headers.get('content-length') or 0)
+        if length > MAX_BODY_BYTES:
+            raise OverflowError('body')
+        body = await reader.readexactly(length) if length > 0 else b''
+        return Request(method, target, version, headers, body, head + body)
+
+    async def _dispatch(self, req, writer, peer):
+        keep_alive = req.keep_alive
+        route = self.routes.get(req.path)
+        if route is not None and req.method == 'GET':
+            return await route(req, writer, keep_alive)
+        loop = asyncio.get_running_loop()
+        lane = None
+        if self.admission is not None:
+            lane = self.admission.lane_for(req.method, req.path, req.target.partition('?')[2])
+        if lane is None:
+            async with self._slots:
+                raw = await loop.run_in_executor(self.executor, run_buffered, self.handler_class, req.raw, peer)
+        elif not lane.enqueue():
+            raw = None
+        else:
+            raw = await loop.run_in_executor(self._lane_executors[lane.name], run_in_lane, lane,
+                                             self.handler_class, req.raw, peer, time.perf_counter())
+        if raw is None:
+            retry = lane.retry_after()
+            await send_json(writer, 429, {'error': 'Server occupato, riprovare', 'lane': lane.name,
+                                          'retryAfter': retry}, keep_alive,
+                            extra_headers={'Retry-After': str(retry),
+                                           'Access-Control-Expose-Headers': 'Retry-After'})
+            return keep_alive
+        status, headers, body = reframe(raw, keep_alive)
+        await send(writer, status, headers, body, keep_alive)
+        return keep_alive
+
+    async def _handle_conn(self, reader, writer):
+        peer = writer.get_extra_info('peername') or ('', 0)
+        self._connections += 1
+        try:
+            if self._connections > self.max_connections:
+                await send_json(writer, 503, {'error': 'Troppe connessioni'}, keep_alive=False,
+                                extra_headers={'Retry-After': '1'})
+                return
+            while True:
+                try:
+                    req = await self._read_request(reader)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    return
+                except asyncio.LimitOverrunError:
+                    await send_json(writer, 431, {'error': 'Header troppo grandi'}, keep_alive=False)
+                    return
+                except OverflowError:
+                    await send_json(writer, 413, {'error': 'Body troppo grande'}, keep_alive=False)
+                    return
+                except NotImplementedError:
+                    await send_json(writer, 501, {'error': 'Transfer-Encoding non supportato'}, keep_alive=False)
+                    return
+                except Exception:
+                    await send_json(writer, 400, {'error': 'Richiesta non valida'}, keep_alive=False)
+                    return
+                if not await self._dispatch(req, writer, peer):
+                    return
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._connections -= 1
+            try:
+                writer.close()
+            except Exception:
+                pass
+
+    async def serve_forever(self, sock=None):
+        if sock is not None:
+            self.server = await asyncio.start_server(self._handle_conn, sock=sock, limit=MAX_HEADER_BYTES)
+        else:
+            self.server = await asyncio.start_server(self._handle_conn, self.host, self.port,
+                                                     limit=MAX_HEADER_BYTES, reuse_address=True)
+        async with self.server:
+            await self.server.serve_forever()
+
+
+def serve(handler_class, host='0.0.0.0', port=9000, routes=None, sock=None, **kwargs):
+    """Avvia il server asyncio (bloccante) finche' non viene interrotto.
+    sock: socket in ascolto gia' aperto (es. condiviso tra i worker pre-fork).
+    """
+    async def _main():
+        srv = AsyncHTTPServer(handler_class, host, port, routes=routes, **kwargs)
+        try:
+            await srv.serve_forever(sock=sock)
+        finally:
+            srv.executor.shutdown(wait=False)
+            for ex in srv._lane_executors.values():
+                ex.shutdown(wait=False)
+    try:
+        asyncio.run(_main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,201 @@
+import os
+import operator
+import threading
+
+import snapshot
+
+try:
+    import numpy as np
+except ImportError:  # NumPy e' opzionale: senza si usano i percorsi in puro Python
+    np = None
+
+# Motore analitico vettoriale opzionale (NumPy) per grafici e aggregazioni.
+#
+# Un Frame codifica le righe di un dataset per colonne, una volta per versione e solo per i campi
+# richiesti: campi categorici come codici interi (int32) con la tabella delle etichette in ordine
+# di prima comparsa, durate come array di secondi, istanti (dateIso, time) come rango intero
+# nell'ordine cronologico. Sulle viste dello snapshot i codici vengono dagli id delle colonne
+# (np.frombuffer, nessuna riga materializzata); sulle liste di dict da un passaggio per campo.
+# Conteggi e somme per gruppo usano bincount, primo/ultimo istante argsort + reduceat, i ranghi
+# degli istanti searchsorted sulle etichette ordinate.
+#
+# I risultati sono identici ai percorsi in puro Python (stesse chiavi, stessi valori, stesso
+# ordine di prima comparsa): con DW_NUMPY=0, o senza NumPy installato, il server usa quelli.
+
+ENABLED = np is not None and os.environ.get('DW_NUMPY', '1') != '0'
+
+
+def _encode_part(part, field):
+    """(codici, etichette) di un blocco: etichette in ordine di prima comparsa."""
+    if isinstance(part, snapshot.SnapshotRows):
+        col = part.column(field)
+        if col is None:
+            return np.zeros(len(part), np.int32), [None] if len(part) else []
+        sids = np.frombuffer(col, dtype=np.uint32)
+        uniq, first, inverse = np.unique(sids, return_index=True, return_inverse=True)
+        order = np.argsort(first, kind='stable')
+        rank = np.empty(len(uniq), np.int32)
+        rank[order] = np.arange(len(uniq), dtype=np.int32)
+        value = part.value
+        return rank[inverse.reshape(-1)], [value(int(s)) for s in uniq[order]]
+    values = list(map(operator.methodcaller('get', field), part))
+    index = {v: i for i, v in enumerate(dict.fromkeys(values))}
+    codes = np.fromiter(map(index.__getitem__, values), dtype=np.int32, count=len(values))
+    return codes, list(index)
+
+
+def _encode(rows, field):
+    parts = rows.parts if isinstance(rows, snapshot.Concat) else (rows,)
+    labels = {}
+    chunks = []
+    for part in parts:
+        codes, part_labels = _encode_part(part, field)
+        remap = np.fromiter((labels.setdefault(v, len(labels)) for v in part_labels),
+                            dtype=np.int32, count=len(part_labels))
+        chunks.append(remap[codes])
+    codes = np.concatenate(chunks) if chunks else np.zeros(0, np.int32)
+    return codes, list(labels)
+
+
+class Frame:
+    """Colonne codificate delle righe di un dataset (costruite on-demand per campo)."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.n = len(rows)
+        self._cols = {}
+        self._lock = threading.RLock()
+
+    def _cached(self, key, build):
+        entry = self._cols.get(key)
+        if entry is None:
+            with self._lock:
+                entry = self._cols.get(key)
+                if entry is None:
+                    entry = self._cols[key] = build()
+        return entry
+
+    def codes(self, field):
+        """(codici int32 per riga, etichette in ordine di prima comparsa) del campo."""
+        return self._cached(field, lambda: _encode(self.rows, field))
+
+    def seconds(self, field, parse):
+        """Array int64 dei secondi del campo (parse: testo -> secondi, una volta per valore)."""
+        def build():
+            codes, labels = self.codes(field)
+            table = np.fromiter((parse(v or '') for v in labels), dtype=np.int64, count=len(labels))
+            return table[codes]
+        return self._cached(('seconds', field), build)
+
+    def stamps(self):
+        """(rango int64 per riga, date ordinate, ore ordinate): il rango segue l'ordine di
+        (dateIso, time) e si decodifica con stamp()."""
+        def build():
+            dcodes, dlabels = self.codes('dateIso')
+            tcodes, tlabels = self.codes('time')
+            dlabels = np.array([str(v or '') for v in dlabels])
+            tlabels = np.array([str(v or '') for v in tlabels])
+            dates = np.unique(dlabels)
+            times = np.unique(tlabels)
+            drank = np.searchsorted(dates, dlabels).astype(np.int64)
+            trank = np.searchsorted(times, tlabels).astype(np.int64)
+            ranks = drank[dcodes] * max(1, len(times)) + trank[tcodes]
+            return ranks, dates.tolist(), times.tolist()
+        return self._cached(('stamps',), build)
+
+    def stamp(self, rank):
+        _ranks, dates, times = self.stamps()
+        d, t = divmod(int(rank), max(1, len(times)))
+        return (dates[d] + ' ' + times[t]).strip()
+
+
+def value_counts(frame, fields):
+    """Come server._value_counts: {(valori...): conteggio} nell'ordine di prima comparsa."""
+    cols = [frame.codes(f) for f in fields]
+    if not frame.n:
+        return {}
+    if len(cols) == 1:
+        codes, labels = cols[0]
+        counts = np.bincount(codes, minlength=len(labels))
+        return {(v,): int(n) for v, n in zip(labels, counts.tolist()) if n}
+    combined = np.zeros(frame.n, np.int64)
+    for codes, labels in cols:
+        combined = combined * len(labels) + codes
+    uniq, first, counts = np.unique(combined, return_index=True, return_counts=True)
+    out = {}
+    for i in np.argsort(first, kind='stable').tolist():
+        key = []
+        rest = int(uniq[i])
+        for codes, labels in reversed(cols):
+            rest, c = divmod(rest, len(labels))
+            key.append(labels[c])
+        out[tuple(reversed(key))] = int(counts[i])
+    return out
+
+
+def sums(frame, field, seconds_field, parse):
+    """{valore del campo: somma dei secondi di seconds_field} nell'ordine di prima comparsa."""
+    codes, labels = frame.codes(field)
+    if not frame.n:
+        return {}
+    totals = np.zeros(len(labels), np.int64)
+    np.add.at(totals, codes, frame.seconds(seconds_field, parse))
+    present = np.bincount(codes, minlength=len(labels))
+    return {v: int(s) for v, s, n in zip(labels, totals.tolist(), present.tolist()) if n}
+
+
+def _derive(labels, derive):
+    """(mappa codice etichetta -> codice derivato, etichette derivate in ordine di prima comparsa)."""
+    index = {}
+    mapping = np.fromiter((index.setdefault(derive(v), len(index)) for v in labels),
+                          dtype=np.int32, count=len(labels))
+    return mapping, list(index)
+
+
+def group(frame, positions, dims, duration=None, node=None):
+    """Come aggregate.group: {chiave: [conteggio, secondi, primo, ultimo, nodi distinti]}.
+    node: derivazione del nodo da fileName per il conteggio dei nodi distinti."""
+    full = isinstance(positions, range) and positions == range(frame.n)
+    sel = None if full else np.asarray(positions, dtype=np.int64)
+    if not (frame.n if sel is None else len(sel)):
+        return {}
+    take = (lambda a: a) if sel is None else (lambda a: a[sel])
+    gcode = None
+    derived = []
+    for _name, field, derive in dims:
+        codes, labels = frame.codes(field)
+        mapping, dlabels = _derive(labels, derive)
+        derived.append(dlabels)
+        c = take(mapping[codes]).astype(np.int64)
+        gcode = c if gcode is None else gcode * len(dlabels) + c
+    uniq, first, inverse = np.unique(gcode, return_index=True, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    order = np.argsort(first, kind='stable')
+    gid = np.empty(len(uniq), np.int64)
+    gid[order] = np.arange(len(uniq))
+    gid = gid[inverse]
+    size = len(uniq)
+    counts = np.bincount(gid, minlength=size)
+    by_group = np.argsort(gid, kind='stable')
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    ranks = take(frame.stamps()[0])[by_group]
+    lo = np.minimum.reduceat(ranks, starts)
+    hi = np.maximum.reduceat(ranks, starts)
+    if duration is not None:
+        secs = np.add.reduceat(take(frame.seconds('duration', duration))[by_group], starts).tolist()
+    else:
+        secs = [0] * size
+    ncodes, nlabels = frame.codes('fileName')
+    nmap, nodes = _derive(nlabels, node)
+    pairs = np.unique(gid * max(1, len(nodes)) + take(nmap[ncodes]))
+    distinct = np.bincount(pairs // max(1, len(nodes)), minlength=size)
+    out = {}
+    for g, i in enumerate(order.tolist()):
+        rest = int(uniq[i])
+        key = []
+        for dlabels in reversed(derived):
+            rest, c = divmod(rest, len(dlabels))
+            key.append(dlabels[c])
+        out[tuple(reversed(key))] = [int(counts[g]), int(secs[g]), frame.stamp(lo[g]), frame.stamp(hi[g]),
+                                     int(distinct[g])]
+    return out
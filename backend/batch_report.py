@@ -0,0 +1,347 @@
+"""Modalita' batch senza HTTP: ingestione parallela di directory DW ed export su file.
+
+Per ogni directory indicata i log .log vengono parsati con un pool di processi (stesso parser del
+server) e gli export (LGA, LGE, LGD, LGD_RESTARTS, OUTAGES_COUNT, DOWNTIME_COUNT, gli stessi di
+POST /export/start) piu' i riepiloghi di disponibilita' per nodo e per sito vengono scritti come
+CSV, zip (un CSV per archivio, come gli export del server) o NDJSON in <out>/<nome directory>/,
+insieme a summary.json con conteggi e tempi.
+
+Indice persistente: per ogni directory viene mantenuto uno snapshot colonnare (formato di
+snapshot.py, con le firme dei file nel meta) in backend/cache/batch-<hash>.snapshot; anche lo
+snapshot del server pre-fork (DW_SNAPSHOT) viene riusato se si riferisce alla stessa directory.
+I file con firma invariata non vengono riparsati; se nulla e' cambiato le righe vengono lette
+direttamente dallo snapshot mappato in memoria.
+
+Uso:
+    python backend/batch_report.py DW --out reports
+    python backend/batch_report.py /data/batch1 /data/batch2 --format ndjson --jobs 4
+    python backend/batch_report.py DW --types LGD_RESTARTS,AVAILABILITY --from 2025-10-01 --format csv
+"""
+import os
+import io
+import csv
+import sys
+import json
+import time
+import hashlib
+import zipfile
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import correlation
+import server
+import snapshot
+
+KINDS = ('lga', 'lge', 'lgdRestarts', 'lgd')
+AVAILABILITY_TYPES = ('AVAILABILITY', 'AVAILABILITY_SITE')
+DEFAULT_TYPES = ('LGA', 'LGE', 'LGD', 'LGD_RESTARTS', 'OUTAGES_COUNT', 'DOWNTIME_COUNT') + AVAILABILITY_TYPES
+FORMATS = ('csv', 'zip', 'ndjson')
+AVAILABILITY_HEADERS = ['Chiave', 'Nodi', 'Disservizi', 'Downtime (s)', 'Giorni osservati', 'Disponibilita %']
+
+
+def list_logs(dw_dir):
+    """[(fileName, path, firma)] dei log della directory, in ordine di nome."""
+    out = []
+    for name in sorted(os.listdir(dw_dir)):
+        if not name.lower().endswith('.log'):
+            continue
+        path = os.path.join(dw_dir, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        out.append((name, path, (st.st_size, st.st_mtime_ns)))
+    return out
+
+
+def index_path(dw_dir, index_dir):
+    digest = hashlib.sha1(os.path.abspath(dw_dir).encode('utf-8')).hexdigest()[:12]
+    return os.path.join(index_dir, f'batch-{digest}.snapshot')
+
+
+def load_index(dw_dir, paths):
+    """Primo snapshot valido della directory tra paths, o None."""
+    wanted = os.path.abspath(dw_dir)
+    for path in paths:
+        try:
+            snap = snapshot.Snapshot(path)
+        except (OSError, ValueError):
+            continue
+        if snap.meta.get('dwDir') == wanted and isinstance(snap.meta.get('files'), dict):
+            return snap
+    return None
+
+
+def file_blocks(rows):
+    """{fileName: (inizio, fine)} dei blocchi contigui per file di un dataset dello snapshot."""
+    col = rows.column('fileName')
+    blocks = {}
+    if col is None:
+        return blocks
+    start = 0
+    prev = None
+    for pos, sid in enumerate(col):
+        if sid != prev:
+            if prev is not None:
+                blocks[rows.value(prev)] = (start, pos)
+            start = pos
+            prev = sid
+    if prev is not None:
+        blocks[rows.value(prev)] = (start, len(col))
+    return blocks
+
+
+def _parse(path):
+    data = server.parse_log_file(path)
+    return {kind: data[kind] for kind in KINDS}
+
+
+def ingest(dirs, jobs, index_dir, use_index=True):
+    """Dataset per directory: {dir: {'datasets': {kind: righe}, 'files', 'parsed', 'reused'}}.
+    I file da parsare di tutte le directory passano da un unico pool di processi."""
+    plans = {}
+    todo = []
+    for dw_dir in dirs:
+        logs = list_logs(dw_dir)
+        own = index_path(dw_dir, index_dir)
+        snap = load_index(dw_dir, [own, server.SNAPSHOT_PATH]) if use_index else None
+        known = {n: tuple(sig) for n, sig in (snap.meta.get('files') or {}).items()} if snap else {}
+        fresh = [(name, path) for name, path, sig in logs if known.get(name) != sig]
+        plans[dw_dir] = {'logs': logs, 'snap': snap, 'fresh': fresh, 'index': own}
+        todo.extend(path for _name, path in fresh)
+
+    parsed = {}
+    if todo:
+        if jobs > 1 and len(todo) > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                for path, data in zip(todo, pool.map(_parse, todo, chunksize=max(1, len(todo) // (jobs * 8)))):
+                    parsed[path] = data
+        else:
+            for path in todo:
+                parsed[path] = _parse(path)
+
+    out = {}
+    for dw_dir, plan in plans.items():
+        logs, snap, fresh = plan['logs'], plan['snap'], plan['fresh']
+        names = [name for name, _path, _sig in logs]
+        if snap is not None and not fresh and sorted(snap.meta['files']) == names:
+            # nulla e' cambiato: righe lette pigramente dallo snapshot mappato
+            datasets = {kind: snap.rows(kind) for kind in KINDS}
+        else:
+            blocks = {kind: file_blocks(snap.rows(kind)) for kind in KINDS} if snap is not None else {}
+            fresh_paths = dict(fresh)
+            datasets = {kind: [] for kind in KINDS}
+            for name, path, _sig in logs:
+                if name in fresh_paths:
+                    data = parsed[path]
+                    for kind in KINDS:
+                        datasets[kind].extend(data[kind])
+                    continue
+                for kind in KINDS:
+                    span = blocks[kind].get(name)
+                    if span:
+                        datasets[kind].extend(snap.rows(kind)[span[0]:span[1]])
+            if use_index:
+                os.makedirs(index_dir, exist_ok=True)
+                snapshot.write_snapshot(plan['index'], int(time.time()), datasets, meta={
+                    'dwDir': os.path.abspath(dw_dir),
+                    'files': {name: list(sig) for name, _path, sig in logs},
+                })
+        out[dw_dir] = {
+            'datasets': datasets,
+            'files': len(logs),
+            'parsed': len(fresh),
+            'reused': len(logs) - len(fresh),
+        }
+    return out
+
+
+def _date_range(rows):
+    """(prima, ultima) dateIso delle righe ('' se assenti); sulle righe colonnari solo valori distinti."""
+    if hasattr(rows, 'column'):
+        col = rows.column('dateIso')
+        values = [rows.value(sid) for sid in set(col)] if col is not None else []
+    else:
+        values = {it.get('dateIso') or '' for it in rows}
+    values = [v for v in values if v]
+    return (min(values), max(values)) if values else ('', '')
+
+
+def availability(datasets, date_from='', date_to='', key_fn=None):
+    """Disponibilita' per nodo (o gruppo) dai restart LGD della directory. Il periodo osservato e'
+    l'intervallo di date degli eventi della directory, ristretto a from/to."""
+    first, last = '', ''
+    for kind in ('lga', 'lge', 'lgdRestarts'):
+        a, b = _date_range(datasets[kind])
+        if a and (not first or a < first):
+            first = a
+        if b > last:
+            last = b
+    first = max(first, date_from) if date_from else first
+    last = min(last, date_to) if date_to else last
+    lo = correlation.to_epoch(first, '00:00:00') if first else None
+    hi = correlation.to_epoch(last, '00:00:00') if last else None
+    observed = (hi - lo) + 86400 if lo is not None and hi is not None and hi >= lo else 0
+    nodes = set()
+    for kind in KINDS:
+        rows = datasets[kind]
+        if hasattr(rows, 'column'):
+            col = rows.column('fileName')
+            nodes.update(rows.value(sid) for sid in set(col or ()))
+        else:
+            nodes.update(it.get('fileName') or '' for it in rows)
+    per_node = {name: [0, 0] for name in nodes if name}
+    for it in datasets['lgdRestarts']:
+        day = it.get('dateIso') or ''
+        if not day or (first and day < first) or (last and day > last):
+            continue
+        st = per_node.setdefault(it.get('fileName') or '', [0, 0])
+        st[0] += 1
+        st[1] += max(0, server.parse_duration_sec(it.get('duration')))
+    out = {}
+    for name, (outages, downtime) in per_node.items():
+        key = key_fn(name) if key_fn else correlation.node_base(name)
+        agg = out.get(key)
+        if agg is None:
+            agg = out[key] = {'outages': 0, 'downtimeSeconds': 0, 'observedSeconds': 0, 'nodes': 0}
+        agg['outages'] += outages
+        agg['downtimeSeconds'] += downtime
+        agg['observedSeconds'] += observed
+        agg['nodes'] += 1
+    rows = server.availability_rows(out)
+    rows.sort(key=lambda r: (r['availabilityPct'], r['key']))
+    return rows
+
+
+def tables(datasets, types, date_from='', date_to=''):
+    """(nome base, intestazioni, righe) degli export richiesti."""
+    payload = datasets
+    if date_from or date_to:
+        def in_range(it):
+            day = it.get('dateIso') or ''
+            return (not date_from or day >= date_from) and (not date_to or day <= date_to)
+        payload = {kind: ([it for it in rows if in_range(it)] if kind != 'lgd' else rows)
+                   for kind, rows in datasets.items()}
+    for jt in types:
+        if jt in AVAILABILITY_TYPES:
+            key_fn = None
+            if jt == 'AVAILABILITY_SITE':
+                site_map = correlation.load_site_map()
+                key_fn = lambda name: correlation.group_of(name, 'site', site_map)
+            rows = availability(datasets, date_from, date_to, key_fn)
+            yield jt, AVAILABILITY_HEADERS, ([r['key'], r['nodes'], r['outages'], r['downtimeSeconds'],
+                                              r['observedDays'], r['availabilityPct']] for r in rows)
+            continue
+        headers, rows, base = server.export_table(jt, payload, fallback=False)
+        yield base, headers, rows
+
+
+def write_table(out_dir, base, headers, rows, fmt):
+    """Scrive un export; ritorna (percorso, righe scritte)."""
+    n = 0
+    if fmt == 'ndjson':
+        path = os.path.join(out_dir, base + '.ndjson')
+        with open(path, 'w', encoding='utf-8') as f:
+            for r in rows:
+                f.write(json.dumps(dict(zip(headers, r)), ensure_ascii=False))
+                f.write('\n')
+                n += 1
+        return path, n
+    if fmt == 'zip':
+        path = os.path.join(out_dir, base + '.zip')
+        with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+            with zf.open(base + '.csv', 'w') as raw:
+                f = io.TextIOWrapper(raw, encoding='utf-8', newline='')
+                n = _write_csv(f, headers, rows)
+                f.flush()
+                f.detach()
+        return path, n
+    path = os.path.join(out_dir, base + '.csv')
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        n = _write_csv(f, headers, rows)
+    return path, n
+
+
+def _write_csv(f, headers, rows):
+    writer = csv.writer(f)
+    writer.writerow(headers)
+    n = 0
+    for r in rows:
+        writer.writerow([x if x is not None else '' for x in r])
+        n += 1
+    return n
+
+
+def _label(dw_dir, used):
+    """Nome della sottodirectory di output (nome della directory DW, reso univoco)."""
+    base = os.path.basename(os.path.normpath(os.path.abspath(dw_dir))) or 'DW'
+    label = base
+    i = 2
+    while label in used:
+        label = f'{base}_{i}'
+        i += 1
+    used.add(label)
+    return label
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('dirs', nargs='+', help='directory DW con i file .log')
+    ap.add_argument('--out', default='reports', help='directory di output (default reports)')
+    ap.add_argument('--types', default=','.join(DEFAULT_TYPES),
+                    help=f'export separati da virgola (default {",".join(DEFAULT_TYPES)})')
+    ap.add_argument('--format', default='csv', choices=FORMATS)
+    ap.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='processi di parsing (default: CPU)')
+    ap.add_argument('--from', dest='date_from', default='', help='prima data inclusa (YYYY-MM-DD)')
+    ap.add_argument('--to', dest='date_to', default='', help='ultima data inclusa (YYYY-MM-DD)')
+    ap.add_argument('--index-dir', default=server.CACHE_DIR, help='directory degli indici persistenti')
+    ap.add_argument('--no-index', action='store_true', help='non leggere ne\' scrivere gli indici persistenti')
+    args = ap.parse_args(argv)
+
+    types = [t.strip().upper() for t in args.types.split(',') if t.strip()]
+    unknown = [t for t in types if t not in DEFAULT_TYPES]
+    if unknown:
+        ap.error(f'tipi non supportati: {", ".join(unknown)}')
+    missing = [d for d in args.dirs if not os.path.isdir(d)]
+    if missing:
+        ap.error(f'directory inesistenti: {", ".join(missing)}')
+
+    t0 = time.perf_counter()
+    ingested = ingest(args.dirs, max(1, args.jobs), args.index_dir, use_index=not args.no_index)
+    ingest_s = time.perf_counter() - t0
+    used = set()
+    status = 0
+    for dw_dir, info in ingested.items():
+        t1 = time.perf_counter()
+        out_dir = os.path.join(args.out, _label(dw_dir, used))
+        os.makedirs(out_dir, exist_ok=True)
+        outputs = {}
+        for base, headers, rows in tables(info['datasets'], types, args.date_from, args.date_to):
+            path, n = write_table(out_dir, base, headers, rows, args.format)
+            outputs[base] = {'path': path, 'rows': n}
+        summary = {
+            'dwDir': os.path.abspath(dw_dir),
+            'files': info['files'],
+            'parsedFiles': info['parsed'],
+            'reusedFiles': info['reused'],
+            'counts': {kind: len(info['datasets'][kind]) for kind in KINDS},
+            'from': args.date_from,
+            'to': args.date_to,
+            'format': args.format,
+            'outputs': outputs,
+            'ingestSeconds': round(ingest_s, 3),
+            'exportSeconds': round(time.perf_counter() - t1, 3),
+        }
+        with open(os.path.join(out_dir, 'summary.json'), 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        print(f"{dw_dir}: {info['files']} file ({info['parsed']} parsati, {info['reused']} dall'indice), "
+              f"{sum(o['rows'] for o in outputs.values())} righe esportate in {out_dir} "
+              f"({summary['exportSeconds']}s)")
+        if not info['files']:
+            status = 1
+    print(f'Totale {round(time.perf_counter() - t0, 2)}s (ingestione {round(ingest_s, 2)}s)')
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,128 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+# Cache LRU dei blocchi di righe per file (risultato di parse_log_file: lga, lge, lgdRestarts, lgd)
+# con budget di memoria configurabile con DW_MEMORY_MB (default 0 = illimitato: tutti i blocchi
+# restano residenti come prima).
+#
+# Con un budget le liste aggregate non tengono piu' i dict delle righe: il server pubblica ogni
+# versione nello snapshot colonnare mmap (snapshot.py) e interroga quello; qui restano solo i
+# blocchi per file usati di recente (ricostruzione incrementale, diff del changelog, accodamenti,
+# /api/node/summary). Un blocco evitto viene ricaricato alla prima richiesta dallo snapshot o, in
+# mancanza, riparsando il file sorgente. Aggregati e indici (catalogo, indici per cella/nodo,
+# grafici, indici del motore di query) restano residenti: contengono posizioni, non righe.
+#
+# La dimensione di un blocco e' stimata da un campione di righe (sys.getsizeof di dict e valori);
+# /api/metrics riporta uso stimato rispetto al budget accanto all'RSS del processo.
+
+MEMORY_BUDGET_BYTES = int(float(os.environ.get('DW_MEMORY_MB', '0')) * 1024 * 1024)
+KINDS = ('lga', 'lge', 'lgdRestarts', 'lgd')
+SAMPLE_ROWS = 32
+
+
+def estimate(data):
+    """Byte stimati dei blocchi di righe di un file (dict, stringhe e slot delle liste)."""
+    total = 0
+    for kind in KINDS:
+        rows = data.get(kind) or ()
+        n = len(rows)
+        if not n:
+            continue
+        step = max(1, n // SAMPLE_ROWS)
+        sample = rows[::step][:SAMPLE_ROWS]
+        size = 0
+        for it in sample:
+            size += sys.getsizeof(it) + sum(sys.getsizeof(v) for v in it.values())
+        total += size * n // len(sample) + 8 * n + 56
+    return total
+
+
+class BlockCache:
+    def __init__(self, max_bytes=MEMORY_BUDGET_BYTES):
+        self.max_bytes = max(0, int(max_bytes))
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # fileName -> (dati, byte stimati) (ordine = recenza d'uso)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.reloads = {'snapshot': 0, 'file': 0}
+
+    @property
+    def limited(self):
+        return self.max_bytes > 0
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def get(self, name):
+        """Blocco del file (aggiorna la recenza) o None se non residente."""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(name)
+            self.hits += 1
+            return entry[0]
+
+    def peek(self, name):
+        """Come get() ma senza toccare recenza e contatori (ricostruzione delle liste aggregate)."""
+        entry = self._entries.get(name)
+        return entry[0] if entry is not None else None
+
+    def put(self, name, data):
+        """Registra il blocco del file ed evita i meno recenti oltre il budget; il blocco appena
+        inserito non viene mai evitto."""
+        size = estimate(data)
+        with self._lock:
+            old = self._entries.pop(name, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[name] = (data, size)
+            self.bytes += size
+            self._evict()
+        return data
+
+    def reloaded(self, source):
+        """Conta un ricaricamento di un blocco evitto ('snapshot' o 'file')."""
+        with self._lock:
+            self.reloads[source] += 1
+
+    def discard(self, name):
+        with self._lock:
+            old = self._entries.pop(name, None)
+            if old is not None:
+                self.bytes -= old[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def _evict(self):
+        if not self.limited:
+            return
+        while self.bytes > self.max_bytes and len(self._entries) > 1:
+            _name, old = self._entries.popitem(last=False)
+            self.bytes -= old[1]
+            self.evictions += 1
+
+    def stats(self, files=None):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'limited': self.limited,
+                'budgetBytes': self.max_bytes,
+                'bytes': self.bytes,
+                'usage': round(self.bytes / self.max_bytes, 4) if self.limited else None,
+                'residentFiles': len(self._entries),
+                'files': files if files is not None else len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'reloads': dict(self.reloads),
+            }
@@ -0,0 +1,215 @@
+import re
+import heapq
+import bisect
+
+import correlation
+
+# Scomposizione dei restart/disservizi LGD e indice dei disservizi per cella.
+#
+# Le righe LGD hanno typeReason e value come testo libero, es.
+#   PartialOutage(Manual);11% Lrat Cell 43 44; ();10s
+#   SpontaneousCold(Other:PowerReset);CXP9024418/16_R8D21;...;78s (1m18s)
+# All'ingestione typeReason viene diviso in tipo di restart (PartialOutage, SpontaneousCold, ...)
+# e causa (Manual, System, Transmission, Other:PowerReset; eventuali dettagli dopo la virgola
+# vengono scartati) e, per i disservizi parziali, value in percentuale di capacita' colpita, RAT
+# (Lrat, GNBDU) e celle coinvolte. Nelle righe i campi restano stringhe come il resto della riga
+# (snapshot colonnare e motore di query lavorano su stringhe; 'cells' e' la lista di cellId
+# separata da spazi); le risposte API li espongono tipati con typed() (percent float, cells
+# lista di cellId interi), come l'indice per cella.
+#
+# L'indice, costruito una volta per versione, ha per ogni (nodo, RAT, cellId) gli intervalli
+# ordinati per inizio con le somme prefisse delle durate: il downtime di una cella in un
+# intervallo di date costa due bisezioni, il top-N su tutta la rete un heap.
+
+TYPE_REASON_RX = re.compile(r"^([^(]*)(?:\(([^,)]*))?")
+PARTIAL_VALUE_RX = re.compile(r"^(\d+)\s*%\s*(\S+)\s+Cell\s+([\d\s]+)")
+
+# RAT delle righe LGD -> tipi di MO cella dell'inventario (inventory.py) con lo stesso cellId
+RAT_CELL_TYPES = {
+    'LRAT': ('EUtranCellFDD', 'EUtranCellTDD', 'NbIotCell'),
+    'GNBDU': ('NRCellDU',),
+}
+
+
+def decompose(type_reason, value):
+    """Campi stringa ricavati da typeReason e value di una riga LGD."""
+    m = TYPE_REASON_RX.match(type_reason or '')
+    out = {
+        'restartType': m.group(1).strip(),
+        'reason': (m.group(2) or '').strip(),
+        'percent': '',
+        'rat': '',
+        'cells': '',
+    }
+    p = PARTIAL_VALUE_RX.match(value or '')
+    if p:
+        out['percent'] = p.group(1)
+        out['rat'] = p.group(2)
+        out['cells'] = ' '.join(p.group(3).split())
+    return out
+
+
+def typed(it):
+    """Copia di una riga LGD per le risposte API: percent float (None se assente), cells lista
+    di cellId interi. I campi non presenti (proiezione fields=) restano assenti."""
+    out = dict(it)
+    if 'percent' in out:
+        out['percent'] = float(out['percent']) if out['percent'] else None
+    if 'cells' in out:
+        out['cells'] = [int(c) if c.isdigit() else c for c in (out['cells'] or '').split()]
+    return out
+
+
+class CellTimeline:
+    """Disservizi di una cella ordinati per inizio (liste parallele) con somme prefisse delle
+    durate (acc[i] = somma delle prime i durate)."""
+
+    __slots__ = ('node', 'rat', 'cell', 'starts', 'durations', 'percents', 'reasons', 'positions', 'acc')
+
+    def __init__(self, node, rat, cell):
+        self.node = node
+        self.rat = rat
+        self.cell = cell
+        self.starts = []
+        self.durations = []
+        self.percents = []
+        self.reasons = []
+        self.positions = []
+        self.acc = None
+
+    def bounds(self, lo=None, hi=None):
+        i = bisect.bisect_left(self.starts, lo) if lo is not None else 0
+        j = bisect.bisect_right(self.starts, hi) if hi is not None else len(self.starts)
+        return i, j
+
+
+def build_cell_index(rows, duration_fn):
+    """{(nodo, RAT, cellId): CellTimeline} dalle righe lgdRestarts con celle."""
+    index = {}
+    for pos, it in enumerate(rows):
+        cells = it.get('cells')
+        if not cells:
+            continue
+        start = correlation.to_epoch(it.get('dateIso') or '', it.get('time') or '')
+        if start is None:
+            continue
+        node = correlation.node_base(it.get('fileName'))
+        rat = it.get('rat') or ''
+        duration = max(0, duration_fn(it.get('duration')))
+        percent = int(it.get('percent') or 0)
+        reason = it.get('reason') or ''
+        for cell in cells.split():
+            key = (node, rat, cell)
+            tl = index.get(key)
+            if tl is None:
+                tl = index[key] = CellTimeline(node, rat, cell)
+            tl.starts.append(start)
+            tl.durations.append(duration)
+            tl.percents.append(percent)
+            tl.reasons.append(reason)
+            tl.positions.append(pos)
+    for tl in index.values():
+        if any(a > b for a, b in zip(tl.starts, tl.starts[1:])):
+            order = sorted(range(len(tl.starts)), key=tl.starts.__getitem__)
+            for name in ('starts', 'durations', 'percents', 'reasons', 'positions'):
+                values = getattr(tl, name)
+                setattr(tl, name, [values[i] for i in order])
+        acc = [0]
+        total = 0
+        for d in tl.durations:
+            total += d
+            acc.append(total)
+        tl.acc = acc
+    return index
+
+
+def cell_name(record, rat, cell):
+    """Nome del MO cella (es. 'EUtranCellFDD=CS01E3') dalla scheda di inventario del nodo."""
+    if not record:
+        return ''
+    for mo_type in RAT_CELL_TYPES.get((rat or '').upper(), ()):
+        for name, cid in (record.get('cells') or {}).get(mo_type, {}).items():
+            if str(cid) == cell:
+                return f'{mo_type}={name}'
+    return ''
+
+
+# Ordinamenti di /api/cells/outages: nome -> (chiave, decrescente)
+SORTS = {
+    'downtime': (lambda r: (r['downtimeSeconds'], r['outages']), True),
+    'outages': (lambda r: (r['outages'], r['downtimeSeconds']), True),
+    'percent': (lambda r: (r['maxPercent'], r['downtimeSeconds']), True),
+    'last': (lambda r: r['last'], True),
+    'cell': (lambda r: (r['node'], r['rat'], r['cellId'].zfill(8)), False),
+}
+
+
+def cell_totals(index, lo=None, hi=None, nodes=None, sites=None, rat='', reasons=()):
+    """Totali per cella dei disservizi con inizio in [lo, hi]: lista di (totali, timeline, i, j).
+    Senza filtro sulle cause il downtime e' una differenza di somme prefisse."""
+    rat = rat.upper()
+    reasons = {r.lower() for r in reasons}
+    out = []
+    for (node, cell_rat, cell), tl in index.items():
+        if nodes and node not in nodes:
+            continue
+        if sites and correlation.group_of(node, 'site') not in sites:
+            continue
+        if rat and cell_rat.upper() != rat:
+            continue
+        i, j = tl.bounds(lo, hi)
+        if i >= j:
+            continue
+        if reasons:
+            ks = [k for k in range(i, j) if tl.reasons[k].lower() in reasons]
+            if not ks:
+                continue
+            outages = len(ks)
+            downtime = sum(tl.durations[k] for k in ks)
+            max_pct = max(tl.percents[k] for k in ks)
+            first, last = tl.starts[ks[0]], tl.starts[ks[-1]]
+        else:
+            outages = j - i
+            downtime = tl.acc[j] - tl.acc[i]
+            max_pct = max(tl.percents[i:j])
+            first, last = tl.starts[i], tl.starts[j - 1]
+        out.append(({
+            'node': node,
+            'rat': cell_rat,
+            'cellId': cell,
+            'outages': outages,
+            'downtimeSeconds': downtime,
+            'maxPercent': max_pct,
+            'first': correlation.format_epoch(first),
+            'last': correlation.format_epoch(last),
+        }, tl, i, j))
+    return out
+
+
+def top(items, sort, limit, offset=0):
+    """Pagina [offset, offset+limit) degli elementi di cell_totals ordinati per sort (heap)."""
+    key, descending = SORTS[sort]
+    n = offset + limit
+    wrapped = lambda x: key(x[0])
+    if n >= len(items):
+        return sorted(items, key=wrapped, reverse=descending)[offset:]
+    pick = heapq.nlargest if descending else heapq.nsmallest
+    return pick(n, items, key=wrapped)[offset:]
+
+
+def intervals(tl, i, j, reasons=(), limit=None):
+    """Disservizi della cella tra le posizioni i e j (piu' recenti prima)."""
+    reasons = {r.lower() for r in reasons}
+    out = []
+    for k in range(j - 1, i - 1, -1):
+        if reasons and tl.reasons[k].lower() not in reasons:
+            continue
+        out.append({
+            'start': correlation.format_epoch(tl.starts[k]),
+            'durationSeconds': tl.durations[k],
+            'percent': tl.percents[k],
+            'reason': tl.reasons[k],
+        })
+        if limit is not None and len(out) >= limit:
+            break
+    return out
@@ -0,0 +1,177 @@
+import os
+import threading
+from collections import deque
+
+# Changelog delle versioni del dataset per le risposte delta (since=<versione>).
+#
+# Ad ogni ingestione il server registra, per ogni file cambiato, le righe aggiunte, aggiornate e
+# rimosse di ciascun dataset (lga, lge, lgdRestarts, lgd) rispetto alla versione precedente, piu'
+# i file eliminati, con le loro righe come rimozioni: un file eliminato e poi ricomparso entro
+# la finestra esce solo in files, mai anche in removedFiles. Una riga e' identificata dai campi
+# di ROW_IDENTITY piu' il numero di occorrenza nel file (righe identiche ripetute restano
+# distinte): a parita' di identita' un valore diverso negli altri campi (severita', durata, ...)
+# e' un aggiornamento.
+#
+# Il log e' limitato (DW_CHANGELOG_VERSIONS versioni, DW_CHANGELOG_ROWS righe in totale): le
+# versioni piu' vecchie escono dalla finestra e un client rimasto indietro oltre la finestra
+# (o oltre un cambiamento troppo grande per essere registrato, es. la prima ingestione) riceve
+# la risposta completa.
+
+CHANGELOG_VERSIONS = int(os.environ.get('DW_CHANGELOG_VERSIONS', '64'))
+CHANGELOG_ROWS = int(os.environ.get('DW_CHANGELOG_ROWS', '50000'))
+
+KINDS = ('lga', 'lge', 'lgdRestarts', 'lgd')
+ROW_IDENTITY = {
+    'lga': ('dateIso', 'time', 'type', 'object', 'title'),
+    'lge': ('dateIso', 'time', 'type', 'object', 'title'),
+    'lgdRestarts': ('dateIso', 'time', 'typeReason', 'value'),
+    'lgd': ('metric',),
+}
+
+
+def _keyed(rows, fields):
+    """{(identita'..., occorrenza): riga} delle righe di un file."""
+    out = {}
+    seen = {}
+    for it in rows:
+        ident = tuple(it.get(f) or '' for f in fields)
+        n = seen.get(ident, 0)
+        seen[ident] = n + 1
+        out[ident + (n,)] = it
+    return out
+
+
+def diff_file(old, new):
+    """Differenze tra due risultati di parse dello stesso file ({kind: righe}; old None se il
+    file e' nuovo). Ritorna ({kind: {'added', 'updated', 'removed'}}, righe coinvolte); ogni
+    lista contiene coppie (chiave, riga) con la chiave calcolata sull'intero file."""
+    out = {}
+    size = 0
+    for kind in KINDS:
+        new_rows = new.get(kind) or []
+        old_rows = (old.get(kind) or []) if old is not None else []
+        if old_rows == new_rows:
+            continue
+        fields = ROW_IDENTITY[kind]
+        before = _keyed(old_rows, fields)
+        after = _keyed(new_rows, fields)
+        added = [(k, it) for k, it in after.items() if k not in before]
+        removed = [(k, it) for k, it in before.items() if k not in after]
+        updated = [(k, it) for k, it in after.items() if k in before and before[k] != it]
+        if added or removed or updated:
+            out[kind] = {'added': added, 'updated': updated, 'removed': removed}
+            size += len(added) + len(removed) + len(updated)
+    return out, size
+
+
+def new_rows_count(data):
+    return sum(len(data.get(kind) or ()) for kind in KINDS)
+
+
+class Changelog:
+    def __init__(self, max_versions=CHANGELOG_VERSIONS, max_rows=CHANGELOG_ROWS):
+        self.max_versions = max(1, int(max_versions))
+        self.max_rows = max(0, int(max_rows))
+        self._lock = threading.Lock()
+        self._entries = deque()   # (versione, {file: {kind: diff}}, [file rimossi], righe)
+        self.rows = 0
+        self.version = 0          # ultima versione registrata
+        self.floor = None         # versione minima da cui si puo' rispondere con un delta
+        self.deltas = 0
+        self.full = 0
+
+    def record(self, version, files, removed, size):
+        """Registra i cambiamenti che portano alla versione; files None = cambiamento non
+        registrabile (troppo grande): i client precedenti ricevono una risposta completa."""
+        with self._lock:
+            self.version = version
+            if files is None or size > self.max_rows:
+                self._entries.clear()
+                self.rows = 0
+                self.floor = version
+                return
+            if self.floor is None:
+                self.floor = version - 1
+            self._entries.append((version, files, list(removed), size))
+            self.rows += size
+            while self._entries and (len(self._entries) > self.max_versions or self.rows > self.max_rows):
+                old_version, _f, _r, old_size = self._entries.popleft()
+                self.rows -= old_size
+                self.floor = old_version
+
+    def since(self, version):
+        """Cambiamenti composti dalla versione del client a quella corrente:
+        (versione corrente, {'files': {file: {kind: {'added', 'updated', 'removed'}}},
+        'removedFiles': [...]}) oppure (versione corrente, None) se serve un refresh completo."""
+        with self._lock:
+            current = self.version
+            if self.floor is None or version < self.floor or version > current:
+                self.full += 1
+                return current, None
+            self.deltas += 1
+            entries = [e for e in self._entries if e[0] > version]
+        state = {}          # file -> kind -> chiave -> (operazione, riga)
+        removed_files = set()
+        for _v, files, removed, _size in entries:
+            for name, kinds in files.items():
+                # file eliminato e poi ricomparso: le rimozioni delle sue righe sono gia' nello
+                # stato, quindi esce solo in files (un client non deve applicare entrambi)
+                removed_files.discard(name)
+                per_kind = state.setdefault(name, {})
+                for kind, d in kinds.items():
+                    ops = per_kind.setdefault(kind, {})
+                    for op in ('removed', 'updated', 'added'):
+                        for k, it in d[op]:
+                            k = tuple(k)   # liste dopo il passaggio in JSON (snapshot pre-fork)
+                            prev = ops.get(k)
+                            prev_op = prev[0] if prev else None
+                            if op == 'removed':
+                                if prev_op == 'added':
+                                    del ops[k]
+                                else:
+                                    ops[k] = ('removed', it)
+                            elif op == 'added':
+                                ops[k] = ('updated', it) if prev_op == 'removed' else ('added', it)
+                            else:
+                                ops[k] = ('added', it) if prev_op == 'added' else ('updated', it)
+            removed_files.update(removed)
+        files_out = {}
+        for name, per_kind in state.items():
+            if name in removed_files:
+                continue
+            for kind, ops in per_kind.items():
+                if not ops:
+                    continue
+                d = files_out.setdefault(name, {}).setdefault(kind, {'added': [], 'updated': [], 'removed': []})
+                for op, it in ops.values():
+                    d[op].append(it)
+        return current, {'files': files_out, 'removedFiles': sorted(removed_files)}
+
+    def export(self):
+        """Stato serializzabile (meta dello snapshot pre-fork)."""
+        with self._lock:
+            return {
+                'version': self.version,
+                'floor': self.floor,
+                'entries': [[v, files, removed, size] for v, files, removed, size in self._entries],
+            }
+
+    def load(self, data):
+        with self._lock:
+            self._entries = deque(tuple(e) for e in data.get('entries') or [])
+            self.rows = sum(e[3] for e in self._entries)
+            self.version = data.get('version') or 0
+            self.floor = data.get('floor')
+
+    def stats(self):
+        with self._lock:
+            return {
+                'versions': len(self._entries),
+                'rows': self.rows,
+                'maxVersions': self.max_versions,
+                'maxRows': self.max_rows,
+                'version': self.version,
+                'floor': self.floor,
+                'deltaResponses': self.deltas,
+                'fullResponses': self.full,
+            }
@@ -0,0 +1,230 @@
+import os
+import json
+import time
+import heapq
+import bisect
+import calendar
+
+# Correlazione dei disservizi tra nodi (incidenti di sito/regione).
+#
+# Ogni nodo ha una timeline di intervalli [inizio, inizio + downtime] ricavati dai restart LGD
+# (righe gia' ordinate per tempo all'ingestione). I nodi vengono raggruppati per sito (nome del
+# nodo senza l'ultima lettera di tecnologia: CZ59E, CZ59L, CZ59T -> CZ59), per regione (prime due
+# lettere) o per l'intera rete, oppure secondo una mappa esterna (DW_SITE_MAP). Per ogni gruppo le
+# timeline dei nodi vengono fuse con un merge k-way per istante di inizio e scandite una volta sola
+# (sort-merge window join): un intervallo che inizia entro `gap` secondi dall'orizzonte del cluster
+# corrente lo estende, altrimenti il cluster si chiude. Ogni intervallo sposta l'orizzonte al piu'
+# di `max_extend` secondi dal proprio inizio: un disservizio lungo (es. 20 giorni di PowerReset)
+# resta nel cluster in cui inizia, con fine e downtime reali, ma non assorbe tutti i disservizi
+# successivi del gruppo; l'incidente lo riporta in longOutages. I cluster con almeno `min_nodes`
+# nodi distinti sono gli incidenti. Costo O(N log k) sull'intera rete, nessun confronto a coppie.
+#
+# Join causale allarmi/disservizi: per ogni nodo i tempi degli eventi LGA/LGE (ordinati) vengono
+# accoppiati agli inizi dei disservizi con due puntatori monotoni (finestra +/- N secondi), in
+# tempo lineare O(disservizi + eventi) piu' la dimensione del risultato.
+
+SITE_MAP_PATH = os.environ.get('DW_SITE_MAP', '')
+# secondi di cui un singolo intervallo puo' estendere l'orizzonte di un cluster (maxExtend=)
+MAX_EXTEND = 3600
+GROUPS = ('site', 'region', 'network')
+
+_EPOCH_DAYS = {}
+
+
+def to_epoch(date_iso, time_str):
+    """Secondi (UTC convenzionale) da 'YYYY-MM-DD' e 'HH:MM:SS'; None se non interpretabili."""
+    try:
+        day = _EPOCH_DAYS.get(date_iso)
+        if day is None:
+            day = calendar.timegm((int(date_iso[0:4]), int(date_iso[5:7]), int(date_iso[8:10]), 0, 0, 0, 0, 0, 0))
+            _EPOCH_DAYS[date_iso] = day
+        return day + int(time_str[0:2]) * 3600 + int(time_str[3:5]) * 60 + int(time_str[6:8])
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def format_epoch(ts):
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(ts))
+
+
+def load_site_map(path=SITE_MAP_PATH):
+    """Mappa opzionale nodo -> sito (o -> {"site": ..., "region": ...}) da file JSON."""
+    if not path:
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            raw = json.load(f)
+    except Exception:
+        return {}
+    out = {}
+    for node, value in raw.items():
+        entry = value if isinstance(value, dict) else {'site': value}
+        out[node_base(node)] = {k: str(v) for k, v in entry.items() if v}
+    return out
+
+
+def node_base(name):
+    name = (name or '').strip()
+    return (name[:-4] if name.lower().endswith('.log') else name).upper()
+
+
+def group_of(node, group='site', site_map=None):
+    base = node_base(node)
+    mapped = (site_map or {}).get(base) or {}
+    if group == 'network':
+        return '*'
+    if group == 'region':
+        if mapped.get('region'):
+            return mapped['region']
+        return (mapped.get('site') or base)[:2]
+    if mapped.get('site'):
+        return mapped['site']
+    return base[:-1] if len(base) > 1 else base
+
+
+class Timeline:
+    """Intervalli di disservizio di un nodo, ordinati per inizio (liste parallele; positions =
+    posizioni delle righe nel dataset lgdRestarts)."""
+
+    __slots__ = ('node', 'starts', 'ends', 'reasons', 'positions')
+
+    def __init__(self, node):
+        self.node = node
+        self.starts = []
+        self.ends = []
+        self.reasons = []
+        self.positions = []
+
+
+def build_timelines(rows, duration_fn):
+    """Timeline per nodo dalle righe lgdRestarts (blocchi per file ordinati per tempo)."""
+    timelines = {}
+    for pos, it in enumerate(rows):
+        start = to_epoch(it.get('dateIso') or '', it.get('time') or '')
+        if start is None:
+            continue
+        node = node_base(it.get('fileName'))
+        tl = timelines.get(node)
+        if tl is None:
+            tl = timelines[node] = Timeline(node)
+        tl.starts.append(start)
+        tl.ends.append(start + max(0, duration_fn(it.get('duration'))))
+        tl.reasons.append(it.get('typeReason') or '')
+        tl.positions.append(pos)
+    for tl in timelines.values():
+        # normalmente gia' ordinate: il controllo evita l'ordinamento nel caso comune
+        if any(a > b for a, b in zip(tl.starts, tl.starts[1:])):
+            order = sorted(range(len(tl.starts)), key=tl.starts.__getitem__)
+            tl.starts = [tl.starts[i] for i in order]
+            tl.ends = [tl.ends[i] for i in order]
+            tl.reasons = [tl.reasons[i] for i in order]
+            tl.positions = [tl.positions[i] for i in order]
+    return timelines
+
+
+def build_event_index(rows):
+    """{nodo: (tempi, posizioni, titoli)} degli eventi LGA/LGE, in ordine di tempo per nodo."""
+    index = {}
+    for pos, it in enumerate(rows):
+        ts = to_epoch(it.get('dateIso') or '', it.get('time') or '')
+        if ts is None:
+            continue
+        node = node_base(it.get('fileName'))
+        entry = index.get(node)
+        if entry is None:
+            entry = index[node] = ([], [], [])
+        entry[0].append(ts)
+        entry[1].append(pos)
+        entry[2].append(it.get('title') or 'N/D')
+    for node, (times, positions, titles) in index.items():
+        if any(a > b for a, b in zip(times, times[1:])):
+            order = sorted(range(len(times)), key=times.__getitem__)
+            index[node] = ([times[i] for i in order], [positions[i] for i in order], [titles[i] for i in order])
+    return index
+
+
+def window_matches(starts, times, window):
+    """Per ogni inizio (in ordine) l'intervallo [lo, hi) di times entro +/- window secondi.
+    Entrambi i puntatori avanzano soltanto: O(len(starts) + len(times))."""
+    out = []
+    lo = hi = 0
+    n = len(times)
+    for s in starts:
+        while lo < n and times[lo] < s - window:
+            lo += 1
+        if hi < lo:
+            hi = lo
+        while hi < n and times[hi] <= s + window:
+            hi += 1
+        out.append((lo, hi))
+    return out
+
+
+def _intervals(tl, lo, hi, reason_match):
+    """Intervalli della timeline con inizio in [lo, hi], in ordine: (inizio, fine, nodo, causa)."""
+    i = bisect.bisect_left(tl.starts, lo) if lo is not None else 0
+    j = bisect.bisect_right(tl.starts, hi) if hi is not None else len(tl.starts)
+    node = tl.node
+    for k in range(i, j):
+        reason = tl.reasons[k]
+        if reason_match is None or reason_match(reason):
+            yield tl.starts[k], tl.ends[k], node, reason
+
+
+def correlate(timelines, group='site', gap=60, min_nodes=2, start=None, end=None,
+              reason_match=None, site_map=None, only_group=None, max_extend=MAX_EXTEND):
+    """Incidenti: cluster di intervalli sovrapposti (o distanti al piu' gap secondi) nello
+    stesso gruppo con almeno min_nodes nodi distinti; ogni intervallo allunga l'orizzonte del
+    cluster al piu' di max_extend secondi dal suo inizio. Ritorna la lista (non ordinata)."""
+    groups = {}
+    for node, tl in timelines.items():
+        key = group_of(node, group, site_map)
+        if only_group and key.upper() != only_group.upper():
+            continue
+        groups.setdefault(key, []).append(tl)
+    incidents = []
+    for key, tls in groups.items():
+        if len(tls) < min_nodes:
+            continue
+        merged = heapq.merge(*[_intervals(tl, start, end, reason_match) for tl in tls])
+        cluster = None
+        for s, e, node, reason in merged:
+            if cluster is not None and s <= cluster['reach'] + gap:
+                if s > cluster['end']:
+                    cluster['union'] += e - s
+                elif e > cluster['end']:
+                    cluster['union'] += e - cluster['end']
+                cluster['end'] = max(cluster['end'], e)
+                cluster['reach'] = max(cluster['reach'], min(e, s + max_extend))
+            else:
+                if cluster is not None and len(cluster['nodes']) >= min_nodes:
+                    incidents.append(_incident(key, cluster))
+                cluster = {'start': s, 'end': e, 'reach': min(e, s + max_extend), 'union': e - s, 'nodes': {},
+                           'reasons': {}, 'events': 0, 'downtime': 0, 'long': []}
+            if e - s > max_extend:
+                cluster['long'].append({'node': node, 'start': format_epoch(s), 'durationSeconds': e - s,
+                                        'typeReason': reason})
+            cluster['events'] += 1
+            cluster['downtime'] += e - s
+            cluster['nodes'][node] = cluster['nodes'].get(node, 0) + 1
+            cluster['reasons'][reason] = cluster['reasons'].get(reason, 0) + 1
+        if cluster is not None and len(cluster['nodes']) >= min_nodes:
+            incidents.append(_incident(key, cluster))
+    return incidents
+
+
+def _incident(key, c):
+    return {
+        'group': key,
+        'start': format_epoch(c['start']),
+        'end': format_epoch(c['end']),
+        'spanSeconds': c['end'] - c['start'],
+        'nodeCount': len(c['nodes']),
+        'nodes': sorted(c['nodes']),
+        'events': c['events'],
+        'eventsByNode': dict(sorted(c['nodes'].items())),
+        'combinedDowntimeSeconds': c['downtime'],
+        'unionDowntimeSeconds': c['union'],
+        'typeReasons': dict(sorted(c['reasons'].items(), key=lambda kv: (-kv[1], kv[0]))),
+        'longOutages': c['long'],
+    }
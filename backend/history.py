@@ -0,0 +1,449 @@
+import os
+import re
+import json
+import time
+import bisect
+import datetime
+import itertools
+import threading
+from collections import OrderedDict
+
+import query_engine
+import snapshot
+
+# Storico multi-batch partizionato per giorno.
+#
+# Ogni batch AMOS (intestazione "Logging to file .../amosbatch/2025-10-07_11-07-01_53697/NODO.log")
+# sovrascrive in DW i file con lo stesso nome di nodo: DW contiene quindi solo l'ultima finestra di
+# ~30 giorni. All'ingestione le righe LGA/LGE/LGD restarts di ogni file nuovo vengono anche
+# archiviate qui, una partizione per giorno (dateIso) nel formato colonnare di snapshot.py (mmap,
+# righe costruite solo su richiesta). Le finestre di batch successivi si sovrappongono: le righe
+# uguali vengono deduplicate (per ogni riga si tengono tante copie quante ne ha il batch che ne
+# contiene di piu', cosi' i duplicati legittimi dentro lo stesso file restano).
+#
+# manifest.json tiene i batch (id, istante di raccolta, finestra di date, file archiviati con la
+# loro firma) e le partizioni presenti: le query con from/to aprono solo le partizioni dei giorni
+# richiesti (partition pruning) e la disponibilita' di lungo periodo legge solo le colonne dei
+# restart LGD di quei giorni.
+#
+# Configurazione: DW_HISTORY_DIR (default backend/history), DW_HISTORY=0 disattiva l'archiviazione,
+# DW_HISTORY_OPEN numero massimo di partizioni tenute aperte (default 64), DW_HISTORY_LOOKBACK_DAYS
+# giorni letti prima di from per i disservizi a cavallo dell'inizio del periodo (default 31).
+
+HISTORY_DIR = os.environ.get('DW_HISTORY_DIR') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'history')
+HISTORY_ENABLED = os.environ.get('DW_HISTORY', '1') != '0'
+HISTORY_OPEN = int(os.environ.get('DW_HISTORY_OPEN', '64'))
+# giorni prima di from in cui /api/history/availability cerca disservizi che arrivano nel periodo
+HISTORY_LOOKBACK_DAYS = int(os.environ.get('DW_HISTORY_LOOKBACK_DAYS', '31'))
+
+KINDS = ('lga', 'lge', 'lgdRestarts')
+BATCH_RX = re.compile(r'amosbatch/([^/\s]+)/')
+BATCH_TS_RX = re.compile(r'^(\d{4}-\d{2}-\d{2})_(\d{2})-(\d{2})-(\d{2})')
+DAY_RX = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+PARTITION_EXT = '.part'
+
+
+def batch_from_header(line):
+    """Id del batch dalla riga 'Logging to file .../amosbatch/<id>/...' (None se assente)."""
+    m = BATCH_RX.search(line)
+    return m.group(1) if m else None
+
+
+def batch_id(header_id, sig):
+    """Id del batch di un file: quello dell'intestazione, altrimenti derivato dall'mtime."""
+    if header_id:
+        return header_id
+    return 'mtime-' + time.strftime('%Y-%m-%d_%H-%M-%S', time.gmtime(sig[1] / 1e9))
+
+
+def collected_at(bid):
+    """Istante di raccolta 'YYYY-MM-DD HH:MM:SS' codificato nell'id del batch ('' se non noto)."""
+    m = BATCH_TS_RX.match(bid.replace('mtime-', '', 1))
+    return f'{m.group(1)} {m.group(2)}:{m.group(3)}:{m.group(4)}' if m else ''
+
+
+def _day_ordinal(day):
+    return datetime.date(int(day[0:4]), int(day[5:7]), int(day[8:10])).toordinal()
+
+
+def _clock_seconds(text):
+    """Secondi dalla mezzanotte di 'HH:MM:SS' (0 se non valido)."""
+    try:
+        h, m, sec = text.split(':')
+        return int(h) * 3600 + int(m) * 60 + int(sec)
+    except (ValueError, AttributeError):
+        return 0
+
+
+def _sort_key(it):
+    return it.get('fileName') or '', it.get('time') or ''
+
+
+def _archived_counts(rows, fields, names):
+    """{chiave riga: copie} delle righe gia' archiviate dei file in names, lette dalle colonne
+    della partizione senza costruire i dict."""
+    counts = {}
+    name_col = rows.column('fileName')
+    cols = [rows.column(f) for f in fields]
+    if name_col is None or any(c is None for c in cols):
+        return counts
+    value = rows.value
+    wanted = {sid for sid in set(name_col) if value(sid) in names}
+    for pos, sid in enumerate(name_col):
+        if sid in wanted:
+            k = tuple(value(c[pos]) for c in cols)
+            counts[k] = counts.get(k, 0) + 1
+    return counts
+
+
+def _new_rows(old, by_batch):
+    """Righe dei batch non ancora presenti nella partizione: per ogni chiave si aggiungono solo
+    le copie oltre il massimo gia' visto. Ritorna (righe nuove, {batch: righe aggiunte})."""
+    sample = next(iter(by_batch.values()))[0]
+    fields = [f for f in (old.fields if len(old) else sample.keys()) if f != 'batch']
+    names = {it.get('fileName') for lst in by_batch.values() for it in lst}
+    counts = _archived_counts(old, fields, names) if len(old) else {}
+    added = []
+    per_batch = {}
+    for bid in sorted(by_batch):
+        seen = {}
+        n_added = 0
+        for it in by_batch[bid]:
+            k = tuple(it.get(f) or '' for f in fields)
+            n = seen.get(k, 0) + 1
+            seen[k] = n
+            if n > counts.get(k, 0):
+                row = dict(zip(fields, k))
+                row['batch'] = bid
+                added.append(row)
+                n_added += 1
+        for k, n in seen.items():
+            if n > counts.get(k, 0):
+                counts[k] = n
+        per_batch[bid] = n_added
+    return added, per_batch
+
+
+class HistoryStore:
+    def __init__(self, root=HISTORY_DIR, max_open=HISTORY_OPEN):
+        self.root = root
+        self.max_open = max(1, int(max_open))
+        self._lock = threading.RLock()
+        self._manifest = None
+        self._manifest_sig = None
+        self._days = []
+        self._open = OrderedDict()   # giorno -> (firma file, Snapshot, {kind: Dataset})
+        self.partitions_read = 0
+        self.partitions_pruned = 0
+
+    # --- manifest ------------------------------------------------------------------------
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.root, 'manifest.json')
+
+    def manifest(self):
+        """Manifest corrente (riletto se il file e' cambiato, es. scritto dal master pre-fork)."""
+        path = self.manifest_path
+        try:
+            st = os.stat(path)
+            sig = (st.st_ino, st.st_mtime_ns, st.st_size)
+        except OSError:
+            sig = None
+        if self._manifest is not None and sig == self._manifest_sig:
+            return self._manifest
+        with self._lock:
+            if self._manifest is not None and sig == self._manifest_sig:
+                return self._manifest
+            manifest = {'version': 0, 'batches': {}, 'partitions': {}}
+            if sig is not None:
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        manifest.update(json.load(f))
+                except Exception:
+                    pass
+            self._manifest = manifest
+            self._manifest_sig = sig
+            self._days = sorted(manifest['partitions'])
+        return self._manifest
+
+    def _save_manifest(self, manifest):
+        os.makedirs(self.root, exist_ok=True)
+        tmp = f'{self.manifest_path}.{os.getpid()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, separators=(',', ':'))
+        os.replace(tmp, self.manifest_path)
+        self._manifest_sig = None   # forza la rilettura (aggiorna anche l'elenco dei giorni)
+
+    def needs(self, bid, name, sig):
+        """True se il file del batch non e' ancora archiviato con questa firma."""
+        entry = self.manifest()['batches'].get(bid)
+        return entry is None or entry['files'].get(name) != list(sig)
+
+    def has_file(self, bid, name):
+        """True se il file del batch e' gia' stato archiviato (con qualsiasi firma)."""
+        entry = self.manifest()['batches'].get(bid)
+        return entry is not None and name in entry['files']
+
+    # --- ingestione ----------------------------------------------------------------------
+
+    def ingest(self, files):
+        """Archivia i file [(batch, fileName, firma, dati di parse_log_file)]. Ritorna
+        {'files', 'rows', 'partitions'}: righe nuove (dopo deduplica) e partizioni riscritte."""
+        with self._lock:
+            manifest = self.manifest()
+            incoming = {}   # giorno -> kind -> batch -> righe
+            valid = {}
+            for bid, name, sig, data in files:
+                entry = manifest['batches'].setdefault(bid, {
+                    'collectedAt': collected_at(bid), 'from': '', 'to': '',
+                    'files': {}, 'rows': 0, 'ingestedAt': None,
+                })
+                entry['files'][name] = list(sig)
+                entry['ingestedAt'] = time.strftime('%Y-%m-%d %H:%M:%S')
+                for kind in KINDS:
+                    for it in data.get(kind) or ():
+                        day = it.get('dateIso') or ''
+                        ok = valid.get(day)
+                        if ok is None:
+                            ok = valid[day] = DAY_RX.match(day) is not None
+                        if not ok:
+                            continue
+                        incoming.setdefault(day, {}).setdefault(kind, {}).setdefault(bid, []).append(it)
+                        if not entry['from'] or day < entry['from']:
+                            entry['from'] = day
+                        if day > entry['to']:
+                            entry['to'] = day
+            added_total = 0
+            manifest['version'] = manifest.get('version', 0) + 1
+            for day in sorted(incoming):
+                added_total += self._merge_day(manifest, day, incoming[day])
+            self._save_manifest(manifest)
+            return {'files': len(files), 'rows': added_total, 'partitions': len(incoming)}
+
+    def _merge_day(self, manifest, day, by_kind):
+        part = manifest['partitions'].get(day) or {'rows': {}, 'batches': []}
+        current = self._load(day)
+        old = {kind: current[2][kind].rows if current else () for kind in KINDS}
+        batches = set(part['batches'])
+        added = {}
+        for kind, by_batch in by_kind.items():
+            rows, per_batch = _new_rows(old[kind], by_batch)
+            if rows:
+                added[kind] = rows
+            for bid, n in per_batch.items():
+                manifest['batches'][bid]['rows'] += n
+            batches.update(by_batch)
+        part['batches'] = sorted(batches)
+        manifest['partitions'][day] = part
+        if not added:
+            return 0
+        merged = {}
+        for kind in KINDS:
+            rows = list(old[kind])
+            if kind in added:
+                rows.extend(added[kind])
+                # blocchi per file ordinati per ora (stesso giorno): la partizione e' time_sorted
+                rows.sort(key=_sort_key)
+            merged[kind] = rows
+        size = snapshot.write_snapshot(self._path(day), manifest['version'], merged,
+                                       meta={'day': day, 'batches': part['batches']})
+        part['rows'] = {k: len(v) for k, v in merged.items()}
+        part['bytes'] = size
+        self._open.pop(day, None)
+        return sum(len(v) for v in added.values())
+
+    # --- lettura -------------------------------------------------------------------------
+
+    def _path(self, day):
+        return os.path.join(self.root, day[:7], day + PARTITION_EXT)
+
+    def _load(self, day):
+        """(firma, Snapshot, {kind: Dataset}) della partizione, o None se non esiste."""
+        path = self._path(day)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        sig = (st.st_ino, st.st_mtime_ns, st.st_size)
+        with self._lock:
+            entry = self._open.get(day)
+            if entry is not None and entry[0] == sig:
+                self._open.move_to_end(day)
+                return entry
+            snap = snapshot.Snapshot(path)
+            datasets = {kind: query_engine.Dataset(snap.rows(kind), sig, time_sorted=True) for kind in KINDS}
+            entry = (snap.signature, snap, datasets)
+            self._open[day] = entry
+            while len(self._open) > self.max_open:
+                self._open.popitem(last=False)
+            return entry
+
+    def days(self, date_from='', date_to=''):
+        """Giorni con una partizione nell'intervallo [date_from, date_to] (estremi opzionali)."""
+        self.manifest()
+        days = self._days
+        i = bisect.bisect_left(days, date_from) if date_from else 0
+        j = bisect.bisect_right(days, date_to) if date_to else len(days)
+        self.partitions_pruned += len(days) - max(0, j - i)
+        return days[i:j]
+
+    def datasets(self, kind, date_from='', date_to='', reverse=False):
+        """(giorno, Dataset) delle partizioni del periodo, aperte solo quando servono."""
+        days = self.days(date_from, date_to)
+        for day in (reversed(days) if reverse else days):
+            entry = self._load(day)
+            if entry is not None:
+                self.partitions_read += 1
+                yield day, entry[2][kind]
+
+    def query(self, kind, q, date_from='', date_to=''):
+        """Esegue la Query sulle sole partizioni del periodo. Ritorna (righe, totale, partizioni lette);
+        totale None se la lettura si e' fermata al limite."""
+        desc = q.time_order()
+        read = 0
+        if q.sort and desc is None:
+            # ordinamento generico: tutte le corrispondenze, poi sort globale
+            sub = query_engine.Query(q.where, q.sort)
+            out = []
+            for _day, ds in self.datasets(kind, date_from, date_to):
+                read += 1
+                out.extend(sub.run(ds)[0])
+            for field, d in reversed(q.sort):
+                out.sort(key=lambda it, f=field: str(it.get(f) or ''), reverse=d)
+            total = len(out)
+        else:
+            # partizioni disgiunte per giorno: in ordine temporale basta concatenarle, fermandosi
+            # al limite senza aprire le successive
+            stop = None if q.limit is None else q.offset + q.limit
+            out = []
+            total = 0
+            for _day, ds in self.datasets(kind, date_from, date_to, reverse=bool(desc)):
+                read += 1
+                sub = query_engine.Query(q.where, q.sort, None, None if stop is None else stop - len(out))
+                rows, n = sub.run(ds)
+                out.extend(rows)
+                if n is None or (stop is not None and len(out) >= stop):
+                    total = None
+                    break
+                total += n
+        end = None if q.limit is None else q.offset + q.limit
+        out = out[q.offset:end]
+        if q.fields:
+            out = [{f: it.get(f, '') for f in q.fields} for it in out]
+        return out, total, read
+
+    def coverage(self, date_from='', date_to=''):
+        """{fileName: giorni osservati} nell'intervallo: unione delle finestre dei batch che
+        contengono il nodo."""
+        lo = _day_ordinal(date_from) if date_from else None
+        hi = _day_ordinal(date_to) if date_to else None
+        spans = {}
+        for entry in self.manifest()['batches'].values():
+            if not entry['from']:
+                continue
+            a, b = _day_ordinal(entry['from']), _day_ordinal(entry['to'])
+            if lo is not None:
+                a = max(a, lo)
+            if hi is not None:
+                b = min(b, hi)
+            if a > b:
+                continue
+            for name in entry['files']:
+                spans.setdefault(name, []).append((a, b))
+        out = {}
+        for name, lst in spans.items():
+            lst.sort()
+            days = 0
+            end = None
+            for a, b in lst:
+                if end is None or a > end:
+                    days += b - a + 1
+                    end = b
+                elif b > end:
+                    days += b - end
+                    end = b
+            out[name] = days
+        return out
+
+    def availability(self, duration_fn, date_from='', date_to='', key_fn=None):
+        """Disponibilita' per nodo (o per gruppo con key_fn(fileName)) nel periodo, dai restart LGD
+        archiviati: {chiave: {'outages', 'downtimeSeconds', 'observedSeconds'}}.
+        Ogni disservizio [inizio, inizio + durata] conta solo per la parte dentro [from, to]; quelli
+        iniziati fino a HISTORY_LOOKBACK_DAYS giorni prima di from che arrivano nel periodo vengono
+        letti dalle partizioni precedenti. Il downtime di un nodo non supera il tempo osservato."""
+        lo = _day_ordinal(date_from) * 86400 if date_from else None
+        hi = (_day_ordinal(date_to) + 1) * 86400 if date_to else None
+        parts = []
+        if date_from and HISTORY_LOOKBACK_DAYS > 0:
+            first = _day_ordinal(date_from)
+            before = datetime.date.fromordinal(first - HISTORY_LOOKBACK_DAYS).isoformat()
+            last = datetime.date.fromordinal(first - 1).isoformat()
+            parts.append(self.datasets('lgdRestarts', before, last))
+        parts.append(self.datasets('lgdRestarts', date_from, date_to))
+        stats = {}
+        for day, ds in (p for part in parts for p in part):
+            rows = ds.rows
+            names = rows.column('fileName')
+            values = rows.column('duration')
+            times = rows.column('time')
+            if names is None or values is None:
+                continue
+            base = _day_ordinal(day) * 86400
+            # colonne di id stringa: nomi, durate e orari convertiti una volta per valore distinto
+            node_of = {}
+            seconds_of = {}
+            start_of = {}
+            times = times if times is not None else itertools.repeat(None)
+            for sid_name, sid_dur, sid_time in zip(names, values, times):
+                name = node_of.get(sid_name)
+                if name is None:
+                    name = node_of[sid_name] = rows.value(sid_name)
+                sec = seconds_of.get(sid_dur)
+                if sec is None:
+                    sec = seconds_of[sid_dur] = max(0, duration_fn(rows.value(sid_dur)))
+                start = start_of.get(sid_time)
+                if start is None:
+                    clock = rows.value(sid_time) if sid_time is not None else ''
+                    start = start_of[sid_time] = base + _clock_seconds(clock)
+                end = start + sec
+                if lo is not None and start < lo:
+                    start = lo
+                if hi is not None and end > hi:
+                    end = hi
+                if end < start or (end == start and sec):
+                    continue    # fuori dal periodo
+                st = stats.get(name)
+                if st is None:
+                    st = stats[name] = [0, 0]
+                st[0] += 1
+                st[1] += end - start
+        out = {}
+        for name, days in self.coverage(date_from, date_to).items():
+            key = key_fn(name) if key_fn else name
+            agg = out.get(key)
+            if agg is None:
+                agg = out[key] = {'outages': 0, 'downtimeSeconds': 0, 'observedSeconds': 0, 'nodes': 0}
+            outages, downtime = stats.get(name, (0, 0))
+            observed = days * 86400
+            agg['outages'] += outages
+            agg['downtimeSeconds'] += min(downtime, observed)
+            agg['observedSeconds'] += observed
+            agg['nodes'] += 1
+        return out
+
+    def stats(self):
+        manifest = self.manifest()
+        days = self._days
+        return {
+            'root': self.root,
+            'batches': len(manifest['batches']),
+            'partitions': len(days),
+            'firstDay': days[0] if days else None,
+            'lastDay': days[-1] if days else None,
+            'bytes': sum(p.get('bytes', 0) for p in manifest['partitions'].values()),
+            'openPartitions': len(self._open),
+            'partitionsRead': self.partitions_read,
+            'partitionsPruned': self.partitions_pruned,
+        }
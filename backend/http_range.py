@@ -0,0 +1,70 @@
+import email.utils
+
+# Richieste Range (RFC 9110) per i file serviti dal backend: export zip e file statici.
+#
+# Si gestisce un solo intervallo per richiesta (quello che usano browser e download manager per
+# riprendere un download): piu' intervalli o una sintassi non valida vengono ignorati e si
+# risponde 200 con il file intero, come consentito dalla RFC. If-Range confronta ETag (forte,
+# da dimensione e mtime) o Last-Modified: se il file e' cambiato si riparte da capo.
+
+
+class RangeNotSatisfiable(ValueError):
+    pass
+
+
+def etag(st):
+    return f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def last_modified(st):
+    return email.utils.formatdate(st.st_mtime, usegmt=True)
+
+
+def parse_range(value, size):
+    """(inizio, fine esclusa) dell'intervallo richiesto, None se va servito il file intero.
+    Solleva RangeNotSatisfiable se l'intervallo cade oltre la fine del file."""
+    unit, sep, spec = (value or '').partition('=')
+    if not sep or unit.strip().lower() != 'bytes' or ',' in spec:
+        return None
+    first, sep, last = spec.strip().partition('-')
+    first, last = first.strip(), last.strip()
+    if not sep or not (first.isdigit() or last.isdigit()):
+        return None
+    if not first:
+        # suffisso: ultimi N byte
+        n = int(last)
+        if n == 0 or size == 0:
+            raise RangeNotSatisfiable(value)
+        return max(0, size - n), size
+    start = int(first)
+    if last and not last.isdigit():
+        return None
+    end = int(last) + 1 if last else size
+    if last and end <= start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable(value)
+    return start, min(end, size)
+
+
+def plan(get_header, st):
+    """Risposta per un file con stat st: (status, offset, lunghezza, header).
+    get_header(nome) legge gli header della richiesta; Content-Length resta al chiamante."""
+    size = st.st_size
+    tag = etag(st)
+    modified = last_modified(st)
+    headers = {'Accept-Ranges': 'bytes', 'ETag': tag, 'Last-Modified': modified}
+    value = get_header('Range')
+    if_range = (get_header('If-Range') or '').strip()
+    if not value or (if_range and if_range not in (tag, modified)):
+        return 200, 0, size, headers
+    try:
+        span = parse_range(value, size)
+    except RangeNotSatisfiable:
+        headers['Content-Range'] = f'bytes */{size}'
+        return 416, 0, 0, headers
+    if span is None:
+        return 200, 0, size, headers
+    start, end = span
+    headers['Content-Range'] = f'bytes {start}-{end - 1}/{size}'
+    return 206, start, end - start, headers
@@ -0,0 +1,186 @@
+import correlation
+
+# Inventario dei nodi ricavato all'ingestione dalle righe di sessione AMOS di ogni log:
+# 'Connected to <ip> (SubNetwork=...,MeContext=...,ManagedElement=...)', 'Checking MOM
+# version...', 'Checking ip contact...OK|Not OK' (+ 'Unable to connect to ...'), 'Node uptime
+# since last restart' e le tabelle di hget sulle celle (EUtranCellFDD, NbIotCell, NRCellDU).
+#
+# Il catalogo e' un dict nodo -> scheda, con indici secondari per IP e per cella (ricerche O(1)),
+# e per ogni nodo gli intervalli [inizio, fine) delle sue righe nelle liste aggregate lga, lge e
+# lgdRestarts (blocchi contigui per file): /api/node/summary legge solo quei blocchi. Ad ogni
+# versione si ricalcolano solo le schede dei file cambiati; il catalogo viaggia nel meta dello
+# snapshot pre-fork.
+
+CELL_TYPES = ('EUtranCellFDD', 'EUtranCellTDD', 'NbIotCell', 'NRCellDU')
+SPAN_KINDS = ('lga', 'lge', 'lgdRestarts')
+
+
+def new_meta():
+    """Metadati di sessione di un file di log (riempiti dal parser)."""
+    return {'ip': '', 'dn': '', 'momVersion': '', 'uptimeSeconds': None, 'ipContact': '',
+            'error': '', 'cells': {}}
+
+
+def copy_meta(meta):
+    out = dict(meta)
+    out['cells'] = {t: dict(c) for t, c in (meta.get('cells') or {}).items()}
+    return out
+
+
+def _dn_parts(dn):
+    parts = {}
+    for part in (dn or '').split(','):
+        k, sep, v = part.partition('=')
+        if sep:
+            parts[k.strip()] = v.strip()
+    return parts
+
+
+def make_record(file_name, data):
+    """Scheda di inventario di un file dal risultato di parse_log_file()."""
+    meta = data.get('node') or new_meta()
+    node = correlation.node_base(file_name)
+    dn = _dn_parts(meta.get('dn'))
+    cells = meta.get('cells') or {}
+    contact = meta.get('ipContact') or ''
+    last = ''
+    for kind in SPAN_KINDS:
+        rows = data.get(kind) or ()
+        if rows:
+            it = rows[-1]
+            ts = f"{it.get('dateIso') or ''} {it.get('time') or ''}".strip()
+            if ts > last:
+                last = ts
+    return {
+        'node': node,
+        'fileName': file_name,
+        'site': correlation.group_of(node, 'site'),
+        'region': correlation.group_of(node, 'region'),
+        'ip': meta.get('ip') or '',
+        'subNetwork': dn.get('SubNetwork', ''),
+        'meContext': dn.get('MeContext', ''),
+        'managedElement': dn.get('ManagedElement', ''),
+        'momVersion': meta.get('momVersion') or '',
+        'uptimeSeconds': meta.get('uptimeSeconds'),
+        'ipContact': contact,
+        'reachable': contact.upper() == 'OK' if contact else bool(meta.get('dn')),
+        'error': meta.get('error') or '',
+        'cells': {t: dict(sorted(c.items())) for t, c in sorted(cells.items())},
+        'cellCount': sum(len(c) for c in cells.values()),
+        'batch': data.get('batch') or '',
+        'lga': len(data.get('lga') or ()),
+        'lge': len(data.get('lge') or ()),
+        'restarts': len(data.get('lgdRestarts') or ()),
+        'lastEvent': last,
+    }
+
+
+# Ordinamenti di /api/nodes: nome -> chiave (il nodo spareggia); '-nome' = decrescente
+SORTS = {
+    'node': lambda r: r['node'],
+    'ip': lambda r: (tuple(int(p) if p.isdigit() else 0 for p in r['ip'].split('.')), r['node']),
+    'momVersion': lambda r: (r['momVersion'], r['node']),
+    'uptime': lambda r: (r['uptimeSeconds'] if r['uptimeSeconds'] is not None else -1, r['node']),
+    'cells': lambda r: (r['cellCount'], r['node']),
+    'lga': lambda r: (r['lga'], r['node']),
+    'lge': lambda r: (r['lge'], r['node']),
+    'restarts': lambda r: (r['restarts'], r['node']),
+    'lastEvent': lambda r: (r['lastEvent'], r['node']),
+}
+
+
+class Catalog:
+    """Schede per nodo (dict) con indici per IP e cella; immutabile: update() ne crea uno nuovo
+    (i lettori della versione precedente restano coerenti). rows sono le liste aggregate della
+    stessa versione a cui si riferiscono gli intervalli."""
+
+    def __init__(self, records=None, spans=None, rows=None, version=0):
+        self.records = records or {}     # nodo -> scheda
+        self.spans = spans or {}         # nodo -> {kind: [inizio, fine)}
+        self.rows = rows or {}           # kind -> righe aggregate (liste o snapshot.SnapshotRows)
+        self.version = version
+        self.by_ip = {}
+        self.by_cell = {}                # nome cella o cellId -> [nodi]
+        for node, rec in self.records.items():
+            if rec['ip']:
+                self.by_ip.setdefault(rec['ip'], []).append(node)
+            for cells in rec['cells'].values():
+                for name, cid in cells.items():
+                    self.by_cell.setdefault(name.upper(), []).append(node)
+                    if cid is not None:
+                        self.by_cell.setdefault(str(cid), []).append(node)
+
+    def update(self, files, changed, removed, spans, rows, version):
+        """Nuovo catalogo con le schede dei file cambiati ricalcolate e quelle dei rimossi tolte.
+        files: fileName -> {'data': ...} (cache per file del server)."""
+        records = dict(self.records)
+        for name in removed:
+            records.pop(correlation.node_base(name), None)
+        for name in changed:
+            records[correlation.node_base(name)] = make_record(name, files[name]['data'])
+        return Catalog(records, spans, rows, version)
+
+    def get(self, node):
+        return self.records.get(correlation.node_base(node))
+
+    def bucket(self, node, kind):
+        """Righe del nodo nel dataset kind (blocco del suo file, in ordine di tempo)."""
+        span = self.spans.get(correlation.node_base(node))
+        rows = self.rows.get(kind)
+        if not span or rows is None:
+            return []
+        start, end = span[kind]
+        return rows[start:end]
+
+    def select(self, node=(), q='', site='', region='', ip='', contact='', mom='', cell='', cell_type=''):
+        """Schede che rispettano tutti i filtri indicati (lista non ordinata)."""
+        if node:
+            recs = [r for r in (self.get(n) for n in node) if r is not None]
+        elif ip:
+            recs = [self.records[n] for n in self.by_ip.get(ip, ())]
+        elif cell:
+            recs = [self.records[n] for n in dict.fromkeys(self.by_cell.get(cell.upper(), ()))]
+        else:
+            recs = list(self.records.values())
+        q = q.upper()
+        site = site.upper()
+        region = region.upper()
+        mom = mom.upper()
+        contact = contact.lower()
+        cell_type = {t.upper(): t for t in CELL_TYPES}.get(cell_type.upper(), cell_type)
+        out = []
+        for r in recs:
+            if q and q not in r['node']:
+                continue
+            if site and r['site'].upper() != site:
+                continue
+            if region and r['region'].upper() != region:
+                continue
+            if ip and r['ip'] != ip:
+                continue
+            if contact and (contact == 'ok') != r['reachable']:
+                continue
+            if mom and mom not in r['momVersion'].upper():
+                continue
+            if cell_type and not r['cells'].get(cell_type):
+                continue
+            out.append(r)
+        return out
+
+    def export(self):
+        """Stato serializzabile (meta dello snapshot pre-fork)."""
+        return {'records': self.records, 'spans': self.spans}
+
+    @classmethod
+    def load(cls, data, rows, version):
+        return cls(data.get('records') or {}, data.get('spans') or {}, rows, version)
+
+    def stats(self):
+        reachable = sum(1 for r in self.records.values() if r['reachable'])
+        return {
+            'nodes': len(self.records),
+            'reachable': reachable,
+            'unreachable': len(self.records) - reachable,
+            'cells': sum(r['cellCount'] for r in self.records.values()),
+            'momVersions': len({r['momVersion'] for r in self.records.values() if r['momVersion']}),
+        }
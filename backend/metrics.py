@@ -0,0 +1,276 @@
+import time
+import bisect
+import heapq
+import threading
+
+# Metriche di processo per /api/metrics (JSON e formato testo Prometheus), solo libreria standard.
+# Contatori e istogrammi sono aggiornati dagli handler e dall'ingestione di DW; i gauge che
+# dipendono dallo stato del server (versione dataset, job export) vengono passati al rendering.
+
+# Descrizioni dei gauge passati dal server (nome senza prefisso dw_)
+GAUGE_HELP = {
+    'dataset_version': 'Versione corrente del dataset DW',
+    'dataset_age_seconds': 'Secondi dall\'ultimo cambio di versione del dataset (-1 se mai caricato)',
+    'dataset_files': 'File di log indicizzati',
+    'export_jobs': 'Job di export per stato',
+    'export_queue_depth': 'Job di export in coda o in esecuzione',
+    'sse_subscribers': 'Client collegati a /api/events',
+    'admission_inflight': 'Richieste in esecuzione per corsia di ammissione',
+    'admission_waiting': 'Richieste in coda per corsia di ammissione',
+    'admission_rejected': 'Richieste rifiutate con 429 per corsia (dall\'avvio)',
+    'result_cache_bytes': 'Byte occupati dalla cache dei risultati (json + gzip)',
+    'result_cache_entries': 'Voci nella cache dei risultati',
+    'memory_budget_bytes': 'Budget di memoria per i blocchi di righe per file (0 = illimitato)',
+    'memory_block_bytes': 'Byte stimati dei blocchi di righe per file residenti',
+    'memory_resident_files': 'File con il blocco di righe residente in memoria',
+    'memory_block_evictions': 'Blocchi di righe evitti per il budget di memoria (dall\'avvio)',
+}
+
+# Nome dell'etichetta per i gauge a piu' valori (default: status)
+GAUGE_LABELS = {
+    'admission_inflight': 'lane',
+    'admission_waiting': 'lane',
+    'admission_rejected': 'lane',
+}
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # ultimo = +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        out = []
+        acc = 0
+        for le, n in zip(self.buckets + (float('inf'),), self.counts):
+            acc += n
+            out.append((le, acc))
+        return out
+
+    def quantile(self, q):
+        """Stima del quantile (limite superiore del bucket), come histogram_quantile."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        for le, acc in self.cumulative():
+            if acc >= rank:
+                return le if le != float('inf') else self.buckets[-1]
+        return self.buckets[-1]
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'p50': self.quantile(0.5),
+            'p99': self.quantile(0.99),
+            'buckets': {('+Inf' if le == float('inf') else str(le)): acc for le, acc in self.cumulative()},
+        }
+
+
+class CountingWriter:
+    """Wrapper di wfile che conta i byte scritti (risposte HTTP)."""
+
+    def __init__(self, raw):
+        self._raw = raw
+        self.bytes = 0
+
+    def write(self, data):
+        n = self._raw.write(data)
+        self.bytes += len(data)
+        return n
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+
+def process_rss_bytes():
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except Exception:
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except Exception:
+        return 0
+
+
+class Metrics:
+    def __init__(self, slowest_files=10):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.inflight = 0
+        self.requests = {}      # (method, route) -> {'count', 'bytes', 'status': {code: n}, 'latency': Histogram}
+        self.caches = {}        # nome cache -> {'hit', 'miss', 'rebuild'}
+        self.stages = {}        # fase (stat, parse, rebuild, query, serialize, ...) -> Histogram
+        self.parse = {'files': 0, 'bytes': 0, 'seconds': 0.0, 'latency': Histogram()}
+        self.last_refresh = None
+        self._slowest_n = slowest_files
+        self._slowest = []      # min-heap (secondi, fileName, byte)
+
+    # --- richieste HTTP --------------------------------------------------------------------
+
+    def request_started(self):
+        with self._lock:
+            self.inflight += 1
+
+    def request_finished(self, method, route, status, seconds, nbytes):
+        with self._lock:
+            self.inflight -= 1
+            if route is None:
+                return
+            entry = self.requests.get((method, route))
+            if entry is None:
+                entry = {'count': 0, 'bytes': 0, 'status': {}, 'latency': Histogram()}
+                self.requests[(method, route)] = entry
+            entry['count'] += 1
+            entry['bytes'] += nbytes
+            entry['status'][status] = entry['status'].get(status, 0) + 1
+            entry['latency'].observe(seconds)
+
+    # --- cache, fasi, parsing --------------------------------------------------------------
+
+    def cache(self, name, event, n=1):
+        with self._lock:
+            entry = self.caches.get(name)
+            if entry is None:
+                entry = {'hit': 0, 'miss': 0, 'rebuild': 0}
+                self.caches[name] = entry
+            entry[event] += n
+
+    def stage(self, name, seconds):
+        with self._lock:
+            hist = self.stages.get(name)
+            if hist is None:
+                hist = Histogram()
+                self.stages[name] = hist
+            hist.observe(seconds)
+
+    def parsed_file(self, file_name, seconds, nbytes):
+        with self._lock:
+            self.parse['files'] += 1
+            self.parse['bytes'] += nbytes
+            self.parse['seconds'] += seconds
+            self.parse['latency'].observe(seconds)
+            item = (seconds, file_name, nbytes)
+            if len(self._slowest) < self._slowest_n:
+                heapq.heappush(self._slowest, item)
+            elif item > self._slowest[0]:
+                heapq.heapreplace(self._slowest, item)
+
+    def refresh_done(self, stat_s, parse_s, rebuild_s, changed, removed):
+        self.stage('stat', stat_s)
+        self.stage('parse', parse_s)
+        self.stage('rebuild', rebuild_s)
+        with self._lock:
+            self.last_refresh = {
+                'at': time.time(),
+                'statSeconds': round(stat_s, 6),
+                'parseSeconds': round(parse_s, 6),
+                'rebuildSeconds': round(rebuild_s, 6),
+                'changedFiles': changed,
+                'removedFiles': removed,
+            }
+
+    # --- rendering -------------------------------------------------------------------------
+
+    def snapshot(self, gauges=None):
+        with self._lock:
+            return {
+                'uptimeSeconds': round(time.time() - self.started, 1),
+                'inflightRequests': self.inflight,
+                'processRssBytes': process_rss_bytes(),
+                'requests': [
+                    {'method': m, 'route': r, 'count': e['count'], 'bytes': e['bytes'],
+                     'status': {str(k): v for k, v in sorted(e['status'].items())},
+                     'latencySeconds': e['latency'].to_dict()}
+                    for (m, r), e in sorted(self.requests.items())
+                ],
+                'caches': {k: dict(v) for k, v in sorted(self.caches.items())},
+                'stages': {k: v.to_dict() for k, v in sorted(self.stages.items())},
+                'parse': {
+                    'files': self.parse['files'],
+                    'bytes': self.parse['bytes'],
+                    'seconds': round(self.parse['seconds'], 6),
+                    'perFileSeconds': self.parse['latency'].to_dict(),
+                    'slowestFiles': [{'fileName': f, 'seconds': round(s, 6), 'bytes': b}
+                                     for s, f, b in sorted(self._slowest, reverse=True)],
+                    'lastRefresh': dict(self.last_refresh) if self.last_refresh else None,
+                },
+                'gauges': dict(gauges or {}),
+            }
+
+    def prometheus(self, gauges=None):
+        snap = self.snapshot(gauges)
+        lines = []
+
+        def metric(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        def labels(**kv):
+            return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in kv.items()) + '}'
+
+        def histogram(name, label_kv, hist):
+            for le, acc in hist['buckets'].items():
+                lines.append(f'{name}_bucket{labels(**label_kv, le=le)} {acc}')
+            lines.append(f'{name}_sum{labels(**label_kv)} {hist["sum"]}')
+            lines.append(f'{name}_count{labels(**label_kv)} {hist["count"]}')
+
+        metric('dw_http_requests_total', 'counter', 'Richieste HTTP per metodo, route e stato')
+        for r in snap['requests']:
+            for status, n in r['status'].items():
+                lines.append(f'dw_http_requests_total{labels(method=r["method"], route=r["route"], status=status)} {n}')
+        metric('dw_http_response_bytes_total', 'counter', 'Byte di risposta per route')
+        for r in snap['requests']:
+            lines.append(f'dw_http_response_bytes_total{labels(method=r["method"], route=r["route"])} {r["bytes"]}')
+        metric('dw_http_request_duration_seconds', 'histogram', 'Latenza delle richieste per route')
+        for r in snap['requests']:
+            histogram('dw_http_request_duration_seconds', {'method': r['method'], 'route': r['route']}, r['latencySeconds'])
+        metric('dw_http_inflight_requests', 'gauge', 'Richieste in corso (incluse connessioni SSE)')
+        lines.append(f'dw_http_inflight_requests {snap["inflightRequests"]}')
+        metric('dw_cache_events_total', 'counter', 'Hit, miss e ricostruzioni delle cache di DW')
+        for name, ev in snap['caches'].items():
+            for event, n in ev.items():
+                lines.append(f'dw_cache_events_total{labels(cache=name, event=event)} {n}')
+        metric('dw_stage_duration_seconds', 'histogram', 'Tempo per fase: stat di DW, parse, rebuild, query, serializzazione')
+        for name, hist in snap['stages'].items():
+            histogram('dw_stage_duration_seconds', {'stage': name}, hist)
+        metric('dw_parse_files_total', 'counter', 'File di log parsati')
+        lines.append(f'dw_parse_files_total {snap["parse"]["files"]}')
+        metric('dw_parse_bytes_total', 'counter', 'Byte di log parsati')
+        lines.append(f'dw_parse_bytes_total {snap["parse"]["bytes"]}')
+        metric('dw_parse_file_duration_seconds', 'histogram', 'Tempo di parse per file')
+        histogram('dw_parse_file_duration_seconds', {}, snap['parse']['perFileSeconds'])
+        metric('dw_parse_slowest_file_seconds', 'gauge', 'File piu\' lenti da parsare')
+        for f in snap['parse']['slowestFiles']:
+            lines.append(f'dw_parse_slowest_file_seconds{labels(file=f["fileName"])} {f["seconds"]}')
+        metric('dw_process_rss_bytes', 'gauge', 'Memoria residente del processo')
+        lines.append(f'dw_process_rss_bytes {snap["processRssBytes"]}')
+        metric('dw_uptime_seconds', 'gauge', 'Secondi dall\'avvio del processo')
+        lines.append(f'dw_uptime_seconds {snap["uptimeSeconds"]}')
+        for name, value in sorted(snap['gauges'].items()):
+            metric(f'dw_{name}', 'gauge', GAUGE_HELP.get(name, name))
+            if isinstance(value, dict):
+                label = GAUGE_LABELS.get(name, 'status')
+                for k, v in sorted(value.items()):
+                    lines.append(f'dw_{name}{labels(**{label: k})} {v}')
+            else:
+                lines.append(f'dw_{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(v):
+    return str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,199 @@
+import io
+import os
+import sys
+import time
+import uuid
+import pstats
+import marshal
+import cProfile
+import threading
+import collections
+
+# Profilazione on-demand per richieste lente e re-ingestione di DW.
+#
+# - Profilo esplicito (cProfile) di una singola richiesta: header "X-Profile: 1" autorizzato da
+#   DW_PROFILE=1 (flag admin, es. in locale) oppure da "X-Profile-Token: <DW_PROFILE_TOKEN>".
+#   La risposta riporta "X-Profile-Id"; il profilo si scarica da /api/admin/profiles/<id>.
+# - Richieste lente: con DW_SLOW_MS > 0 un thread campiona gli stack dei thread con richieste in
+#   corso (sys._current_frames, ogni DW_PROFILE_SAMPLE_MS) e conserva in un ring buffer il profilo
+#   in formato "collapsed" (flame graph) delle richieste piu' lente della soglia.
+# Disabilitato (default) il costo per richiesta e' un confronto su un intero.
+
+PROFILE_FLAG = os.environ.get('DW_PROFILE', '0') == '1'
+PROFILE_TOKEN = os.environ.get('DW_PROFILE_TOKEN', '')
+SLOW_MS = float(os.environ.get('DW_SLOW_MS', '0'))
+SAMPLE_MS = float(os.environ.get('DW_PROFILE_SAMPLE_MS', '5'))
+BUFFER_SIZE = int(os.environ.get('DW_PROFILE_BUFFER', '50'))
+
+
+def _frame_label(code):
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+def collapse_stack(frame, skip_files=()):
+    """Stack dal frame alla radice come stringa "radice;...;foglia" (formato collapsed)."""
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        if os.path.basename(code.co_filename) not in skip_files:
+            parts.append(_frame_label(code))
+        frame = frame.f_back
+    parts.reverse()
+    return ';'.join(parts)
+
+
+class Profiler:
+    def __init__(self, slow_ms=SLOW_MS, sample_ms=SAMPLE_MS, capacity=BUFFER_SIZE,
+                 flag=PROFILE_FLAG, token=PROFILE_TOKEN):
+        self.slow_ms = slow_ms
+        self.sample_s = max(0.001, sample_ms / 1000.0)
+        self.flag = flag
+        self.token = token
+        self._entries = collections.deque(maxlen=max(1, capacity))
+        self._lock = threading.Lock()
+        self._active = {}           # token -> {'tid', 'start', 'stacks': Counter}
+        self._wake = threading.Condition(self._lock)
+        self._sampler = None
+
+    # --- autorizzazione --------------------------------------------------------------------
+
+    def authorized(self, headers):
+        if self.flag:
+            return True
+        if not self.token:
+            return False
+        return (headers.get('X-Profile-Token') or '').strip() == self.token
+
+    def requested(self, headers):
+        return (headers.get('X-Profile') or '').strip().lower() in ('1', 'true', 'yes') and self.authorized(headers)
+
+    # --- profilo esplicito (cProfile) --------------------------------------------------------
+
+    def new_id(self):
+        return uuid.uuid4().hex[:12]
+
+    def run(self, fn, label, kind='request', profile_id=None):
+        """Esegue fn() sotto cProfile e registra il profilo; ritorna (id, risultato di fn)."""
+        prof = cProfile.Profile()
+        t0 = time.perf_counter()
+        try:
+            result = prof.runcall(fn)
+        finally:
+            duration = time.perf_counter() - t0
+            prof.create_stats()
+            entry = {
+                'id': profile_id or self.new_id(),
+                'kind': kind,
+                'label': label,
+                'at': time.time(),
+                'durationMs': round(duration * 1000, 2),
+                'formats': ['text', 'pstats'],
+                '_pstats': marshal.dumps(prof.stats),
+            }
+            self._store(entry)
+        return entry['id'], result
+
+    # --- campionamento richieste lente -------------------------------------------------------
+
+    @property
+    def sampling(self):
+        return self.slow_ms > 0
+
+    def begin(self):
+        """Registra il thread corrente come richiesta in corso; ritorna un token (o None)."""
+        if self.slow_ms <= 0:
+            return None
+        token = object()
+        with self._lock:
+            self._active[token] = {'tid': threading.get_ident(), 'start': time.perf_counter(),
+                                   'stacks': collections.Counter()}
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample_loop, name='dw-profiler', daemon=True)
+                self._sampler.start()
+            self._wake.notify()
+        return token
+
+    def end(self, token, label):
+        if token is None:
+            return
+        with self._lock:
+            rec = self._active.pop(token, None)
+        if rec is None:
+            return
+        duration = time.perf_counter() - rec['start']
+        if duration * 1000 < self.slow_ms:
+            return
+        self._store({
+            'id': self.new_id(),
+            'kind': 'slow',
+            'label': label,
+            'at': time.time(),
+            'durationMs': round(duration * 1000, 2),
+            'samples': sum(rec['stacks'].values()),
+            'formats': ['collapsed', 'text'],
+            '_stacks': rec['stacks'],
+        })
+
+    def _sample_loop(self):
+        skip = (os.path.basename(__file__),)
+        while True:
+            with self._lock:
+                while not self._active:
+                    self._wake.wait()
+                active = list(self._active.values())
+            frames = sys._current_frames()
+            for rec in active:
+                frame = frames.get(rec['tid'])
+                if frame is not None:
+                    rec['stacks'][collapse_stack(frame, skip)] += 1
+            del frames
+            time.sleep(self.sample_s)
+
+    # --- ring buffer -------------------------------------------------------------------------
+
+    def _store(self, entry):
+        with self._lock:
+            self._entries.append(entry)
+
+    def list(self):
+        with self._lock:
+            entries = list(self._entries)
+        return [{k: v for k, v in e.items() if not k.startswith('_')} for e in reversed(entries)]
+
+    def get(self, profile_id):
+        with self._lock:
+            for e in self._entries:
+                if e['id'] == profile_id:
+                    return e
+        return None
+
+    def render(self, entry, fmt):
+        """Ritorna (content_type, bytes) del profilo nel formato richiesto, o None."""
+        if fmt == 'pstats' and '_pstats' in entry:
+            return 'application/octet-stream', entry['_pstats']
+        if fmt == 'collapsed' and '_stacks' in entry:
+            text = ''.join(f'{stack} {n}\n' for stack, n in entry['_stacks'].most_common())
+            return 'text/plain; charset=utf-8', text.encode('utf-8')
+        if fmt == 'text':
+            out = io.StringIO()
+            out.write(f"{entry['kind']} {entry['label']} {entry['durationMs']} ms\n\n")
+            if '_pstats' in entry:
+                stats = pstats.Stats(_StatsHolder(marshal.loads(entry['_pstats'])), stream=out)
+                stats.sort_stats('cumulative').print_stats(60)
+            else:
+                total = sum(entry['_stacks'].values()) or 1
+                for stack, n in entry['_stacks'].most_common(30):
+                    leaf = stack.rsplit(';', 1)[-1]
+                    out.write(f'{100.0 * n / total:5.1f}%  {n:5d}  {leaf}\n        {stack}\n')
+            return 'text/plain; charset=utf-8', out.getvalue().encode('utf-8')
+        return None
+
+
+class _StatsHolder:
+    """Adattatore minimo per pstats.Stats a partire da un dizionario di statistiche."""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
@@ -0,0 +1,595 @@
+import re
+import heapq
+import bisect
+import threading
+
+# Motore di query unico per gli endpoint evento (/api/lga, /api/lge, /api/lgd, /api/lgd_metrics,
+# /api/node/summary): espressione di filtro su qualsiasi campo, IN-list, negazione, ordinamento
+# e proiezione. Il planner usa l'indice piu' selettivo disponibile e scansiona solo se necessario.
+#
+# Sintassi di `where`:
+#   severity in (Major, Minor) and not title ~ "No Connection"
+#   fileName = CS01T or (typeReason = "PartialOutage(System)" and dateIso >= 2025-09-20)
+# Operatori: =  !=  ~ (contiene)  !~  >  >=  <  <=  in (...)  not in (...)
+
+def _norm_default(v):
+    return re.sub(r"\s+", ' ', str(v if v is not None else '').strip()).lower()
+
+def _norm_file(v):
+    s = _norm_default(v)
+    return s[:-4] if s.endswith('.log') else s
+
+def _norm_compact(v):
+    return re.sub(r"\s+", '', str(v if v is not None else '')).lower()
+
+# Normalizzazione per campo (coerente con i vecchi filtri dei singoli endpoint)
+FIELD_NORMALIZERS = {
+    'fileName': _norm_file,
+    'typeReason': _norm_compact,
+}
+
+# Alias accettati nei parametri/espressioni
+FIELD_ALIASES = {
+    'node': 'fileName',
+    'file': 'fileName',
+    'date': 'dateIso',
+    'sev': 'severity',
+}
+
+# Campi per cui il planner costruisce indici hash (valore normalizzato -> posizioni riga)
+INDEXED_FIELDS = ('fileName', 'severity', 'typeReason', 'metric', 'dateIso', 'type', 'title', 'restartType',
+                  'reason', 'rat')
+
+
+def field_name(name):
+    return FIELD_ALIASES.get(name, name)
+
+
+def normalize(field, value):
+    return FIELD_NORMALIZERS.get(field, _norm_default)(value)
+
+
+class QueryError(ValueError):
+    pass
+
+
+# --- AST -------------------------------------------------------------------------------------
+
+class Cmp:
+    def __init__(self, field, op, values, keep_empty=False):
+        self.field = field_name(field)
+        self.op = op
+        norm = FIELD_NORMALIZERS.get(self.field, _norm_default)
+        self.values = [norm(v) for v in values]
+        self.value_set = frozenset(self.values)
+        # confronti d'ordine: un valore vuoto passa invece di fallire (from=/to= sulle righe
+        # senza dateIso, es. LGD)
+        self.keep_empty = keep_empty
+
+    def key(self):
+        values = sorted(self.value_set) if self.op in ('in', 'not in') else self.values
+        return f'{self.field} {self.op} {values!r}' + (' keep_empty' if self.keep_empty else '')
+
+    def match(self, it):
+        v = normalize(self.field, it.get(self.field))
+        op = self.op
+        if op == 'in':
+            return v in self.value_set
+        if op == 'not in':
+            return v not in self.value_set
+        ref = self.values[0]
+        if op == '=':
+            return v == ref
+        if op == '!=':
+            return v != ref
+        if op == '~':
+            return ref in v
+        if op == '!~':
+            return ref not in v
+        if not v:
+            return self.keep_empty
+        if op == '>':
+            return v > ref
+        if op == '>=':
+            return v >= ref
+        if op == '<':
+            return v < ref
+        if op == '<=':
+            return v <= ref
+        return False
+
+
+class And:
+    def __init__(self, children):
+        self.children = children
+
+    def key(self):
+        return 'and(' + ','.join(sorted(c.key() for c in self.children)) + ')'
+
+    def match(self, it):
+        for c in self.children:
+            if not c.match(it):
+                return False
+        return True
+
+
+class Or:
+    def __init__(self, children):
+        self.children = children
+
+    def key(self):
+        return 'or(' + ','.join(sorted(c.key() for c in self.children)) + ')'
+
+    def match(self, it):
+        for c in self.children:
+            if c.match(it):
+                return True
+        return False
+
+
+class Not:
+    def __init__(self, child):
+        self.child = child
+
+    def key(self):
+        return f'not({self.child.key()})'
+
+    def match(self, it):
+        return not self.child.match(it)
+
+
+# --- Parser ----------------------------------------------------------------------------------
+
+_TOKEN_RX = re.compile(r'\s*(?:(\()|(\))|(,)|(!=|!~|>=|<=|=|~|>|<)|"((?:[^"\\]|\\.)*)"|([^\s(),=!~<>"]+))')
+
+
+def _lex(text):
+    pos = 0
+    out = []
+    text = text or ''
+    while pos < len(text):
+        m = _TOKEN_RX.match(text, pos)
+        if not m or m.end() == pos:
+            if text[pos:].strip() == '':
+                break
+            raise QueryError(f'Sintassi non valida vicino a: {text[pos:pos + 20]!r}')
+        pos = m.end()
+        if m.group(1):
+            out.append(('(', '('))
+        elif m.group(2):
+            out.append((')', ')'))
+        elif m.group(3):
+            out.append((',', ','))
+        elif m.group(4):
+            out.append(('op', m.group(4)))
+        elif m.group(5) is not None:
+            out.append(('str', m.group(5).replace('\\"', '"')))
+        elif m.group(6):
+            out.append(('word', m.group(6)))
+    return out
+
+
+class _Parser:
+    def __init__(self, tokens):
+        self.toks = tokens
+        self.i = 0
+
+    def peek(self, k=0):
+        j = self.i + k
+        return self.toks[j] if j < len(self.toks) else (None, None)
+
+    def kw(self, word, k=0):
+        t = self.peek(k)
+        return t[0] == 'word' and t[1].lower() == word
+
+    def take(self):
+        t = self.peek()
+        self.i += 1
+        return t
+
+    def parse(self):
+        node = self.parse_or()
+        if self.i < len(self.toks):
+            raise QueryError(f'Token inatteso: {self.peek()[1]!r}')
+        return node
+
+    def parse_or(self):
+        items = [self.parse_and()]
+        while self.kw('or'):
+            self.take()
+            items.append(self.parse_and())
+        return items[0] if len(items) == 1 else Or(items)
+
+    def parse_and(self):
+        items = [self.parse_not()]
+        while self.kw('and'):
+            self.take()
+            items.append(self.parse_not())
+        return items[0] if len(items) == 1 else And(items)
+
+    def parse_not(self):
+        if self.kw('not'):
+            self.take()
+            return Not(self.parse_not())
+        return self.parse_atom()
+
+    def parse_atom(self):
+        kind, val = self.take()
+        if kind == '(':
+            node = self.parse_or()
+            if self.take()[0] != ')':
+                raise QueryError('Parentesi non bilanciate')
+            return node
+        if kind != 'word':
+            raise QueryError(f'Campo atteso, trovato {val!r}')
+        field = val
+        if self.kw('not') and self.kw('in', 1):
+            self.take()
+            self.take()
+            return Cmp(field, 'not in', self.parse_list())
+        if self.kw('in'):
+            self.take()
+            return Cmp(field, 'in', self.parse_list())
+        kind, op = self.take()
+        if kind != 'op':
+            raise QueryError(f'Operatore atteso dopo {field!r}')
+        kind, value = self.take()
+        if kind not in ('word', 'str'):
+            raise QueryError(f'Valore atteso dopo {field} {op}')
+        return Cmp(field, op, [value])
+
+    def parse_list(self):
+        if self.take()[0] != '(':
+            raise QueryError('Lista attesa: in (a, b, ...)')
+        values = []
+        while True:
+            kind, value = self.take()
+            if kind in ('word', 'str'):
+                values.append(value)
+            elif kind == ')':
+                break
+            elif kind != ',':
+                raise QueryError('Lista non valida')
+        return values
+
+
+def parse_where(text):
+    if not (text or '').strip():
+        return None
+    return _Parser(_lex(text)).parse()
+
+
+def param_clause(field, raw):
+    """Converte un parametro semplice (es. severity=Major,Minor o node=!CS01T) in una clausola.
+    Virgole = IN-list, prefisso '!' = negazione.
+    """
+    raw = (raw or '').strip()
+    if not raw:
+        return None
+    neg = raw.startswith('!')
+    if neg:
+        raw = raw[1:]
+    values = [v.strip() for v in raw.split(',') if v.strip()]
+    if not values:
+        return None
+    return Cmp(field, 'not in' if neg else 'in', values)
+
+
+# --- Dataset e planner -----------------------------------------------------------------------
+
+class Dataset:
+    """Lista di righe con indici hash costruiti on-demand per i campi in INDEXED_FIELDS.
+    Le righe possono essere una vista colonnare (snapshot.SnapshotRows): gli indici vengono
+    allora costruiti dagli id di colonna, normalizzando una sola volta ogni valore distinto.
+    time_sorted=True dichiara che le righe sono a blocchi contigui per fileName, ognuno ordinato
+    per (dateIso, time): le query in ordine temporale usano allora un merge k-way dei blocchi.
+    """
+
+    def __init__(self, rows, version=None, time_sorted=False):
+        self.rows = rows
+        self.version = version
+        self.time_sorted = time_sorted
+        self.columnar = hasattr(rows, 'column')
+        self._indexes = {}
+        self._bounds = None
+        self._lock = threading.Lock()
+
+    def _positions(self, field):
+        norm = FIELD_NORMALIZERS.get(field, _norm_default)
+        if self.columnar:
+            col = self.rows.column(field)
+            if col is None:
+                return (('', pos) for pos in range(len(self.rows)))
+            cache = {}
+            value = self.rows.value
+            def keys():
+                for pos, sid in enumerate(col):
+                    k = cache.get(sid)
+                    if k is None:
+                        k = cache[sid] = norm(value(sid))
+                    yield k, pos
+            return keys()
+        return ((norm(it.get(field)), pos) for pos, it in enumerate(self.rows))
+
+    def index(self, field):
+        idx = self._indexes.get(field)
+        if idx is not None:
+            return idx
+        with self._lock:
+            idx = self._indexes.get(field)
+            if idx is None:
+                idx = {}
+                for k, pos in self._positions(field):
+                    lst = idx.get(k)
+                    if lst is None:
+                        idx[k] = [pos]
+                    else:
+                        lst.append(pos)
+                self._indexes[field] = idx
+        return idx
+
+    def _file_bounds(self):
+        """Posizioni di inizio di ogni blocco per file, piu' la lunghezza totale in coda."""
+        bounds = self._bounds
+        if bounds is not None:
+            return bounds
+        with self._lock:
+            if self._bounds is None:
+                if self.columnar:
+                    values = self.rows.column('fileName') or ()
+                else:
+                    values = (it.get('fileName') for it in self.rows)
+                bounds = []
+                prev = object()
+                for pos, v in enumerate(values):
+                    if v != prev:
+                        bounds.append(pos)
+                        prev = v
+                bounds.append(len(self.rows))
+                self._bounds = bounds
+        return self._bounds
+
+    def time_runs(self, cand=None):
+        """Sequenze di posizioni in ordine temporale crescente, una per file (solo time_sorted).
+        cand: posizioni candidate ordinate (dal planner) da ripartire tra i blocchi."""
+        bounds = self._file_bounds()
+        if cand is None:
+            return [range(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+        runs = []
+        i = 0
+        n = len(cand)
+        while i < n:
+            end = bounds[bisect.bisect_right(bounds, cand[i])]
+            j = bisect.bisect_left(cand, end, i)
+            runs.append(cand[i:j])
+            i = j
+        return runs
+
+    def time_key(self):
+        """Funzione posizione -> (dateIso, time) senza materializzare le righe colonnari."""
+        rows = self.rows
+        if self.columnar:
+            dates = rows.column('dateIso')
+            times = rows.column('time')
+            value = rows.value
+            if dates is None or times is None:
+                return lambda pos: ('', '')
+            return lambda pos: (value(dates[pos]), value(times[pos]))
+        return lambda pos: (str(rows[pos].get('dateIso') or ''), str(rows[pos].get('time') or ''))
+
+    def candidates(self, node):
+        """Posizioni candidate per il nodo AST, o None se serve una scansione completa."""
+        if isinstance(node, Cmp):
+            if node.field not in INDEXED_FIELDS:
+                return None
+            if node.op in ('=', 'in'):
+                idx = self.index(node.field)
+                lists = [idx.get(v, ()) for v in node.value_set]
+                if len(lists) == 1:
+                    return lists[0]
+                out = []
+                for lst in lists:
+                    out.extend(lst)
+                out.sort()
+                return out
+            # range su date; con righe colonnari anche gli altri operatori: il test gira sui
+            # valori distinti dell'indice invece che su ogni riga
+            if (node.op in ('>', '>=', '<', '<=') and node.field == 'dateIso') or self.columnar:
+                idx = self.index(node.field)
+                keys = [k for k in idx if node.match({node.field: k})]
+                out = []
+                for k in keys:
+                    out.extend(idx[k])
+                out.sort()
+                return out
+            return None
+        if isinstance(node, And):
+            best = None
+            for c in node.children:
+                cand = self.candidates(c)
+                if cand is not None and (best is None or len(cand) < len(best)):
+                    best = cand
+            return best
+        if isinstance(node, Or):
+            merged = set()
+            for c in node.children:
+                cand = self.candidates(c)
+                if cand is None:
+                    return None
+                merged.update(cand)
+            return sorted(merged)
+        return None
+
+    def exact(self, node):
+        """True se candidates(node) coincide con le righe che soddisfano node (nessun filtro residuo)."""
+        if isinstance(node, Cmp):
+            if node.field not in INDEXED_FIELDS:
+                return False
+            return (node.op in ('=', 'in') or self.columnar
+                    or (node.op in ('>', '>=', '<', '<=') and node.field == 'dateIso'))
+        if isinstance(node, Or):
+            return all(self.exact(c) for c in node.children)
+        return False
+
+    def positions(self, where):
+        """Posizioni (crescenti) delle righe che soddisfano where, tutte se where e' None.
+        Le clausole risolte esattamente dagli indici si intersecano; le altre filtrano le righe
+        rimaste una per una."""
+        rows = self.rows
+        if where is None:
+            return range(len(rows))
+        clauses = where.children if isinstance(where, And) else [where]
+        found = None
+        rest = []
+        for c in clauses:
+            if not self.exact(c):
+                rest.append(c)
+                continue
+            cand = self.candidates(c)
+            found = cand if found is None else sorted(set(found).intersection(cand))
+        if not rest:
+            return found
+        source = range(len(rows)) if found is None else found
+        residual = rest[0] if len(rest) == 1 else And(rest)
+        return [p for p in source if residual.match(rows[p])]
+
+
+class Query:
+    def __init__(self, where=None, sort=None, fields=None, limit=None, offset=0):
+        self.where = where
+        self.sort = sort or []          # lista di (field, descending)
+        self.fields = fields or None    # proiezione
+        self.limit = limit
+        self.offset = max(0, int(offset or 0))
+
+    @staticmethod
+    def parse_sort(raw):
+        out = []
+        for part in (raw or '').split(','):
+            part = part.strip()
+            if not part:
+                continue
+            desc = part.startswith('-')
+            out.append((field_name(part.lstrip('+-')), desc))
+        return out
+
+    @staticmethod
+    def parse_fields(raw):
+        fields = [field_name(f.strip()) for f in (raw or '').split(',') if f.strip()]
+        return fields or None
+
+    def cache_key(self):
+        """Forma canonica della query (filtri normalizzati e in ordine stabile) per le cache."""
+        return (self.where.key() if self.where is not None else '', tuple(self.sort),
+                tuple(self.fields or ()), self.limit, self.offset)
+
+    def and_where(self, clause):
+        if clause is None:
+            return
+        if self.where is None:
+            self.where = clause
+        elif isinstance(self.where, And):
+            self.where.children.append(clause)
+        else:
+            self.where = And([self.where, clause])
+
+    def time_order(self):
+        """True/False (decrescente/crescente) se l'ordinamento e' solo temporale, altrimenti None."""
+        fields = [f for f, _desc in self.sort]
+        if fields not in (['dateIso'], ['dateIso', 'time']):
+            return None
+        directions = {desc for _f, desc in self.sort}
+        return directions.pop() if len(directions) == 1 else None
+
+    def run(self, dataset):
+        """Esegue la query. Ritorna (righe, totale match); totale None se la scansione e' stata
+        interrotta al raggiungimento del limite (query senza ordinamento o in ordine temporale)."""
+        rows = dataset.rows
+        where = self.where
+        cand = dataset.candidates(where) if where is not None else None
+        desc = self.time_order()
+        if desc is not None and dataset.time_sorted and self.limit is not None:
+            return self._run_merged(dataset, cand, desc)
+        source = rows if cand is None else (rows[p] for p in cand)
+        stop = None
+        if not self.sort and self.limit is not None:
+            stop = self.offset + self.limit
+        out = []
+        total = 0
+        for it in source:
+            if where is not None and not where.match(it):
+                continue
+            total += 1
+            out.append(it)
+            if stop is not None and total >= stop:
+                break
+        exhausted = stop is None or total < stop
+        if self.sort:
+            # sort stabili dal campo meno significativo al piu' significativo
+            for field, desc in reversed(self.sort):
+                out.sort(key=lambda it, f=field: str(it.get(f) or ''), reverse=desc)
+        end = None if self.limit is None else self.offset + self.limit
+        out = out[self.offset:end]
+        if self.fields:
+            out = [{f: it.get(f, '') for f in self.fields} for it in out]
+        return out, (total if exhausted else None)
+
+
+    def _run_merged(self, dataset, cand, desc):
+        """Top-N in ordine temporale con merge k-way dei blocchi per file (gia' ordinati):
+        si visitano solo le righe fino al limite, O(N log k) invece dell'ordinamento completo."""
+        rows = dataset.rows
+        where = self.where
+        runs = dataset.time_runs(cand)
+        if desc:
+            runs = [reversed(r) for r in runs]
+        stop = self.offset + self.limit
+        out = []
+        total = 0
+        for pos in heapq.merge(*runs, key=dataset.time_key(), reverse=desc):
+            it = rows[pos]
+            if where is not None and not where.match(it):
+                continue
+            total += 1
+            if total > self.offset:
+                out.append(it)
+            if total >= stop:
+                break
+        if self.fields:
+            out = [{f: it.get(f, '') for f in self.fields} for it in out]
+        return out, (total if total < stop else None)
+
+
+def from_params(qs, params, default_limit=None, max_limit=10000):
+    """Costruisce una Query dai parametri HTTP.
+    params: mappa nome_parametro -> campo (es. {'severity': 'severity', 'node': 'fileName'}).
+    Supporta anche where=, sort=, fields=, limit=, offset=, from=, to= e order=asc|desc
+    (ordinamento temporale per dateIso,time quando sort= non e' indicato).
+    """
+    def get(name):
+        return (qs.get(name, [''])[0] or '').strip()
+    q = Query(where=parse_where(get('where')))
+    for pname, field in params.items():
+        q.and_where(param_clause(field, get(pname)))
+    date_from = get('from')
+    date_to = get('to')
+    if date_from:
+        q.and_where(Cmp('dateIso', '>=', [date_from], keep_empty=True))
+    if date_to:
+        q.and_where(Cmp('dateIso', '<=', [date_to], keep_empty=True))
+    q.sort = Query.parse_sort(get('sort'))
+    order = get('order').lower()
+    if not q.sort and order in ('asc', 'desc'):
+        q.sort = Query.parse_sort('dateIso,time' if order == 'asc' else '-dateIso,-time')
+    q.fields = Query.parse_fields(get('fields'))
+    if default_limit is not None:
+        try:
+            limit = int(get('limit') or default_limit)
+        except Exception:
+            limit = default_limit
+        q.limit = max(1, min(max_limit, limit))
+    try:
+        q.offset = max(0, int(get('offset') or 0))
+    except Exception:
+        q.offset = 0
+    return q
@@ -0,0 +1,126 @@
+import os
+import gzip
+import threading
+from collections import OrderedDict
+
+# Cache LRU dei corpi di risposta gia' serializzati (e compressi gzip alla prima richiesta che
+# lo accetta) per le query filtrate ripetute: /api/lga, /api/lge, /api/lgd, /api/lgd_metrics,
+# /api/node/summary, /api/nodes e /api/search. La chiave e' endpoint + parametri normalizzati (la forma
+# canonica della query: stesso filtro scritto in modo diverso = stessa voce); ogni voce vale per
+# una sola versione del dataset e al cambio di versione la cache viene svuotata per intero.
+#
+# Budget in byte (json + gzip) configurabile con DW_RESULT_CACHE_MB (default 64, 0 = disattivata);
+# le risposte piu' grandi di un quarto del budget non vengono messe in cache.
+
+RESULT_CACHE_BYTES = int(float(os.environ.get('DW_RESULT_CACHE_MB', '64')) * 1024 * 1024)
+GZIP_LEVEL = 5
+
+
+class CachedBody:
+    __slots__ = ('body', 'body_gz')
+
+    def __init__(self, body):
+        self.body = body
+        self.body_gz = None
+
+    @property
+    def size(self):
+        return len(self.body) + (len(self.body_gz) if self.body_gz is not None else 0)
+
+
+class ResultCache:
+    def __init__(self, max_bytes=RESULT_CACHE_BYTES):
+        self.max_bytes = max(0, int(max_bytes))
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # chiave -> CachedBody (ordine = recenza d'uso)
+        self.version = None
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.skipped = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _check_version(self, version):
+        """Svuota la cache se version e' piu' recente; False per richieste su versioni superate
+        (non devono ne' leggere ne' scartare le voci della versione corrente)."""
+        if self.version is None or version > self.version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.bytes = 0
+            self.version = version
+        return version == self.version
+
+    def invalidate(self, version):
+        """Svuota la cache (chiamato al cambio di versione del dataset)."""
+        with self._lock:
+            self._check_version(version)
+
+    def get(self, key, version):
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key) if self._check_version(version) else None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, version, body):
+        """Registra il corpo serializzato; ritorna la voce (anche se non messa in cache)."""
+        entry = CachedBody(body)
+        if not self.enabled:
+            return entry
+        with self._lock:
+            if not self._check_version(version) or entry.size > self.max_bytes // 4:
+                self.skipped += 1
+                return entry
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old.size
+            self._entries[key] = entry
+            self.bytes += entry.size
+            self._evict()
+        return entry
+
+    def gzipped(self, key, entry):
+        """Corpo gzip della voce, compresso alla prima richiesta che lo accetta."""
+        if entry.body_gz is None:
+            body_gz = gzip.compress(entry.body, GZIP_LEVEL)
+            with self._lock:
+                if entry.body_gz is None:
+                    entry.body_gz = body_gz
+                    if self._entries.get(key) is entry:
+                        self.bytes += len(body_gz)
+                        self._evict()
+        return entry.body_gz
+
+    def _evict(self):
+        while self.bytes > self.max_bytes and self._entries:
+            _key, old = self._entries.popitem(last=False)
+            self.bytes -= old.size
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'version': self.version,
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'maxBytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'skipped': self.skipped,
+            }
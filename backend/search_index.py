@@ -0,0 +1,196 @@
+import re
+import heapq
+import bisect
+import threading
+
+# Indice invertito per la ricerca full-text su title/object/detail degli eventi LGA/LGE.
+#
+# I valori testuali si ripetono moltissimo (storm di allarmi con lo stesso titolo/oggetto),
+# quindi l'indice e' a due livelli:
+#   token -> insieme di id di valore distinti  (vocabolario piccolo, condiviso tra i file)
+#   file  -> id di valore -> indici riga nel file (aggiornato per file, incrementale)
+# Le frasi vengono verificate sui valori distinti candidati, non sulle righe.
+
+TOKEN_RX = re.compile(r"[0-9a-z]+")
+QUERY_RX = re.compile(r'(?:(\w+):)?(?:"([^"]*)"|(\S+))')
+
+INDEXED_FIELDS = ('title', 'object', 'detail')
+
+
+def tokenize(text):
+    return TOKEN_RX.findall((text or '').lower())
+
+
+def parse_query(q):
+    """Interpreta la query in clausole (kind, field, tokens).
+    Sintassi: termine, prefisso*, "frase esatta", con prefisso campo opzionale (title:, object:, detail:).
+    """
+    clauses = []
+    for m in QUERY_RX.finditer(q or ''):
+        field = (m.group(1) or '').lower() or None
+        if field and field not in INDEXED_FIELDS:
+            # non e' un campo: trattalo come testo libero
+            field = None
+            text = m.group(0)
+        else:
+            text = m.group(2) if m.group(2) is not None else m.group(3)
+        quoted = m.group(2) is not None
+        tokens = tokenize(text)
+        if not tokens:
+            continue
+        if quoted or len(tokens) > 1:
+            clauses.append(('phrase', field, tokens))
+        elif text.endswith('*'):
+            clauses.append(('prefix', field, tokens))
+        else:
+            clauses.append(('term', field, tokens))
+    return clauses
+
+
+def _contains_seq(haystack, needle):
+    n = len(needle)
+    if n == 0:
+        return True
+    first = needle[0]
+    for i in range(len(haystack) - n + 1):
+        if haystack[i] == first and haystack[i:i + n] == needle:
+            return True
+    return False
+
+
+class InvertedIndex:
+    def __init__(self, fields=INDEXED_FIELDS):
+        self.fields = tuple(fields)
+        self._lock = threading.RLock()
+        self._value_ids = {}    # (field, testo) -> vid
+        self._values = []       # vid -> (field, testo)
+        self._postings = {}     # token -> set(vid)
+        self._vocab = None      # token ordinati (lazy) per le query prefisso
+        self._files = {}        # fileName -> {'rows': [...], 'by_value': {vid: [idx, ...]}}
+
+    def __len__(self):
+        return sum(len(f['rows']) for f in self._files.values())
+
+    def _value_id(self, field, text):
+        key = (field, text)
+        vid = self._value_ids.get(key)
+        if vid is None:
+            vid = len(self._values)
+            self._value_ids[key] = vid
+            self._values.append(key)
+            for tok in set(tokenize(text)):
+                posting = self._postings.get(tok)
+                if posting is None:
+                    self._postings[tok] = {vid}
+                    self._vocab = None
+                else:
+                    posting.add(vid)
+        return vid
+
+    def add_file(self, file_name, rows):
+        """Indicizza (o reindicizza) le righe di un singolo file."""
+        with self._lock:
+            by_value = {}
+            for idx, it in enumerate(rows):
+                for field in self.fields:
+                    text = (it.get(field) or '').strip()
+                    if not text:
+                        continue
+                    vid = self._value_id(field, text)
+                    lst = by_value.get(vid)
+                    if lst is None:
+                        by_value[vid] = [idx]
+                    elif lst[-1] != idx:
+                        lst.append(idx)
+            self._files[file_name] = {'rows': rows, 'by_value': by_value}
+
+    def rebind(self, file_name, rows):
+        """Sostituisce le righe di un file gia' indicizzato con una sequenza equivalente (stesso
+        ordine, es. vista dello snapshot): le posizioni dell'indice restano valide."""
+        with self._lock:
+            fdata = self._files.get(file_name)
+            if fdata is not None:
+                fdata['rows'] = rows
+
+    def remove_file(self, file_name):
+        with self._lock:
+            # i valori orfani restano nel vocabolario: non matchano righe e vengono riusati al reload
+            self._files.pop(file_name, None)
+
+    def file_names(self):
+        return list(self._files.keys())
+
+    def _clause_vids(self, kind, field, tokens):
+        if kind == 'prefix':
+            if self._vocab is None:
+                self._vocab = sorted(self._postings)
+            pref = tokens[0]
+            vids = set()
+            i = bisect.bisect_left(self._vocab, pref)
+            while i < len(self._vocab) and self._vocab[i].startswith(pref):
+                vids |= self._postings[self._vocab[i]]
+                i += 1
+        else:
+            sets = []
+            for tok in tokens:
+                posting = self._postings.get(tok)
+                if not posting:
+                    return set()
+                sets.append(posting)
+            sets.sort(key=len)
+            vids = set(sets[0])
+            for s in sets[1:]:
+                vids &= s
+                if not vids:
+                    return vids
+            if kind == 'phrase' and len(tokens) > 1:
+                vids = {v for v in vids if _contains_seq(tokenize(self._values[v][1]), tokens)}
+        if field:
+            vids = {v for v in vids if self._values[v][0] == field}
+        return vids
+
+    def search(self, q, limit=200, files=None, predicate=None, offset=0):
+        """Esegue la query e ritorna (righe ordinate per recenza decrescente, totale match).
+        files: sottoinsieme di fileName da considerare; predicate: filtro aggiuntivo per riga;
+        offset: righe da saltare (l'heap tiene offset + limit righe).
+        """
+        clauses = parse_query(q)
+        if not clauses:
+            return [], 0
+        with self._lock:
+            clause_vids = [self._clause_vids(*c) for c in clauses]
+            if any(not v for v in clause_vids):
+                return [], 0
+            targets = self._files if files is None else {n: self._files[n] for n in files if n in self._files}
+            total = 0
+            heap = []
+            limit = max(1, int(limit or 1))
+            offset = max(0, int(offset or 0))
+            keep = offset + limit
+            for fname, fdata in targets.items():
+                by_value = fdata['by_value']
+                rows = fdata['rows']
+                matched = None
+                for vids in clause_vids:
+                    hit = set()
+                    for vid in by_value.keys() & vids:
+                        hit.update(by_value[vid])
+                    matched = hit if matched is None else (matched & hit)
+                    if not matched:
+                        break
+                if not matched:
+                    continue
+                for idx in matched:
+                    it = rows[idx]
+                    if predicate is not None and not predicate(it):
+                        continue
+                    total += 1
+                    # a parita' di istante decide (file, posizione): risultato stabile anche su
+                    # righe ricostruite (snapshot, blocchi ricaricati)
+                    key = (it.get('dateIso') or '', it.get('time') or '', fname, idx)
+                    if len(heap) < keep:
+                        heapq.heappush(heap, (key, it))
+                    elif key > heap[0][0]:
+                        heapq.heapreplace(heap, (key, it))
+            heap.sort(key=lambda e: e[0], reverse=True)
+            return [e[1] for e in heap[offset:]], total
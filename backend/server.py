@@ -3,125 +3,726 @@ import re
 import io
 import csv
 import json
+import gzip
+import heapq
+import hashlib
+import socket
 import uuid
 import time
+import queue
+import signal
 import zipfile
+import threading
+import operator
+import collections
 from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
 
+import admission
+import aggregate
+import analytics
+import block_cache
+import cell_outages
+import changelog
+import correlation
+import history
+import http_range
+import inventory
+import metrics
+import profiling
+import query_engine
+import result_cache
+import snapshot
+import wire
+from search_index import InvertedIndex
+
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DW_DIR = os.path.join(PROJECT_ROOT, 'DW')
+# DW_DIR permette di puntare il server a un'altra directory di log (es. dati sintetici dei benchmark)
+DW_DIR = os.environ.get('DW_DIR') or os.path.join(PROJECT_ROOT, 'DW')
 EXPORT_DIR = os.path.join(PROJECT_ROOT, 'backend', 'exports')
 USERS_FILE = os.path.join(PROJECT_ROOT, 'backend', 'users.json')
+CACHE_DIR = os.path.join(PROJECT_ROOT, 'backend', 'cache')
+SNAPSHOT_PATH = os.environ.get('DW_SNAPSHOT') or os.path.join(CACHE_DIR, 'dw.snapshot')
 
 # In-memory job store
 JOBS = {}
 
-# Cache semplice basata su snapshot della directory DW
-# Snapshot: (file_count, latest_mtime)
+# Cache per-file della directory DW: ogni file viene riparsato solo se cambia la sua firma
+# (dimensione, mtime_ns); le liste aggregate e gli indici vengono aggiornati incrementalmente.
 _DW_CACHE = {
-    'snapshot': None,
-    'parsed_summary': None,  # risultato di parse_logs_summary()
-    'lgd_metrics': None,     # risultato di parse_lgd_metrics()
-    'charts_summary': {},    # mappa top_n -> (snapshot, data)
+    'snapshot': None,        # firme {fileName: (size, mtime_ns)} dell'ultimo allineamento
+    'version': 0,            # versione del dataset, incrementata ad ogni cambiamento
+    'files': {},             # fileName -> {'sig', 'tail', 'batch', 'node'}; le righe sono in _BLOCKS
+    'parsed_summary': None,  # {'lga', 'lge', 'lgdRestarts'} aggregati su tutti i file
+    'lgd_metrics': None,     # metriche LGD aggregate su tutti i file
+    'charts_summary': {},    # mappa top_n -> (version, data)
+    'search_index': InvertedIndex(),  # indice full-text su title/object/detail di LGA/LGE
+    'datasets': {},          # 'lga'/'lge'/'lgdRestarts'/'lgd' -> query_engine.Dataset della versione corrente
+    'frames': {},            # stesse chiavi -> analytics.Frame delle righe correnti (solo con NumPy)
+    'bootstrap': {},         # (top_n, limit, colonnare) -> (version, json_bytes, gzip_bytes) di /api/bootstrap
+    'timelines': None,       # (version, {nodo: correlation.Timeline}) dei disservizi LGD
+    'cell_index': None,      # (version, {(nodo, RAT, cellId): cell_outages.CellTimeline}) dei disservizi per cella
+    'event_index': None,     # (version, {'lga'|'lge': {nodo: (tempi, posizioni)}}) per il join allarmi/disservizi
+    'catalog': inventory.Catalog(),  # inventario per nodo e blocchi di righe per nodo (inventory.py)
+    'resident': None,        # (snapshot.Snapshot, {fileName: {kind: [inizio, fine)}}) con il budget di memoria
+    'checked_at': 0,         # time.monotonic() dell'ultima scansione di DW
+    'updated_at': None,      # time.time() dell'ultimo cambio di versione
+    'watcher': False,        # True se il thread watcher e' attivo
+}
+_DW_LOCK = threading.RLock()
+
+# Intervallo del watcher di DW (secondi): con il watcher attivo le richieste non rifanno la
+# scansione di DW se l'ultima e' piu' recente di questo intervallo.
+WATCH_INTERVAL = float(os.environ.get('DW_WATCH_INTERVAL', '5'))
+SSE_HEARTBEAT = float(os.environ.get('DW_SSE_HEARTBEAT', '15'))
+# Ogni quanto un worker pre-fork controlla se il master ha scritto un nuovo snapshot (secondi)
+SNAPSHOT_POLL = float(os.environ.get('DW_SNAPSHOT_POLL', '0.5'))
+
+# Modalita' pre-fork (--workers N): il master ingerisce DW e scrive lo snapshot mmap, i worker
+# servono HTTP leggendo lo snapshot. 'role' vale 'single', 'master' o 'worker'.
+_PREFORK = {
+    'role': 'single',
+    'master_pid': None,
+    'requested': None,      # multiprocessing.Value: ultimo refresh richiesto dai worker
+    'done': None,           # multiprocessing.Value: ultimo refresh completato dal master
+    'snapshot': None,       # snapshot.Snapshot agganciato dal worker
+    'checked_at': 0,        # time.monotonic() dell'ultimo controllo dello snapshot
 }
 
+
+class EventHub:
+    """Pub/sub in memoria per /api/events: una coda limitata per ogni client SSE."""
+
+    def __init__(self, max_queue=64):
+        self.max_queue = max_queue
+        self._subs = set()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._subs)
+
+    def subscribe(self, q=None):
+        """Registra un iscritto; q puo' essere qualsiasi oggetto con put_nowait() (es. coda asyncio)."""
+        if q is None:
+            q = queue.Queue(maxsize=self.max_queue)
+        with self._lock:
+            self._subs.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subs.discard(q)
+
+    def publish(self, event, data):
+        with self._lock:
+            subs = list(self._subs)
+        for q in subs:
+            try:
+                q.put_nowait((event, data))
+            except queue.Full:
+                # client lento: perde l'evento, il successivo porta comunque lo stato completo
+                pass
+
+
+_EVENTS = EventHub()
+
+# Metriche esposte da /api/metrics (richieste, cache, tempi di parse e per fase)
+_METRICS = metrics.Metrics()
+
+# Profilazione on-demand (cProfile per richiesta/re-ingestione, campionamento richieste lente)
+_PROFILER = profiling.Profiler()
+
+# Controllo di ammissione: corsie cheap/normal/heavy con concorrenza e coda limitate (429 oltre)
+_ADMISSION = admission.Admission()
+
+# Cache LRU delle risposte serializzate delle query filtrate (chiave: endpoint + query normalizzata)
+_RESULTS = result_cache.ResultCache()
+
+# Changelog limitato delle ultime versioni per le risposte delta (since=<versione>)
+_CHANGELOG = changelog.Changelog()
+
+# Storico multi-batch partizionato per giorno (None se disattivato con DW_HISTORY=0)
+_HISTORY = history.HistoryStore() if history.HISTORY_ENABLED else None
+
+# Blocchi di righe per file con budget di memoria LRU (DW_MEMORY_MB, 0 = tutti residenti)
+_BLOCKS = block_cache.BlockCache()
+
 def _dw_snapshot():
+    """Firma corrente dei file in DW: {fileName: (size, mtime_ns)}."""
+    snap = {}
     try:
         if not os.path.isdir(DW_DIR):
-            return (0, 0)
-        latest = 0
-        count = 0
+            return snap
         for p in iter_log_files() or []:
             try:
                 st = os.stat(p)
-                count += 1
-                if st.st_mtime > latest:
-                    latest = st.st_mtime
+                snap[os.path.basename(p)] = (st.st_size, st.st_mtime_ns)
             except Exception:
                 continue
-        return (count, int(latest))
     except Exception:
-        return (0, 0)
+        pass
+    return snap
 
-def _get_parsed_summary_cached():
-    snap = _dw_snapshot()
-    if _DW_CACHE.get('snapshot') == snap and _DW_CACHE.get('parsed_summary') is not None:
-        return _DW_CACHE['parsed_summary']
-    data = parse_logs_summary()
-    _DW_CACHE['snapshot'] = snap
-    _DW_CACHE['parsed_summary'] = data
-    # invalida dipendenze derivate
-    _DW_CACHE['charts_summary'] = {}
+def _refresh_dw(force=False):
+    """Allinea la cache allo stato di DW riparsando solo i file nuovi o modificati.
+    Con il watcher attivo la scansione viene saltata se recente (force=True la impone).
+    """
+    if _PREFORK['role'] == 'worker':
+        return _sync_snapshot(force)
+    with _DW_LOCK:
+        if (not force and _DW_CACHE['watcher'] and _DW_CACHE['parsed_summary'] is not None
+                and time.monotonic() - _DW_CACHE['checked_at'] < WATCH_INTERVAL):
+            return False
+        t0 = time.perf_counter()
+        snap = _dw_snapshot()
+        stat_s = time.perf_counter() - t0
+        _DW_CACHE['checked_at'] = time.monotonic()
+        if _DW_CACHE['snapshot'] == snap and _DW_CACHE['parsed_summary'] is not None:
+            _METRICS.stage('stat', stat_s)
+            return False
+        files = _DW_CACHE['files']
+        index = _DW_CACHE['search_index']
+        removed = [n for n in files if n not in snap]
+        changed = []
+        # differenze per file verso la versione precedente (None se troppo grandi per il changelog)
+        deltas = {}
+        delta_rows = 0
+        for name in removed:
+            if deltas is not None:
+                # righe del file eliminato come rimozioni: se il file ricompare entro la finestra
+                # del changelog il delta composto descrive le sue righe senza removedFiles
+                prev = _file_rows(name, reparse=False, keep=False)
+                if prev is None:
+                    deltas = None
+                else:
+                    diff, n = changelog.diff_file(prev, {})
+                    delta_rows += n
+                    if diff:
+                        deltas[name] = diff
+                    if delta_rows > _CHANGELOG.max_rows:
+                        deltas = None
+            files.pop(name, None)
+            _BLOCKS.discard(name)
+            index.remove_file(name)
+        parse_s = 0.0
+        index_s = 0.0
+        # righe dei file cambiati fino a fine allineamento; con il budget di memoria convertite
+        # subito in colonne compatte (i dict restano solo nel blocco LRU, anche all'avvio a freddo)
+        fresh = {}
+        staging = snapshot.ColumnBuffer() if _BLOCKS.limited else None
+        for name, sig in snap.items():
+            entry = files.get(name)
+            if entry and entry['sig'] == sig:
+                continue
+            changed.append(name)
+            t1 = time.perf_counter()
+            path = os.path.join(DW_DIR, name)
+            # blocco precedente: residente o ricaricato dallo snapshot (il file sorgente e' cambiato)
+            was_resident = name in _BLOCKS
+            prev = _file_rows(name, reparse=False, keep=False) if entry else None
+            # file solo cresciuto (stesso inode, prefisso invariato): si parsa solo la coda; le righe
+            # dell'ultima riga parziale sono riconosciute per identita', quindi solo su blocchi residenti
+            appended = None
+            if prev is not None and entry.get('tail') and (was_resident or not entry['tail'].get('partial')):
+                tail = dict(entry['tail'])
+                appended = parse_log_append(path, prev, tail)
+                _METRICS.cache('file_tail', 'hit' if appended is not None else 'miss')
+            if appended is not None:
+                data, new_rows = appended
+            else:
+                tail = {}
+                data = parse_log_file(path, tail)
+                new_rows = data
+            dt = time.perf_counter() - t1
+            parse_s += dt
+            _METRICS.parsed_file(name, dt, tail.get('bytes', sig[0]))
+            if deltas is not None:
+                if entry and prev is None:
+                    # righe precedenti non piu' disponibili: niente delta per questa versione
+                    deltas = None
+                elif prev is None and delta_rows + changelog.new_rows_count(data) > _CHANGELOG.max_rows:
+                    deltas = None
+                else:
+                    diff, n = changelog.diff_file(prev, data)
+                    delta_rows += n
+                    if diff:
+                        deltas[name] = diff
+                    if delta_rows > _CHANGELOG.max_rows:
+                        deltas = None
+            _BLOCKS.put(name, data)
+            index.add_file(name, data['lga'] + data['lge'])
+            if staging is not None:
+                views = {k: staging.add(data[k]) for k in block_cache.KINDS}
+                index.rebind(name, snapshot.Concat([views['lga'], views['lge']]))
+                if new_rows is data:
+                    new_rows = views
+                views.update(batch=data.get('batch'), node=data.get('node'))
+                data = views
+            fresh[name] = data
+            files[name] = {'sig': sig, 'tail': tail, 'batch': data.get('batch'), 'node': data.get('node'),
+                           'new': new_rows}
+            index_s += time.perf_counter() - t1 - dt
+        if _HISTORY is not None and changed:
+            # archivia nello storico i file di batch non ancora visti (DW tiene solo l'ultimo batch)
+            t3 = time.perf_counter()
+            pending = []
+            for name in changed:
+                entry = files[name]
+                bid = history.batch_id(entry['batch'], entry['sig'])
+                if _HISTORY.needs(bid, name, entry['sig']):
+                    # file gia' archiviato e cresciuto: bastano le righe accodate (la deduplica resta)
+                    rows = entry['new'] if _HISTORY.has_file(bid, name) else fresh[name]
+                    pending.append((bid, name, entry['sig'], _archivable(rows, entry['tail'].get('partial'))))
+            if pending:
+                try:
+                    _HISTORY.ingest(pending)
+                except Exception:
+                    pass
+                _METRICS.stage('history', time.perf_counter() - t3)
+        for name in changed:
+            files[name].pop('new', None)
+        t2 = time.perf_counter()
+        # Ricostruisci le liste aggregate (nuove liste: i lettori in corso restano coerenti).
+        # Con il budget di memoria i blocchi evitti entrano come viste dello snapshot precedente e
+        # le liste diventano Concat di blocchi, riscritti subito nel nuovo snapshot residente.
+        parts = {k: [] for k in block_cache.KINDS}
+        sizes = dict.fromkeys(block_cache.KINDS, 0)
+        file_spans = {}
+        spans = {}
+        for name in sorted(files):
+            data = fresh.get(name) or _BLOCKS.peek(name) or _evicted_rows(name)
+            fs = {}
+            for k in block_cache.KINDS:
+                n = len(data[k])
+                fs[k] = [sizes[k], sizes[k] + n]
+                sizes[k] += n
+                parts[k].append(data[k])
+            file_spans[name] = fs
+            spans[correlation.node_base(name)] = {k: fs[k] for k in inventory.SPAN_KINDS}
+        rows = {}
+        for k, blocks in parts.items():
+            if _BLOCKS.limited:
+                rows[k] = snapshot.Concat(blocks)
+            else:
+                rows[k] = []
+                for block in blocks:
+                    rows[k].extend(block)
+        _DW_CACHE['parsed_summary'] = {'lga': rows['lga'], 'lge': rows['lge'], 'lgdRestarts': rows['lgdRestarts']}
+        _DW_CACHE['lgd_metrics'] = rows['lgd']
+        _DW_CACHE['snapshot'] = snap
+        _DW_CACHE['version'] += 1
+        _DW_CACHE['catalog'] = _DW_CACHE['catalog'].update({n: {'data': d} for n, d in fresh.items()},
+                                                           changed, removed, spans,
+                                                           _DW_CACHE['parsed_summary'], _DW_CACHE['version'])
+        _DW_CACHE['updated_at'] = time.time()
+        _CHANGELOG.record(_DW_CACHE['version'], deltas, removed, delta_rows)
+        # invalida dipendenze derivate
+        _DW_CACHE['charts_summary'] = {}
+        _DW_CACHE['bootstrap'] = {}
+        _RESULTS.invalidate(_DW_CACHE['version'])
+        if _BLOCKS.limited:
+            _attach_resident(changed, removed, file_spans)
+        elif _PREFORK['role'] == 'master':
+            _write_snapshot(changed, removed)
+        _EVENTS.publish('dataset', {
+            'version': _DW_CACHE['version'],
+            'header': count_stats(refresh=False),
+            'changedNodes': sorted(changed),
+            'removedNodes': sorted(removed),
+        })
+        _METRICS.cache('files', 'hit', len(snap) - len(changed))
+        _METRICS.cache('files', 'rebuild', len(changed))
+        for name in ('parsed_summary', 'lgd_metrics', 'search_index', 'catalog'):
+            _METRICS.cache(name, 'rebuild')
+        _METRICS.stage('index', index_s)
+        _METRICS.refresh_done(stat_s, parse_s, time.perf_counter() - t2, len(changed), len(removed))
+        return True
+
+def _reingest_all():
+    """Re-ingestione completa di DW (scarta la cache per-file e l'indice full-text)."""
+    if _PREFORK['role'] == 'worker':
+        # l'ingestione e' del master: il worker chiede un refresh e aggancia lo snapshot
+        _refresh_dw(force=True)
+        return count_stats(refresh=False)
+    with _DW_LOCK:
+        _DW_CACHE['files'] = {}
+        _DW_CACHE['snapshot'] = None
+        _DW_CACHE['search_index'] = InvertedIndex()
+        _BLOCKS.clear()
+        _DW_CACHE['catalog'] = inventory.Catalog()
+        _refresh_dw(force=True)
+        return count_stats(refresh=False)
+
+def _archivable(data, partial):
+    """Righe di un file da archiviare nello storico senza quelle dell'ultima riga non terminata
+    (partial): il parse successivo la rilegge completa, mentre lo storico aggiunge soltanto e
+    una riga troncata vi resterebbe per sempre. Una occorrenza per riga, cercata dal fondo."""
+    if not partial:
+        return data
+    out = dict(data)
+    for kind in ('lga', 'lge', 'lgdRestarts', 'lgd'):
+        rows = list(data.get(kind) or ())
+        for held in partial:
+            for i in range(len(rows) - 1, -1, -1):
+                if rows[i] == held:
+                    del rows[i]
+                    break
+        out[kind] = rows
+    return out
+
+
+def _file_rows(name, reparse=True, keep=True):
+    """Blocco di righe di un file (come parse_log_file). Se evitto dal budget di memoria viene
+    ricaricato dallo snapshot residente o, con reparse=True, riparsando il file sorgente;
+    keep=False non lo rimette in cache. None se il file non e' nel dataset."""
+    data = _BLOCKS.get(name)
+    if data is not None:
+        return data
+    entry = _DW_CACHE['files'].get(name)
+    if entry is None:
+        return None
+    resident, file_spans = _DW_CACHE['resident'] or (None, {})
+    span = file_spans.get(name)
+    if span is not None:
+        data = {k: resident.rows(k)[s:e] for k, (s, e) in span.items()}
+        data['batch'] = entry.get('batch')
+        data['node'] = entry.get('node')
+        source = 'snapshot'
+    elif reparse:
+        data = parse_log_file(os.path.join(DW_DIR, name))
+        source = 'file'
+    else:
+        return None
+    _BLOCKS.reloaded(source)
+    _METRICS.cache('file_rows', 'rebuild')
+    if keep:
+        _BLOCKS.put(name, data)
     return data
 
+def _evicted_rows(name):
+    """Ricostruzione delle liste aggregate: blocco evitto come viste sullo snapshot residente
+    (nessuna riga materializzata); senza snapshot si riparsa il file."""
+    resident, file_spans = _DW_CACHE['resident'] or (None, {})
+    span = file_spans.get(name)
+    if span is None:
+        return _file_rows(name)
+    return {k: resident.rows(k).view(s, e) for k, (s, e) in span.items()}
+
+def _node_rows(catalog, record, kind):
+    """Righe di un nodo nel dataset kind. Con il budget di memoria passano dal blocco LRU del
+    file (i nodi consultati spesso restano materializzati), altrimenti dal blocco contiguo delle
+    liste aggregate del catalogo."""
+    if _BLOCKS.limited and catalog.version == _DW_CACHE['version']:
+        data = _file_rows(record['fileName'])
+        if data is not None:
+            return data[kind]
+    return catalog.bucket(record['node'], kind)
+
+def _attach_resident(changed, removed, file_spans):
+    """Budget di memoria: scrive la versione corrente nello snapshot mmap e ne fa la sorgente
+    delle liste aggregate (i dict delle righe restano solo nei blocchi LRU). Se la scrittura
+    fallisce restano le liste Concat e i blocchi evitti si ricaricano dai file sorgente."""
+    try:
+        _write_snapshot(changed, removed)
+        snap = snapshot.Snapshot(SNAPSHOT_PATH)
+    except Exception:
+        _DW_CACHE['resident'] = None
+        return
+    parsed = {k: snap.rows(k) for k in ('lga', 'lge', 'lgdRestarts')}
+    _DW_CACHE['parsed_summary'] = parsed
+    _DW_CACHE['lgd_metrics'] = snap.rows('lgd')
+    _DW_CACHE['resident'] = (snap, file_spans)
+    old = _DW_CACHE['catalog']
+    _DW_CACHE['catalog'] = inventory.Catalog(old.records, old.spans, parsed, old.version)
+    # dataset e indice full-text tornano a puntare allo snapshot (le posizioni non cambiano)
+    _DW_CACHE['datasets'] = {}
+    _DW_CACHE['frames'] = {}
+    index = _DW_CACHE['search_index']
+    for name, fs in file_spans.items():
+        index.rebind(name, snapshot.Concat([parsed['lga'].view(*fs['lga']), parsed['lge'].view(*fs['lge'])]))
+    charts = snap.meta.get('charts')
+    if charts:
+        _DW_CACHE['charts_summary'] = {k: (snap.version, _slice_charts(charts, k)) for k in range(1, 21)}
+    _METRICS.cache('snapshot', 'rebuild')
+
+def _write_snapshot(changed, removed):
+    """Pubblica la versione corrente nello snapshot mmap (letto dai worker pre-fork e, con il
+    budget di memoria, dal processo stesso)."""
+    version = _DW_CACHE['version']
+    parsed = _DW_CACHE['parsed_summary']
+    t0 = time.perf_counter()
+    # grafici calcolati una volta con top 20: i top-N minori sono prefissi (ordinamento stabile)
+    charts = _build_charts_summary(parsed, 20, version)
+    snapshot.write_snapshot(SNAPSHOT_PATH, version, {
+        'lga': parsed['lga'],
+        'lge': parsed['lge'],
+        'lgdRestarts': parsed['lgdRestarts'],
+        'lgd': _DW_CACHE['lgd_metrics'],
+    }, meta={
+        'header': count_stats(refresh=False),
+        'files': {n: list(sig) for n, sig in _DW_CACHE['snapshot'].items()},
+        'charts': charts,
+        'changedNodes': sorted(changed),
+        'removedNodes': sorted(removed),
+        'updatedAt': _DW_CACHE['updated_at'],
+        'changelog': _CHANGELOG.export(),
+        'inventory': _DW_CACHE['catalog'].export(),
+        'dwDir': os.path.abspath(DW_DIR),
+    })
+    _METRICS.stage('snapshot', time.perf_counter() - t0)
+
+def _slice_charts(charts, top_n):
+    out = {}
+    for k, v in charts.items():
+        if k == 'lgaSeverity':
+            out[k] = v
+        else:
+            out[k] = {'labels': v['labels'][:top_n], 'data': v['data'][:top_n]}
+    return out
+
+def _sync_snapshot(force=False):
+    """Worker pre-fork: aggancia l'ultimo snapshot del master (hot-swap quando cambia).
+    force=True chiede prima al master un refresh di DW e ne attende il completamento.
+    """
+    if force:
+        _request_master_refresh()
+    elif (_DW_CACHE['parsed_summary'] is not None
+          and time.monotonic() - _PREFORK['checked_at'] < SNAPSHOT_POLL):
+        return False
+    deadline = time.monotonic() + 600
+    while True:
+        try:
+            st = os.stat(SNAPSHOT_PATH)
+            break
+        except FileNotFoundError:
+            # primo avvio: attendi la prima ingestione del master
+            if _DW_CACHE['parsed_summary'] is not None or time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+    _PREFORK['checked_at'] = time.monotonic()
+    sig = (st.st_ino, st.st_mtime_ns, st.st_size)
+    current = _PREFORK['snapshot']
+    if current is not None and current.signature == sig:
+        return False
+    with _DW_LOCK:
+        current = _PREFORK['snapshot']
+        if current is not None and current.signature == sig:
+            return False
+        snap = snapshot.Snapshot(SNAPSHOT_PATH)
+        meta = snap.meta
+        _DW_CACHE['parsed_summary'] = {k: snap.rows(k) for k in ('lga', 'lge', 'lgdRestarts')}
+        _DW_CACHE['lgd_metrics'] = snap.rows('lgd')
+        _DW_CACHE['snapshot'] = {n: tuple(s) for n, s in meta.get('files', {}).items()}
+        _DW_CACHE['version'] = snap.version
+        _DW_CACHE['updated_at'] = meta.get('updatedAt')
+        _CHANGELOG.load(meta.get('changelog') or {})
+        _DW_CACHE['catalog'] = inventory.Catalog.load(meta.get('inventory') or {}, _DW_CACHE['parsed_summary'], snap.version)
+        _DW_CACHE['datasets'] = {}
+        _DW_CACHE['frames'] = {}
+        _DW_CACHE['bootstrap'] = {}
+        _RESULTS.invalidate(snap.version)
+        charts = meta.get('charts')
+        _DW_CACHE['charts_summary'] = {k: (snap.version, _slice_charts(charts, k)) for k in range(1, 21)} if charts else {}
+        # indice full-text ricostruito dal worker solo alla prima ricerca
+        _DW_CACHE['search_index'] = None
+        _PREFORK['snapshot'] = snap
+    _METRICS.cache('snapshot', 'rebuild')
+    _EVENTS.publish('dataset', {
+        'version': snap.version,
+        'header': meta.get('header') or count_stats(refresh=False),
+        'changedNodes': meta.get('changedNodes', []),
+        'removedNodes': meta.get('removedNodes', []),
+    })
+    return True
+
+def _request_master_refresh(timeout=120):
+    requested, done = _PREFORK['requested'], _PREFORK['done']
+    with requested.get_lock():
+        requested.value += 1
+        ticket = requested.value
+    try:
+        os.kill(_PREFORK['master_pid'], signal.SIGUSR1)
+    except OSError:
+        return
+    deadline = time.monotonic() + timeout
+    while done.value < ticket and time.monotonic() < deadline:
+        time.sleep(0.02)
+    _PREFORK['checked_at'] = 0
+
+def _follow_snapshot():
+    """Thread del worker: aggancia i nuovi snapshot anche senza richieste (notifiche SSE)."""
+    while True:
+        try:
+            _sync_snapshot()
+        except Exception:
+            pass
+        time.sleep(SNAPSHOT_POLL)
+
+def _watch_dw():
+    """Thread watcher: riallinea periodicamente la cache e notifica i client SSE."""
+    while True:
+        try:
+            _refresh_dw(force=True)
+        except Exception:
+            pass
+        time.sleep(WATCH_INTERVAL)
+
+def start_watcher():
+    if _DW_CACHE['watcher']:
+        return
+    _DW_CACHE['watcher'] = True
+    threading.Thread(target=_watch_dw, name='dw-watcher', daemon=True).start()
+
+def _get_parsed_summary_cached():
+    _METRICS.cache('parsed_summary', 'miss' if _refresh_dw() else 'hit')
+    return _DW_CACHE['parsed_summary']
+
 def _get_lgd_metrics_cached():
-    snap = _dw_snapshot()
-    if _DW_CACHE.get('snapshot') == snap and _DW_CACHE.get('lgd_metrics') is not None:
-        return _DW_CACHE['lgd_metrics']
-    items = parse_lgd_metrics()
-    _DW_CACHE['snapshot'] = snap
-    _DW_CACHE['lgd_metrics'] = items
-    return items
+    _METRICS.cache('lgd_metrics', 'miss' if _refresh_dw() else 'hit')
+    return _DW_CACHE['lgd_metrics']
 
-def _get_charts_summary_cached(top_n=5):
-    snap = _dw_snapshot()
+def _get_search_index_cached():
+    _METRICS.cache('search_index', 'miss' if _refresh_dw() else 'hit')
+    index = _DW_CACHE['search_index']
+    if index is None:
+        # worker pre-fork: indice costruito dallo snapshot alla prima ricerca della versione
+        with _DW_LOCK:
+            index = _DW_CACHE['search_index']
+            if index is None:
+                parsed = _DW_CACHE['parsed_summary']
+                by_file = {}
+                for key in ('lga', 'lge'):
+                    for it in parsed[key]:
+                        by_file.setdefault(it['fileName'], []).append(it)
+                index = InvertedIndex()
+                for name, rows in by_file.items():
+                    index.add_file(name, rows)
+                _DW_CACHE['search_index'] = index
+                _METRICS.cache('search_index', 'rebuild')
+    return index
+
+def _get_catalog_cached():
+    _METRICS.cache('catalog', 'miss' if _refresh_dw() else 'hit')
+    return _DW_CACHE['catalog']
+
+def _get_dataset_cached(key, refresh=True):
+    """Dataset interrogabile (con indici on-demand) per 'lga', 'lge', 'lgdRestarts' o 'lgd'."""
+    if refresh:
+        _refresh_dw()
+    version = _DW_CACHE['version']
+    entry = _DW_CACHE['datasets'].get(key)
+    if entry is not None and entry.version == version:
+        _METRICS.cache('datasets', 'hit')
+        return entry
+    _METRICS.cache('datasets', 'miss')
+    _METRICS.cache('datasets', 'rebuild')
+    if key == 'lgd':
+        rows = _DW_CACHE['lgd_metrics']
+    else:
+        rows = _DW_CACHE['parsed_summary'].get(key, [])
+    # lga/lge/lgdRestarts: blocchi per file gia' ordinati per tempo (parse_log_file)
+    entry = query_engine.Dataset(rows, version, time_sorted=(key != 'lgd'))
+    _DW_CACHE['datasets'][key] = entry
+    return entry
+
+def _frame_of(key, rows):
+    """Colonne codificate (analytics.Frame) delle righe del dataset, riusate finche' le righe
+    sono le stesse (stessa versione, stesse viste dello snapshot); None senza NumPy."""
+    if not analytics.ENABLED:
+        return None
+    entry = _DW_CACHE['frames'].get(key)
+    if entry is not None and entry.rows is rows:
+        _METRICS.cache('frames', 'hit')
+        return entry
+    _METRICS.cache('frames', 'miss')
+    _METRICS.cache('frames', 'rebuild')
+    entry = analytics.Frame(rows)
+    _DW_CACHE['frames'][key] = entry
+    return entry
+
+def _get_charts_summary_cached(top_n=5, refresh=True):
+    # costruisci dai dati parsati (riuso cache se presente)
+    data = _get_parsed_summary_cached() if refresh else _DW_CACHE['parsed_summary']
+    version = _DW_CACHE['version']
     key = max(1, min(20, int(top_n or 5)))
     entry = _DW_CACHE['charts_summary'].get(key)
-    if entry and entry[0] == snap:
+    if entry and entry[0] == version:
+        _METRICS.cache('charts_summary', 'hit')
         return entry[1]
-    # costruisci dai dati parsati (riuso cache se presente)
-    data = _get_parsed_summary_cached()
+    _METRICS.cache('charts_summary', 'miss')
+    # calcolo una sola volta per versione: le richieste concorrenti attendono il primo calcolo
+    with _DW_LOCK:
+        entry = _DW_CACHE['charts_summary'].get(key)
+        if entry and entry[0] == _DW_CACHE['version']:
+            return entry[1]
+        version = _DW_CACHE['version']
+        data = _DW_CACHE['parsed_summary']
+        t0 = time.perf_counter()
+        charts = _build_charts_summary(data, key, version)
+        _METRICS.cache('charts_summary', 'rebuild')
+        _METRICS.stage('charts', time.perf_counter() - t0)
+        return charts
+
+def _value_counts(rows, *fields):
+    """Conteggi delle combinazioni di valori dei campi, nell'ordine di prima comparsa. Sulle viste
+    dello snapshot (anche dentro un Concat) si contano gli id delle colonne senza costruire righe."""
+    counter = {}
+    parts = rows.parts if isinstance(rows, snapshot.Concat) else (rows,)
+    for part in parts:
+        cols = [part.column(f) for f in fields] if isinstance(part, snapshot.SnapshotRows) else [None]
+        if any(c is None for c in cols):
+            get = [operator.methodcaller('get', f) for f in fields]
+            counts = collections.Counter(zip(*(map(g, part) for g in get)))
+            value = None
+        else:
+            counts = collections.Counter(zip(*cols))
+            value = part.value
+        for k, n in counts.items():
+            if value is not None:
+                k = tuple(map(value, k))
+            counter[k] = counter.get(k, 0) + n
+    return counter
+
+def _build_charts_summary(data, key, version):
     lga = data.get('lga', [])
     lge = data.get('lge', [])
     lgd = data.get('lgdRestarts', [])
     charts = compute_charts_summary(key) if False else None
-    # ricostruisci direttamente evitando rilettura file
-    def _top_counts(items, key_name, top_n_local):
+    # ricostruisci direttamente evitando rilettura file; con NumPy i conteggi sono vettoriali
+    # sulle colonne codificate (stessi valori e stesso ordine di prima comparsa)
+    rows_of = {'lga': lga, 'lge': lge, 'lgdRestarts': lgd}
+    frames = {kind: _frame_of(kind, rows) for kind, rows in rows_of.items()}
+    def _counts(kind, *fields):
+        if frames[kind] is not None:
+            return analytics.value_counts(frames[kind], fields)
+        return _value_counts(rows_of[kind], *fields)
+    def _top_counts(kind, key_name, top_n_local):
         counter = {}
-        for it in items:
-            k = (it.get(key_name) or '').strip() or 'N/D'
-            counter[k] = counter.get(k, 0) + 1
+        for (v,), n in _counts(kind, key_name).items():
+            k = (v or '').strip() or 'N/D'
+            counter[k] = counter.get(k, 0) + n
         pairs = sorted(counter.items(), key=lambda kv: kv[1], reverse=True)[:top_n_local]
         return {'labels': [p[0] for p in pairs], 'data': [p[1] for p in pairs]}
-    lga_top_title = _top_counts(lga, 'title', key)
-    lge_top_title = _top_counts(lge, 'title', key)
+    lga_top_title = _top_counts('lga', 'title', key)
+    lge_top_title = _top_counts('lge', 'title', key)
     sev = {}
-    for it in lga:
-        s = (it.get('severity') or '').strip().upper() or 'N/D'
-        sev[s] = sev.get(s, 0) + 1
+    for (v,), n in _counts('lga', 'severity').items():
+        s = (v or '').strip().upper() or 'N/D'
+        sev[s] = sev.get(s, 0) + n
     sev_pairs = sorted(sev.items(), key=lambda kv: kv[1], reverse=True)
     lga_severity = {'labels': [p[0] for p in sev_pairs], 'data': [p[1] for p in sev_pairs]}
-    lgd_top_type = _top_counts(lgd, 'typeReason', key)
-    lgd_top_node = _top_counts(lgd, 'fileName', key)
-    def _parse_duration_sec(s):
-        try:
-            raw = (s or '').strip().lower()
-            if not raw:
-                return 0
-            m = DURATION_RX.match(raw)
-            if m:
-                return int(m.group(1) or '0') * 3600 + int(m.group(2) or '0') * 60 + int(m.group(3) or '0')
-            m2 = re.match(r"^(\d+)\s*s\b", raw)
-            if m2:
-                return int(m2.group(1))
-            total = 0
-            mh = re.search(r"(\d+)\s*h", raw)
-            mm = re.search(r"(\d+)\s*m", raw)
-            ms = re.search(r"(\d+)\s*s", raw)
-            if mh:
-                total += int(mh.group(1)) * 3600
-            if mm:
-                total += int(mm.group(1)) * 60
-            if ms:
-                total += int(ms.group(1))
-            return total
-        except Exception:
-            return 0
+    lgd_top_type = _top_counts('lgdRestarts', 'typeReason', key)
+    lgd_top_node = _top_counts('lgdRestarts', 'fileName', key)
+    if frames['lgdRestarts'] is not None:
+        seconds = analytics.sums(frames['lgdRestarts'], 'typeReason', 'duration', parse_duration_sec)
+    else:
+        seconds = {}
+        for (v, duration), n in _value_counts(lgd, 'typeReason', 'duration').items():
+            seconds[v] = seconds.get(v, 0) + parse_duration_sec(duration or '') * n
     dmap = {}
-    for it in lgd:
-        k = (it.get('typeReason') or '').strip() or 'N/D'
-        dmap[k] = dmap.get(k, 0) + _parse_duration_sec(it.get('duration') or '')
+    for v, total in seconds.items():
+        k = (v or '').strip() or 'N/D'
+        dmap[k] = dmap.get(k, 0) + total
     d_pairs = sorted(dmap.items(), key=lambda kv: kv[1], reverse=True)[:key]
     charts = {
         'lgaTopByTitle': lga_top_title,
@@ -131,13 +732,181 @@ def _get_charts_summary_cached(top_n=5):
         'lgdTopByFileName': lgd_top_node,
         'lgdDurationByTypeReason': {'labels': [p[0] for p in d_pairs], 'data': [p[1] for p in d_pairs]},
     }
-    _DW_CACHE['charts_summary'][key] = (snap, charts)
+    _DW_CACHE['charts_summary'][key] = (version, charts)
     return charts
 
+def _get_bootstrap_cached(top_n=5, limit=10000, columnar=False, fallback=False):
+    """Corpo di /api/bootstrap pre-serializzato per versione: (version, json_bytes, gzip_bytes).
+    Header, grafici e prime pagine dei dataset vengono costruiti sotto un unico allineamento;
+    columnar=True: dataset nel formato colonnare di wire.py; fallback=True: risposta completa a
+    un since= fuori dalla finestra del changelog (con delta: false, come gli endpoint evento).
+    """
+    with _DW_LOCK:
+        _refresh_dw()
+        version = _DW_CACHE['version']
+        key = (top_n, limit, columnar, fallback)
+        entry = _DW_CACHE['bootstrap'].get(key)
+        if entry and entry[0] == version:
+            _METRICS.cache('bootstrap', 'hit')
+            return entry
+        _METRICS.cache('bootstrap', 'miss')
+        _METRICS.cache('bootstrap', 'rebuild')
+        result = {
+            'ok': True,
+            'version': version,
+            'header': count_stats(refresh=False),
+            'charts': _get_charts_summary_cached(top_n, refresh=False),
+        }
+        for path in ('/api/lga', '/api/lge', '/api/lgd', '/api/lgd_metrics'):
+            ds_key, _params, _default_limit, default_sort = EVENT_ENDPOINTS[path]
+            query = query_engine.Query(sort=query_engine.Query.parse_sort(default_sort), limit=limit)
+            rows = _api_rows(ds_key, query.run(_get_dataset_cached(ds_key, refresh=False))[0])
+            result[ds_key] = wire.encode(rows) if columnar else rows
+        if columnar:
+            result['format'] = wire.FORMAT
+        if fallback:
+            result['delta'] = False
+        body = json.dumps(result).encode('utf-8')
+        entry = (version, body, gzip.compress(body, 5))
+        _DW_CACHE['bootstrap'][key] = entry
+        return entry
+
+
+def _get_outage_timelines_cached():
+    """(version, timeline per nodo) dei disservizi LGD, ricostruite una volta per versione."""
+    dataset = _get_dataset_cached('lgdRestarts')
+    entry = _DW_CACHE['timelines']
+    if entry is not None and entry[0] == dataset.version:
+        _METRICS.cache('timelines', 'hit')
+        return entry
+    _METRICS.cache('timelines', 'miss')
+    with _DW_LOCK:
+        entry = _DW_CACHE['timelines']
+        if entry is not None and entry[0] == dataset.version:
+            return entry
+        entry = (dataset.version, correlation.build_timelines(dataset.rows, parse_duration_sec))
+        _DW_CACHE['timelines'] = entry
+        _METRICS.cache('timelines', 'rebuild')
+        return entry
+
+
+def _get_cell_index_cached():
+    """(version, indice dei disservizi per cella), ricostruito una volta per versione."""
+    dataset = _get_dataset_cached('lgdRestarts')
+    entry = _DW_CACHE['cell_index']
+    if entry is not None and entry[0] == dataset.version:
+        _METRICS.cache('cell_index', 'hit')
+        return entry
+    _METRICS.cache('cell_index', 'miss')
+    with _DW_LOCK:
+        entry = _DW_CACHE['cell_index']
+        if entry is not None and entry[0] == dataset.version:
+            return entry
+        entry = (dataset.version, cell_outages.build_cell_index(dataset.rows, parse_duration_sec))
+        _DW_CACHE['cell_index'] = entry
+        _METRICS.cache('cell_index', 'rebuild')
+        return entry
+
+
+def _get_event_index_cached():
+    """(version, {'lga': ..., 'lge': ...}) tempi degli eventi per nodo, una volta per versione."""
+    datasets = {key: _get_dataset_cached(key) for key in ('lga', 'lge')}
+    version = datasets['lga'].version
+    entry = _DW_CACHE['event_index']
+    if entry is not None and entry[0] == version:
+        _METRICS.cache('event_index', 'hit')
+        return entry
+    _METRICS.cache('event_index', 'miss')
+    with _DW_LOCK:
+        entry = _DW_CACHE['event_index']
+        if entry is not None and entry[0] == version:
+            return entry
+        entry = (version, {key: correlation.build_event_index(ds.rows) for key, ds in datasets.items()})
+        _DW_CACHE['event_index'] = entry
+        _METRICS.cache('event_index', 'rebuild')
+        return entry
+
+
+def alarm_outage_join(window_s, kinds=('lga', 'lge'), nodes=None, date_from='', date_to='', reasons=(), title=''):
+    """Join per nodo tra restart/disservizi LGD e allarmi/eventi entro +/- window_s secondi.
+    Ritorna (version, righe eventi per tipo, lista di (riga disservizio, inizio, {tipo: (voce, indici)}))
+    dove voce = (tempi, posizioni, titoli) dell'indice del nodo e indici = range (o lista se filtrati
+    per titolo) delle corrispondenze: le righe evento si materializzano solo quando servono."""
+    # timeline, indice e righe della stessa versione (il refresh di DW sostituisce tutto sotto lock)
+    with _DW_LOCK:
+        version, timelines = _get_outage_timelines_cached()
+        _ev_version, index = _get_event_index_cached()
+        outage_rows = _get_dataset_cached('lgdRestarts', refresh=False).rows
+        event_rows = {kind: _get_dataset_cached(kind, refresh=False).rows for kind in kinds}
+    lo = correlation.to_epoch(date_from, '00:00:00') if date_from else None
+    hi = correlation.to_epoch(date_to, '23:59:59') if date_to else None
+    wanted = {correlation.node_base(n) for n in nodes} if nodes else None
+    title = query_engine.normalize('title', title) if title else ''
+    empty = ((), (), ())
+    out = []
+    for node, tl in timelines.items():
+        if wanted is not None and node not in wanted:
+            continue
+        spans = {}
+        for kind in kinds:
+            entry = index[kind].get(node) or empty
+            spans[kind] = (entry, correlation.window_matches(tl.starts, entry[0], window_s))
+        for k, start in enumerate(tl.starts):
+            if (lo is not None and start < lo) or (hi is not None and start > hi):
+                continue
+            if reasons:
+                r = query_engine.normalize('typeReason', tl.reasons[k])
+                if not any(x in r for x in reasons):
+                    continue
+            matches = {}
+            for kind, (entry, ranges) in spans.items():
+                idxs = range(*ranges[k])
+                if title:
+                    titles = entry[2]
+                    idxs = [i for i in idxs if title in query_engine.normalize('title', titles[i])]
+                matches[kind] = (entry, idxs)
+            out.append((outage_rows[tl.positions[k]], start, matches))
+    return version, event_rows, out
+
+
+def _joined_events(rows, entry, idxs, start, limit=None):
+    """Righe evento di una corrispondenza del join, con lo scarto in secondi dal disservizio."""
+    times, positions, _titles = entry
+    if limit is not None:
+        idxs = idxs[:limit]
+    return [(rows[positions[i]], times[i] - start) for i in idxs]
+
+
+# Ordinamenti di /api/correlation/outages: nome -> (chiave, decrescente)
+CORRELATION_SORTS = {
+    'nodes': (lambda inc: (inc['nodeCount'], inc['unionDowntimeSeconds']), True),
+    'downtime': (lambda inc: (inc['unionDowntimeSeconds'], inc['nodeCount']), True),
+    'start': (lambda inc: (inc['start'], inc['group']), False),
+    '-start': (lambda inc: (inc['start'], inc['group']), True),
+}
+
+
+def _find_job(job_id):
+    """Job di export per id. Con piu' worker il job puo' essere stato creato da un altro processo:
+    in quel caso lo zip gia' scritto su disco (suffisso = primi 8 caratteri dell'id) basta.
+    """
+    info = JOBS.get(job_id)
+    if info or _PREFORK['role'] != 'worker' or len(job_id) < 8:
+        return info
+    suffix = f'_{job_id[:8]}.zip'
+    try:
+        for name in os.listdir(EXPORT_DIR):
+            if name.endswith(suffix):
+                return {'status': 'done', 'percent': 100, 'message': 'Pronto', 'zip_path': os.path.join(EXPORT_DIR, name)}
+    except Exception:
+        pass
+    return None
+
 
 def ensure_dirs():
     try:
         os.makedirs(EXPORT_DIR, exist_ok=True)
+        os.makedirs(CACHE_DIR, exist_ok=True)
     except Exception:
         pass
 
@@ -169,7 +938,7 @@ def iter_log_files():
     return [os.path.join(DW_DIR, n) for n in os.listdir(DW_DIR) if n.lower().endswith('.log')]
 
 
-def count_stats():
+def count_stats(refresh=True):
     total_files = 0
     lga_count = 0
     lge_count = 0
@@ -183,17 +952,17 @@ def count_stats():
             'lgdCount': 0,
             'lgdRestartsCount': 0,
         }
-    # Usa il parser con cache per LGA/LGE e LGD restarts
-    parsed = _get_parsed_summary_cached()
+    # Un solo allineamento della cache per tutti i conteggi (refresh=False: chiamante gia' allineato)
+    if refresh:
+        _refresh_dw()
+    parsed = _DW_CACHE['parsed_summary'] or {}
     lga_count = len(parsed.get('lga', []))
     lge_count = len(parsed.get('lge', []))
     lgd_restarts_count = len(parsed.get('lgdRestarts', []))
     # Conta metriche LGD usando cache
-    lgd_items = _get_lgd_metrics_cached()
-    lgd_count = len(lgd_items)
+    lgd_count = len(_DW_CACHE['lgd_metrics'] or [])
     # Conta file
-    for _ in iter_log_files():
-        total_files += 1
+    total_files = len(_DW_CACHE['snapshot'] or {})
     return {
         'totalFiles': total_files,
         'lgaCount': lga_count,
@@ -209,93 +978,309 @@ OLD_ROW = re.compile(r"^(\d{4}-\d{2}-\d{2})\s+(\d{2}:\d{2}:\d{2})\s+(AL|EV)\s+([
 DURATION_RX = re.compile(r"^(\d{1,2}):(\d{2}):(\d{2})$")
 
 
+def parse_duration_sec(s):
+    """Durata LGD in secondi: 'HH:MM:SS', '12s', '12599s (3h29m)', '1h2m3s'; 0 se assente."""
+    try:
+        raw = (s or '').strip().lower()
+        if not raw:
+            return 0
+        m = DURATION_RX.match(raw)
+        if m:
+            return int(m.group(1) or '0') * 3600 + int(m.group(2) or '0') * 60 + int(m.group(3) or '0')
+        m2 = re.match(r"^(\d+)\s*s\b", raw)
+        if m2:
+            return int(m2.group(1))
+        total = 0
+        mh = re.search(r"(\d+)\s*h", raw)
+        mm = re.search(r"(\d+)\s*m", raw)
+        ms = re.search(r"(\d+)\s*s", raw)
+        if mh:
+            total += int(mh.group(1)) * 3600
+        if mm:
+            total += int(mm.group(1)) * 60
+        if ms:
+            total += int(ms.group(1))
+        return total
+    except Exception:
+        return 0
+
+
+def _parse_summary_line(line, fname, lga, lge, lgd_restarts):
+    """Classifica una riga di log in LGA/LGE/LGD restarts. Ritorna True se la riga e' stata consumata."""
+    # Gestione righe delimitate da punto e virgola
+    if ';' in line:
+        parts = [p.strip() for p in line.split(';')]
+        # Caso 1: data;ora;...
+        if len(parts) >= 3 and re.match(r'^\d{4}-\d{2}-\d{2}$', parts[0]) and re.match(r'^\d{2}:\d{2}:\d{2}$', parts[1]):
+            type_field = (parts[2] or '').strip().upper()
+            # AL/EV (LGA/LGE)
+            if type_field in ('AL', 'EV'):
+                item = {
+                    'fileName': fname,
+                    'dateIso': parts[0],
+                    'time': parts[1],
+                    'type': type_field,
+                    'severity': parts[3] if len(parts) > 3 else '',
+                    'object': parts[4] if len(parts) > 4 else '',
+                    'title': parts[5] if len(parts) > 5 else '',
+                    'detail': parts[6] if len(parts) > 6 else ''
+                }
+                if type_field == 'AL':
+                    lga.append(item)
+                else:
+                    lge.append(item)
+                return True
+            # LGD/LGDC eventi: non richiedere durata in formato HH:MM:SS (coerente con frontend)
+            if len(parts) >= 6:
+                ev = {
+                    'fileName': fname,
+                    'dateIso': parts[0],
+                    'time': parts[1],
+                    'typeReason': parts[2] or '',
+                    'value': parts[3] or '',
+                    'comment': parts[4] or '',
+                    'duration': parts[5] or ''
+                }
+                ev.update(cell_outages.decompose(ev['typeReason'], ev['value']))
+                lgd_restarts.append(ev)
+                return True
+        # Caso 2: timestamp combinato "YYYY-MM-DD HH:MM:SS;..."
+        if len(parts) >= 2 and re.match(r'^\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2}$', parts[0]):
+            dateIso, time_ = parts[0][:10], parts[0][11:]
+            # Formato restart atteso: ts;Type/Reason;Value;Comment;Duration
+            if len(parts) >= 5:
+                ev = {
+                    'fileName': fname,
+                    'dateIso': dateIso,
+                    'time': time_,
+                    'typeReason': parts[1] or '',
+                    'value': parts[2] or '',
+                    'comment': parts[3] or '',
+                    'duration': parts[4] or ''
+                }
+                ev.update(cell_outages.decompose(ev['typeReason'], ev['value']))
+                lgd_restarts.append(ev)
+                return True
+
+    # Fallback: vecchio formato spazio-delimitato per LGA/LGE
+    m2 = OLD_ROW.match(line)
+    if m2:
+        item = {
+            'fileName': fname,
+            'dateIso': m2.group(1),
+            'time': m2.group(2),
+            'type': m2.group(3),
+            'severity': m2.group(4),
+            'object': '',
+            'title': m2.group(5).strip(),
+            'detail': ''
+        }
+        if item['type'] == 'AL':
+            lga.append(item)
+        else:
+            lge.append(item)
+        return True
+    return False
+
+
+LGD_METRIC_PREFIXES = ('Number Of outages', 'Total downtime', 'Downtime per day', 'Downtime per outage')
+
+
+def _parse_metric_line(line, fname):
+    if ';' in line:
+        parts = [p.strip() for p in line.split(';')]
+    else:
+        parts = [p.strip() for p in re.split(r"\s{2,}", line)]
+    if len(parts) < 6:
+        return None
+    return {
+        'fileName': fname,
+        'metric': parts[0],
+        'nodeUpgrade': parts[1],
+        'nodeManual': parts[2],
+        'nodeSpontaneous': parts[3],
+        'allNodeRestarts': parts[4],
+        'partialOutages': parts[5],
+    }
+
+
+def _event_time(it):
+    return it['dateIso'], it['time']
+
+
+# Byte confrontati (inizio del file e ultimi prima dell'offset) per riconoscere un file che e'
+# solo cresciuto da uno riscritto o troncato
+TAIL_CHECK_BYTES = 4096
+
+
+def _tail_marks(f, offset):
+    """Hash dei primi e degli ultimi TAIL_CHECK_BYTES della parte gia' letta (fino a offset)."""
+    f.seek(0)
+    head = f.read(min(offset, TAIL_CHECK_BYTES))
+    start = max(0, offset - TAIL_CHECK_BYTES)
+    f.seek(start)
+    mark = f.read(offset - start)
+    return hashlib.sha1(head).hexdigest(), hashlib.sha1(mark).hexdigest()
+
+
+# Righe di sessione AMOS con i metadati del nodo (inventory.py)
+NODE_LINE_PREFIXES = ('Connected to ', 'Checking ', 'Node uptime since last restart', 'Unable to connect',
+                      'Cannot connect') + inventory.CELL_TYPES
+CONNECTED_RX = re.compile(r"^Connected to (\S+) \((.*)\)")
+CELL_RX = re.compile(r"^(" + '|'.join(inventory.CELL_TYPES) + r")=(\S+)(?:\s+(\S+))?$")
+UPTIME_RX = re.compile(r"^Node uptime since last restart:\s*(\d+)")
+
+
+def _parse_node_line(line, meta):
+    """Aggiorna i metadati del nodo con una riga di sessione (righe ripetute: vince l'ultima)."""
+    if line.startswith('Checking '):
+        if line.startswith('Checking ip contact...'):
+            meta['ipContact'] = line[len('Checking ip contact...'):].strip()
+        elif line.startswith('Checking MOM version...'):
+            meta['momVersion'] = line[len('Checking MOM version...'):].strip()
+        return
+    if line.startswith('Connected to '):
+        m = CONNECTED_RX.match(line)
+        if m:
+            meta['ip'] = m.group(1)
+            meta['dn'] = m.group(2)
+        return
+    if line.startswith('Node uptime'):
+        m = UPTIME_RX.match(line)
+        if m:
+            meta['uptimeSeconds'] = int(m.group(1))
+        return
+    if line.startswith(('Unable to connect', 'Cannot connect')):
+        if line.startswith('Unable to connect to ') and not meta['ip']:
+            meta['ip'] = line[len('Unable to connect to '):].rsplit(':', 1)[0].strip()
+        if not meta['error']:
+            meta['error'] = line
+        return
+    m = CELL_RX.match(line)
+    if m:
+        cid = m.group(3)
+        meta['cells'].setdefault(m.group(1), {})[m.group(2)] = int(cid) if cid and cid.isdigit() else cid
+
+
+def _parse_lines(text, fname, out, node_meta=True):
+    lga, lge, lgd_restarts, lgd = out['lga'], out['lge'], out['lgdRestarts'], out['lgd']
+    meta = out['node'] if node_meta else None
+    for raw in text.split('\n'):
+        line = raw.strip()
+        if not line:
+            continue
+        if out['batch'] is None and line.startswith('Logging to file'):
+            out['batch'] = history.batch_from_header(line)
+            continue
+        if line.startswith(LGD_METRIC_PREFIXES):
+            it = _parse_metric_line(line, fname)
+            if it is not None:
+                lgd.append(it)
+            continue
+        if line.startswith('='):
+            continue
+        if line.startswith(NODE_LINE_PREFIXES):
+            if meta is not None:
+                _parse_node_line(line, meta)
+            continue
+        _parse_summary_line(line, fname, lga, lge, lgd_restarts)
+
+
+def _parse_chunk(chunk, fname, out):
+    """Parsa le righe di chunk (bytes) aggiungendole alle liste di out. Ritorna le righe prodotte
+    dall'ultima riga se non e' terminata da newline (da scartare quando il file crescera').
+    I metadati del nodo di una riga non terminata si leggono quando la riga si completa."""
+    end = chunk.rfind(b'\n') + 1
+    _parse_lines(chunk[:end].decode('utf-8', errors='ignore'), fname, out)
+    if end == len(chunk):
+        return []
+    keys = ('lga', 'lge', 'lgdRestarts', 'lgd')
+    sizes = [len(out[k]) for k in keys]
+    _parse_lines(chunk[end:].decode('utf-8', errors='ignore'), fname, out, node_meta=False)
+    return [it for k, n in zip(keys, sizes) for it in out[k][n:]]
+
+
+def parse_log_file(path, tail=None):
+    """Parsa un singolo file di log in un solo passaggio.
+    Ritorna {'lga', 'lge', 'lgdRestarts', 'lgd'} con le righe del file, 'batch', l'id del batch
+    AMOS dall'intestazione 'Logging to file .../amosbatch/<id>/' (None se assente), e 'node',
+    i metadati di sessione del nodo (IP, MeContext, versione MOM, uptime, celle; inventory.py).
+    tail (dict opzionale) riceve lo stato per parse_log_append: inode, offset dopo l'ultima riga
+    completa, hash di controllo e righe prodotte da un'eventuale ultima riga non terminata.
+    """
+    fname = os.path.basename(path)
+    out = {'lga': [], 'lge': [], 'lgdRestarts': [], 'lgd': [], 'batch': None, 'node': inventory.new_meta()}
+    try:
+        with open(path, 'rb') as f:
+            chunk = f.read()
+            partial = _parse_chunk(chunk, fname, out)
+            if tail is not None:
+                offset = chunk.rfind(b'\n') + 1
+                head, mark = _tail_marks(f, offset)
+                tail.update(ino=os.fstat(f.fileno()).st_ino, offset=offset, head=head, mark=mark,
+                            partial=partial, bytes=len(chunk))
+    except Exception:
+        # ignora file non leggibili
+        pass
+    # eventi del file in ordine temporale: le query "piu' recenti/meno recenti" fanno un merge
+    # k-way dei blocchi per file invece di ordinare l'intero dataset
+    for key in ('lga', 'lge', 'lgdRestarts'):
+        out[key].sort(key=_event_time)
+    return out
+
+
+def parse_log_append(path, prev, tail):
+    """Parse incrementale di un file cresciuto: legge solo i byte dopo tail['offset'] e li unisce
+    alle righe di prev. Ritorna (dati, righe nuove per dataset) oppure None se il file non e' un
+    semplice accodamento (inode diverso, troncato o contenuto gia' letto cambiato): serve allora
+    il parse completo. tail viene aggiornato."""
+    fname = os.path.basename(path)
+    try:
+        with open(path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            offset = tail['offset']
+            if st.st_ino != tail['ino'] or st.st_size < offset:
+                return None
+            if _tail_marks(f, offset) != (tail['head'], tail['mark']):
+                return None
+            f.seek(offset)
+            chunk = f.read()
+            added = {'lga': [], 'lge': [], 'lgdRestarts': [], 'lgd': [], 'batch': prev.get('batch'),
+                     'node': inventory.copy_meta(prev.get('node') or inventory.new_meta())}
+            partial = _parse_chunk(chunk, fname, added)
+            new_offset = offset + chunk.rfind(b'\n') + 1
+            head, mark = _tail_marks(f, new_offset)
+    except Exception:
+        return None
+    # le righe dell'ultima riga non terminata letta la volta precedente vengono rilette ora
+    stale = {id(it) for it in tail.get('partial') or ()}
+    data = {'batch': added.pop('batch'), 'node': added.pop('node')}
+    for key in ('lga', 'lge', 'lgdRestarts', 'lgd'):
+        rows = prev.get(key) or []
+        if stale:
+            rows = [it for it in rows if id(it) not in stale]
+        new_rows = added[key]
+        if key != 'lgd':
+            new_rows.sort(key=_event_time)
+            # due sequenze gia' ordinate: il sort stabile le fonde in tempo lineare
+            rows = rows + new_rows
+            rows.sort(key=_event_time)
+        else:
+            rows = rows + new_rows
+        data[key] = rows
+    tail.update(offset=new_offset, head=head, mark=mark, partial=partial, bytes=len(chunk))
+    return data, added
+
+
 def parse_logs_summary():
     lga = []
     lge = []
     lgd_restarts = []
     for path in iter_log_files():
-        fname = os.path.basename(path)
-        try:
-            with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-                for raw in f:
-                    line = raw.strip()
-                    if not line or line.startswith('='):
-                        continue
-
-                    # Gestione righe delimitate da punto e virgola
-                    if ';' in line:
-                        parts = [p.strip() for p in line.split(';')]
-                        # Caso 1: data;ora;...
-                        if len(parts) >= 3 and re.match(r'^\d{4}-\d{2}-\d{2}$', parts[0]) and re.match(r'^\d{2}:\d{2}:\d{2}$', parts[1]):
-                            type_field = (parts[2] or '').strip().upper()
-                            # AL/EV (LGA/LGE)
-                            if type_field in ('AL', 'EV'):
-                                item = {
-                                    'fileName': fname,
-                                    'dateIso': parts[0],
-                                    'time': parts[1],
-                                    'type': type_field,
-                                    'severity': parts[3] if len(parts) > 3 else '',
-                                    'object': parts[4] if len(parts) > 4 else '',
-                                    'title': parts[5] if len(parts) > 5 else '',
-                                    'detail': parts[6] if len(parts) > 6 else ''
-                                }
-                                if type_field == 'AL':
-                                    lga.append(item)
-                                else:
-                                    lge.append(item)
-                                continue
-                            # LGD/LGDC eventi: non richiedere durata in formato HH:MM:SS (coerente con frontend)
-                            if len(parts) >= 6:
-                                ev = {
-                                    'fileName': fname,
-                                    'dateIso': parts[0],
-                                    'time': parts[1],
-                                    'typeReason': parts[2] or '',
-                                    'value': parts[3] or '',
-                                    'comment': parts[4] or '',
-                                    'duration': parts[5] or ''
-                                }
-                                lgd_restarts.append(ev)
-                                continue
-                        # Caso 2: timestamp combinato "YYYY-MM-DD HH:MM:SS;..."
-                        if len(parts) >= 2 and re.match(r'^\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2}$', parts[0]):
-                            dateIso, time_ = parts[0][:10], parts[0][11:]
-                            # Formato restart atteso: ts;Type/Reason;Value;Comment;Duration
-                            if len(parts) >= 5:
-                                ev = {
-                                    'fileName': fname,
-                                    'dateIso': dateIso,
-                                    'time': time_,
-                                    'typeReason': parts[1] or '',
-                                    'value': parts[2] or '',
-                                    'comment': parts[3] or '',
-                                    'duration': parts[4] or ''
-                                }
-                                lgd_restarts.append(ev)
-                                continue
-
-                    # Fallback: vecchio formato spazio-delimitato per LGA/LGE
-                    m2 = OLD_ROW.match(line)
-                    if m2:
-                        item = {
-                            'fileName': fname,
-                            'dateIso': m2.group(1),
-                            'time': m2.group(2),
-                            'type': m2.group(3),
-                            'severity': m2.group(4),
-                            'object': '',
-                            'title': m2.group(5).strip(),
-                            'detail': ''
-                        }
-                        if item['type'] == 'AL':
-                            lga.append(item)
-                        else:
-                            lge.append(item)
-                        continue
-        except Exception:
-            # ignora file non leggibili
-            pass
+        data = parse_log_file(path)
+        lga.extend(data['lga'])
+        lge.extend(data['lge'])
+        lgd_restarts.extend(data['lgdRestarts'])
     return {'lga': lga, 'lge': lge, 'lgdRestarts': lgd_restarts}
 
 
@@ -390,111 +1375,512 @@ def parse_lgd_metrics():
     if not os.path.isdir(DW_DIR):
         return items
     for path in iter_log_files():
-        fname = os.path.basename(path)
-        try:
-            with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-                for raw in f:
-                    line = raw.strip()
-                    if not line:
-                        continue
-                    if (line.startswith('Number Of outages') or
-                        line.startswith('Total downtime') or
-                        line.startswith('Downtime per day') or
-                        line.startswith('Downtime per outage')):
-                        if ';' in line:
-                            parts = [p.strip() for p in line.split(';')]
-                            if len(parts) >= 6:
-                                items.append({
-                                    'fileName': fname,
-                                    'metric': parts[0],
-                                    'nodeUpgrade': parts[1],
-                                    'nodeManual': parts[2],
-                                    'nodeSpontaneous': parts[3],
-                                    'allNodeRestarts': parts[4],
-                                    'partialOutages': parts[5],
-                                })
-                        else:
-                            parts = [p.strip() for p in re.split(r"\s{2,}", line)]
-                            if len(parts) >= 6:
-                                items.append({
-                                    'fileName': fname,
-                                    'metric': parts[0],
-                                    'nodeUpgrade': parts[1],
-                                    'nodeManual': parts[2],
-                                    'nodeSpontaneous': parts[3],
-                                    'allNodeRestarts': parts[4],
-                                    'partialOutages': parts[5],
-                                })
-        except Exception:
-            pass
+        items.extend(parse_log_file(path)['lgd'])
     return items
 
 
-def build_csv(job_type, payload):
+# Tipi di export (POST /export/start e batch_report.py)
+EXPORT_TYPES = ('LGA', 'LGE', 'LGD', 'LGD_RESTARTS', 'ALARM_OUTAGES', 'OUTAGES_COUNT', 'DOWNTIME_COUNT')
+
+
+def _count_by_value(items, metric):
+    """Righe [valore PartialOutages, conteggio, file] della metrica LGD indicata."""
+    groups = {}
+    for it in items:
+        if it.get('metric') == metric:
+            groups.setdefault(it.get('partialOutages', ''), []).append(it.get('fileName', ''))
+    return [[value, len(files), ', '.join(files)] for value, files in groups.items()]
+
+
+def export_table(job_type, payload, fallback=True):
+    """(intestazioni, righe, nome base) di un export; righe e' un iterabile di liste di celle.
+    fallback=True: LGA/LGE/LGD_RESTARTS senza righe nel payload vengono letti da DW."""
     jt = (job_type or '').upper()
-    # Costruiamo CSV in memoria usando i campi come nel client
-    output = io.StringIO()
-    writer = csv.writer(output)
 
-    def write_rows(headers, rows):
-        if headers:
-            writer.writerow(headers)
-        for r in rows:
-            writer.writerow([x if x is not None else '' for x in r])
+    def items_of(key):
+        return (payload.get(key) if isinstance(payload, dict) else None) or []
 
     if jt in ('LGA', 'LGE'):
         headers = ['File Name', 'Data', 'Ora', 'Type', 'Sev', 'Oggetto', 'Descrizione', 'Dettaglio']
         key = 'lga' if jt == 'LGA' else 'lge'
-        items = (payload.get(key) if isinstance(payload, dict) else None) or []
-        if not items:
+        items = items_of(key)
+        if not items and fallback:
             # fallback: costruisci dal DW
             parsed = parse_logs_summary()
             items = parsed[key]
-        rows = [
+        rows = (
             [it.get('fileName',''), it.get('dateIso',''), it.get('time',''), it.get('type',''), it.get('severity',''), it.get('object',''), it.get('title',''), it.get('detail','')]
             for it in items
-        ]
-        write_rows(headers, rows)
-        base = jt
-    elif jt == 'LGD':
+        )
+        return headers, rows, jt
+    if jt == 'LGD':
         headers = ['File Name','Metric','NodeUpgrade','NodeManual','NodeSpontaneous','AllNodeRestarts','PartialOutages']
-        items = (payload.get('lgd') if isinstance(payload, dict) else None) or []
-        write_rows(headers, [
+        rows = (
             [it.get('fileName',''), it.get('metric',''), it.get('nodeUpgrade',''), it.get('nodeManual',''), it.get('nodeSpontaneous',''), it.get('allNodeRestarts',''), it.get('partialOutages','')]
-            for it in items
-        ])
-        base = jt
-    elif jt == 'LGD_RESTARTS':
-        items = (payload.get('lgdRestarts') if isinstance(payload, dict) else None) or []
+            for it in items_of('lgd')
+        )
+        return headers, rows, jt
+    if jt == 'LGD_RESTARTS':
+        items = items_of('lgdRestarts')
         has_new = any(('typeReason' in it) for it in items)
         # fallback dal DW se nessun dato inviato
         if not items:
-            parsed = parse_logs_summary()
-            items = parsed['lgdRestarts']
             has_new = True
+            if fallback:
+                items = parse_logs_summary()['lgdRestarts']
         if has_new:
             headers = ['File Name','Data','Ora','Tipo/Ragione','Valore','Commento','Durata']
-            rows = [[it.get('fileName',''), it.get('dateIso',''), it.get('time',''), it.get('typeReason',''), it.get('value',''), it.get('comment',''), it.get('duration','')] for it in items]
+            rows = ([it.get('fileName',''), it.get('dateIso',''), it.get('time',''), it.get('typeReason',''), it.get('value',''), it.get('comment',''), it.get('duration','')] for it in items)
         else:
             headers = ['File Name','Timestamp (UTC)','RestartType/Reason','SwVersion','SwRelease','RCS Downtime','Appl. Downtime','TN Downtime','RATs Downtime']
-            rows = [[it.get('fileName',''), it.get('timestamp',''), it.get('restartTypeReason',''), it.get('swVersion',''), it.get('swRelease',''), it.get('rcsDowntime',''), it.get('applDowntime',''), it.get('tnDowntime',''), it.get('ratsDowntime','')] for it in items]
-        write_rows(headers, rows)
-        base = jt
-    elif jt in ('OUTAGES_COUNT', 'DOWNTIME_COUNT'):
+            rows = ([it.get('fileName',''), it.get('timestamp',''), it.get('restartTypeReason',''), it.get('swVersion',''), it.get('swRelease',''), it.get('rcsDowntime',''), it.get('applDowntime',''), it.get('tnDowntime',''), it.get('ratsDowntime','')] for it in items)
+        return headers, rows, jt
+    if jt == 'ALARM_OUTAGES':
+        # coppie disservizio LGD / allarme-evento vicino (stesso nodo, entro +/- windowMinutes)
+        try:
+            window = max(0, min(1440, int((payload or {}).get('windowMinutes') or 10)))
+        except Exception:
+            window = 10
+        headers = ['File Name', 'Data disservizio', 'Ora disservizio', 'Tipo/Ragione', 'Durata',
+                   'Tipo evento', 'Data', 'Ora', 'Scarto (s)', 'Sev', 'Oggetto', 'Descrizione']
+        rows = []
+        _version, event_rows, joined = alarm_outage_join(window * 60)
+        for outage, start, matches in joined:
+            for kind, (entry, idxs) in matches.items():
+                for it, offset in _joined_events(event_rows[kind], entry, idxs, start):
+                    rows.append([outage.get('fileName', ''), outage.get('dateIso', ''), outage.get('time', ''),
+                                 outage.get('typeReason', ''), outage.get('duration', ''), kind.upper(),
+                                 it.get('dateIso', ''), it.get('time', ''), offset, it.get('severity', ''),
+                                 it.get('object', ''), it.get('title', '')])
+        return headers, rows, jt
+    if jt in ('OUTAGES_COUNT', 'DOWNTIME_COUNT'):
         is_out = jt == 'OUTAGES_COUNT'
         headers = ['PartialOutages Value' if is_out else 'PartialOutages Downtime','Count','File Names']
-        items = (payload.get('lgd') if isinstance(payload, dict) else None) or []
-        # Se non arriva payload, non abbiamo una fonte affidabile per questi dati -> esportiamo intestazioni vuote
-        write_rows(headers, [])
-        base = jt
-    else:
-        write_rows(['No data'], [])
-        base = 'DATA'
+        # raggruppa le metriche LGD del payload (stesso calcolo di export_server.py); senza payload
+        # non c'e' una fonte affidabile per questi dati -> solo intestazioni
+        rows = _count_by_value(items_of('lgd'), 'Number Of outages' if is_out else 'Total downtime')
+        return headers, rows, jt
+    return ['No data'], [], 'DATA'
+
 
+def build_csv(job_type, payload):
+    headers, rows, base = export_table(job_type, payload)
+    # Costruiamo CSV in memoria usando i campi come nel client
+    output = io.StringIO()
+    writer = csv.writer(output)
+    if headers:
+        writer.writerow(headers)
+    for r in rows:
+        writer.writerow([x if x is not None else '' for x in r])
     return output.getvalue(), base
 
 
+# Endpoint evento serviti dal motore di query:
+# path -> (dataset, parametri semplici -> campo, limit di default, ordinamento di default)
+EVENT_ENDPOINTS = {
+    '/api/lga': ('lga', {'severity': 'severity', 'node': 'fileName', 'title': 'title'}, 200, '-dateIso,-time'),
+    '/api/lge': ('lge', {'severity': 'severity', 'node': 'fileName', 'title': 'title'}, 200, '-dateIso,-time'),
+    '/api/lgd': ('lgdRestarts', {'typeReason': 'typeReason', 'node': 'fileName', 'restartType': 'restartType',
+                                 'reason': 'reason', 'rat': 'rat'}, 1000, '-dateIso,-time'),
+    '/api/lgd_metrics': ('lgd', {'node': 'fileName', 'metric': 'metric'}, 2000, None),
+}
+
+def _api_rows(key, rows):
+    """Righe per le risposte JSON: quelle LGD con percent e cells tipati (cell_outages.typed)."""
+    if key != 'lgdRestarts':
+        return rows
+    return [cell_outages.typed(it) for it in rows]
+
+
+# Filtri semplici di /api/search (full-text su LGA/LGE), tradotti dal motore di query
+SEARCH_PARAMS = {'severity': 'severity', 'node': 'fileName', 'title': 'title'}
+
+
+def _since_param(qs):
+    """Versione del client da since=<versione> (None se assente o non valida)."""
+    try:
+        return int((qs.get('since', [''])[0] or '').strip())
+    except ValueError:
+        return None
+
+
+# Stesse query sullo storico multi-batch (history.py): from/to selezionano le partizioni lette
+HISTORY_ENDPOINTS = {
+    '/api/history/lga': '/api/lga',
+    '/api/history/lge': '/api/lge',
+    '/api/history/lgd': '/api/lgd',
+}
+
+# Ordinamenti di /api/history/availability: nome -> (chiave, decrescente)
+AVAILABILITY_SORTS = {
+    'availability': (lambda r: (r['availabilityPct'], r['key']), False),
+    'downtime': (lambda r: (r['downtimeSeconds'], r['key']), True),
+    'outages': (lambda r: (r['outages'], r['key']), True),
+    'key': (lambda r: r['key'], False),
+}
+
+
+def availability_rows(per_key, wanted=None):
+    """Righe di disponibilita' da {chiave: {'outages', 'downtimeSeconds', 'observedSeconds', 'nodes'}}."""
+    rows = []
+    for key, agg in per_key.items():
+        if wanted and correlation.node_base(key) not in wanted:
+            continue
+        observed = agg['observedSeconds']
+        rows.append({
+            'key': key,
+            'nodes': agg['nodes'],
+            'outages': agg['outages'],
+            'downtimeSeconds': agg['downtimeSeconds'],
+            'observedDays': observed // 86400,
+            'availabilityPct': round(100.0 * (1 - min(agg['downtimeSeconds'], observed) / max(1, observed)), 4),
+        })
+    return rows
+
+
+def _metrics_route(path, status):
+    """Etichetta di route per le metriche (cardinalita' limitata: pagine e asset -> 'static')."""
+    if status == 404:
+        return 'unmatched'
+    if path.startswith('/api/admin/profiles/'):
+        return '/api/admin/profiles/{id}'
+    if path.startswith(('/api/', '/export/')):
+        return path
+    return 'static'
+
+
+# Pagine HTML servite per path
+PAGES = {
+    '/': 'index.html',
+    '/index.html': 'index.html',
+    '/admin': 'admin.html',
+    '/admin.html': 'admin.html',
+    '/stats': 'stats.html',
+    '/stats.html': 'stats.html',
+    '/event_detail': 'event_detail.html',
+    '/event_detail.html': 'event_detail.html',
+    '/alarm_detail': 'alarm_detail.html',
+    '/alarm_detail.html': 'alarm_detail.html',
+    '/lgd_detail': 'lgd_detail.html',
+    '/lgd_detail.html': 'lgd_detail.html',
+    '/node_detail': 'node_detail.html',
+    '/node_detail.html': 'node_detail.html',
+}
+
+STATIC_TYPES = {
+    '.html': 'text/html; charset=utf-8',
+    '.js': 'application/javascript; charset=utf-8',
+    '.css': 'text/css; charset=utf-8',
+    '.ico': 'image/x-icon',
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.svg': 'image/svg+xml',
+    '.zip': 'application/zip',
+}
+
+# Blocco di copia dei file quando sendfile non e' disponibile (risposte bufferizzate)
+FILE_CHUNK = 256 * 1024
+
+def _static_path(path):
+    """File statico della root del progetto per path, None se non esiste o non e' esposto."""
+    # Map root to index.html
+    rel = os.path.normpath(path.lstrip('/') or 'index.html')
+    # Basic traversal protection
+    if rel.startswith('..'):
+        return None
+    # Disallow backend and DW direct exposure
+    if rel.startswith('backend') or rel.startswith('DW'):
+        return None
+    # Allow only certain directories
+    first = rel.split(os.sep)[0] if rel else ''
+    if first not in ('', 'assets', 'exports'):
+        return None
+    abs_path = os.path.join(PROJECT_ROOT, rel)
+    return abs_path if os.path.isfile(abs_path) else None
+
+def _export_zip(qs):
+    """Zip di un job di export completato (id nella query), None se non pronto."""
+    info = _find_job((qs.get('id') or [''])[0])
+    if not info or info.get('status') != 'done' or not os.path.isfile(info.get('zip_path', '')):
+        return None
+    return info['zip_path']
+
+def _metrics_gauges():
+    jobs = {}
+    for info in list(JOBS.values()):
+        st = info.get('status') or 'unknown'
+        jobs[st] = jobs.get(st, 0) + 1
+    updated = _DW_CACHE['updated_at']
+    lanes = _ADMISSION.stats()
+    results = _RESULTS.stats()
+    memory = _BLOCKS.stats()
+    return {
+        'dataset_version': _DW_CACHE['version'],
+        'dataset_age_seconds': round(time.time() - updated, 1) if updated else -1,
+        'dataset_files': len(_DW_CACHE['snapshot'] or {}),
+        'export_jobs': jobs,
+        'export_queue_depth': jobs.get('queued', 0) + jobs.get('running', 0),
+        'sse_subscribers': len(_EVENTS),
+        'admission_inflight': {name: st['inflight'] for name, st in lanes.items()},
+        'admission_waiting': {name: st['waiting'] for name, st in lanes.items()},
+        'admission_rejected': {name: st['rejected'] for name, st in lanes.items()},
+        'result_cache_bytes': results['bytes'],
+        'result_cache_entries': results['entries'],
+        'memory_budget_bytes': memory['budgetBytes'],
+        'memory_block_bytes': memory['bytes'],
+        'memory_resident_files': memory['residentFiles'],
+        'memory_block_evictions': memory['evictions'],
+    }
+
+
 class APIHandler(BaseHTTPRequestHandler):
+    # True quando la richiesta arriva gia' ammessa dal server asyncio (corsie gestite la')
+    buffered = False
+
+    def handle_one_request(self):
+        # Strumentazione per /api/metrics: latenza, stato e byte di risposta per route
+        if not isinstance(self.wfile, metrics.CountingWriter):
+            self.wfile = metrics.CountingWriter(self.wfile)
+        start_bytes = self.wfile.bytes
+        self._status = None
+        self._profile_id = None
+        self._lane = None
+        t0 = time.perf_counter()
+        _METRICS.request_started()
+        prof_token = _PROFILER.begin() if _PROFILER.slow_ms > 0 else None
+        route = None
+        try:
+            super().handle_one_request()
+        finally:
+            if self._lane is not None:
+                self._lane.release(time.perf_counter() - self._admitted_at)
+            if prof_token is not None:
+                _PROFILER.end(prof_token, f"{getattr(self, 'command', '-')} {getattr(self, 'path', '')}")
+            if self._status is not None:
+                route = _metrics_route(urlparse(getattr(self, 'path', '') or '').path, self._status)
+            _METRICS.request_finished(getattr(self, 'command', None) or '-', route, self._status,
+                                      time.perf_counter() - t0, self.wfile.bytes - start_bytes)
+
+    def parse_request(self):
+        ok = super().parse_request()
+        if ok and not self.buffered:
+            parsed = urlparse(self.path)
+            lane = _ADMISSION.lane_for(self.command, parsed.path, parsed.query)
+            if lane is not None:
+                if lane.acquire() is None:
+                    self._send_busy(lane)
+                    return False
+                self._lane = lane
+                self._admitted_at = time.perf_counter()
+        # "X-Profile: 1" autorizzato: esegue il metodo do_* sotto cProfile
+        if ok and self.headers.get('X-Profile') and _PROFILER.requested(self.headers):
+            method = getattr(self, 'do_' + self.command, None)
+            if method is not None:
+                self._profile_id = _PROFILER.new_id()
+                label = f'{self.command} {self.path}'
+                setattr(self, 'do_' + self.command,
+                        lambda: _PROFILER.run(method, label, profile_id=self._profile_id))
+        return ok
+
+    def _send_busy(self, lane):
+        """429 con Retry-After quando la corsia della richiesta e' satura."""
+        retry = lane.retry_after()
+        body = json.dumps({'error': 'Server occupato, riprovare', 'lane': lane.name,
+                           'retryAfter': retry}).encode('utf-8')
+        self.close_connection = True
+        self._set_headers(429, extra_headers={'Retry-After': str(retry), 'Content-Length': str(len(body)),
+                                              'Access-Control-Expose-Headers': 'Retry-After'})
+        self.wfile.write(body)
+
+    def send_response(self, code, message=None):
+        self._status = code
+        super().send_response(code, message)
+
+    def end_headers(self):
+        if self._profile_id:
+            self.send_header('X-Profile-Id', self._profile_id)
+            self.send_header('Access-Control-Expose-Headers', 'X-Profile-Id')
+        super().end_headers()
+
+    def _send_profile(self, path, qs):
+        """/api/admin/profiles (elenco) e /api/admin/profiles/<id>?format=text|pstats|collapsed."""
+        if not _PROFILER.authorized(self.headers):
+            self._set_headers(403)
+            self.wfile.write(json.dumps({'error': 'Profilazione non abilitata'}).encode('utf-8'))
+            return
+        profile_id = path[len('/api/admin/profiles'):].strip('/')
+        if not profile_id:
+            self._set_headers(200)
+            self.wfile.write(json.dumps({
+                'slowMs': _PROFILER.slow_ms,
+                'profiles': _PROFILER.list(),
+            }).encode('utf-8'))
+            return
+        entry = _PROFILER.get(profile_id)
+        if entry is None:
+            self._set_headers(404)
+            self.wfile.write(json.dumps({'error': 'Profilo non trovato'}).encode('utf-8'))
+            return
+        fmt = (qs.get('format', [''])[0] or '').strip().lower() or entry['formats'][0]
+        rendered = _PROFILER.render(entry, fmt)
+        if rendered is None:
+            self._set_headers(400)
+            self.wfile.write(json.dumps({'error': 'Formato non disponibile', 'formats': entry['formats']}).encode('utf-8'))
+            return
+        content_type, body = rendered
+        headers = {'Content-Length': str(len(body))}
+        if fmt == 'pstats':
+            headers['Content-Disposition'] = f'attachment; filename="{profile_id}.pstats"'
+        self._set_headers(200, content_type=content_type, extra_headers=headers)
+        self.wfile.write(body)
+
+    def _send_delta(self, path, keys, query, since, top_n=None):
+        """Risposta delta per since=<versione>: righe aggiunte/aggiornate/rimosse per file dei
+        dataset keys dalla versione del client. False se la versione e' fuori dalla finestra del
+        changelog (il chiamante risponde allora con il risultato completo)."""
+        _refresh_dw()
+        version, changes = _CHANGELOG.since(since)
+        if changes is None:
+            return False
+
+        def build():
+            where = query.where if query is not None else None
+            fields = query.fields if query is not None else None
+            per_kind = {key: {} for key in keys}
+            for name, kinds in changes['files'].items():
+                for key in keys:
+                    d = kinds.get(key)
+                    if not d:
+                        continue
+                    added = [it for it in d['added'] if where is None or where.match(it)]
+                    updated = [it for it in d['updated'] if where is None or where.match(it)]
+                    if fields:
+                        added = [{f: it.get(f, '') for f in fields} for it in added]
+                        updated = [{f: it.get(f, '') for f in fields} for it in updated]
+                    if added or updated or d['removed']:
+                        per_kind[key][name] = {'added': _api_rows(key, added), 'updated': _api_rows(key, updated),
+                                               'removed': _api_rows(key, d['removed'])}
+            result = {'version': version, 'since': since, 'delta': True, 'removedFiles': changes['removedFiles']}
+            if len(keys) == 1:
+                result['files'] = per_kind[keys[0]]
+            else:
+                # bootstrap: header e grafici sono piccoli e vengono sempre rimandati interi
+                result['header'] = count_stats(refresh=False)
+                result['charts'] = _get_charts_summary_cached(top_n or 5, refresh=False)
+                result['changes'] = per_kind
+            return json.dumps(result).encode('utf-8')
+        cache_key = (path, 'since', since, query.cache_key() if query is not None else top_n)
+        self._send_result(cache_key, self._cached_result(cache_key, version, build))
+        return True
+
+    def _send_history(self, path, qs):
+        def arg(name, default=''):
+            return (qs.get(name, [default])[0] or default).strip()
+        _refresh_dw()
+        version = _DW_CACHE['version']
+        date_from = arg('from')
+        date_to = arg('to')
+        try:
+            if path == '/api/history/batches':
+                manifest = _HISTORY.manifest()
+                batches = [{
+                    'batch': bid,
+                    'collectedAt': entry['collectedAt'],
+                    'from': entry['from'],
+                    'to': entry['to'],
+                    'files': len(entry['files']),
+                    'rows': entry['rows'],
+                    'ingestedAt': entry['ingestedAt'],
+                } for bid, entry in manifest['batches'].items()]
+                batches.sort(key=lambda b: (b['collectedAt'], b['batch']), reverse=True)
+                self._set_headers(200)
+                self.wfile.write(json.dumps({'batches': batches, 'store': _HISTORY.stats()}).encode('utf-8'))
+                return
+            if path in HISTORY_ENDPOINTS:
+                key, params, default_limit, default_sort = EVENT_ENDPOINTS[HISTORY_ENDPOINTS[path]]
+                query = query_engine.from_params(qs, params, default_limit=default_limit)
+                if not query.sort and default_sort:
+                    query.sort = query_engine.Query.parse_sort(default_sort)
+
+                def build():
+                    t0 = time.perf_counter()
+                    out, total, parts = _HISTORY.query(key, query, date_from, date_to)
+                    result = {key: _api_rows(key, out)}
+                    if total is not None:
+                        result['total'] = total
+                    result['partitionsRead'] = parts
+                    _METRICS.stage('query', time.perf_counter() - t0)
+                    return json.dumps(result).encode('utf-8')
+                cache_key = (path, query.cache_key())
+                self._send_result(cache_key, self._cached_result(cache_key, version, build))
+                return
+            if path == '/api/history/availability':
+                group = arg('group', 'node').lower()
+                if group != 'node' and group not in correlation.GROUPS:
+                    raise ValueError(f'group deve essere uno tra node, {", ".join(correlation.GROUPS)}')
+                order = arg('sort', 'availability')
+                if order not in AVAILABILITY_SORTS:
+                    raise ValueError(f'sort deve essere uno tra {", ".join(AVAILABILITY_SORTS)}')
+                limit = max(1, min(10000, int(arg('limit', '200'))))
+                wanted = {correlation.node_base(n) for n in arg('node').split(',') if n.strip()}
+
+                def build():
+                    t0 = time.perf_counter()
+                    site_map = correlation.load_site_map()
+                    key_fn = None
+                    if group != 'node':
+                        key_fn = lambda name: correlation.group_of(name, group, site_map)
+                    per_key = _HISTORY.availability(parse_duration_sec, date_from, date_to, key_fn)
+                    rows = availability_rows(per_key, wanted)
+                    sort_key, descending = AVAILABILITY_SORTS[order]
+                    rows.sort(key=sort_key, reverse=descending)
+                    return json.dumps({
+                        'group': group,
+                        'from': date_from,
+                        'to': date_to,
+                        'total': len(rows),
+                        'rows': rows[:limit],
+                        'tookMs': round((time.perf_counter() - t0) * 1000, 2),
+                    }).encode('utf-8')
+                cache_key = (path, group, order, limit, date_from, date_to, tuple(sorted(wanted)))
+                self._send_result(cache_key, self._cached_result(cache_key, version, build))
+                return
+        except query_engine.QueryError as e:
+            self._set_headers(400)
+            self.wfile.write(json.dumps({'error': 'Query non valida', 'detail': str(e)}).encode('utf-8'))
+            return
+        except ValueError as e:
+            self._set_headers(400)
+            self.wfile.write(json.dumps({'error': 'Parametri non validi', 'detail': str(e)}).encode('utf-8'))
+            return
+        except Exception as e:
+            self._set_headers(500)
+            self.wfile.write(json.dumps({'error': 'Errore interno', 'detail': str(e)}).encode('utf-8'))
+            return
+        self._set_headers(404)
+        self.wfile.write(json.dumps({'error': 'Not found'}).encode('utf-8'))
+
+    def _cached_result(self, key, version, build):
+        """Corpo JSON dalla cache dei risultati oppure da build() (registrato per la versione)."""
+        entry = _RESULTS.get(key, version)
+        if entry is not None:
+            _METRICS.cache('results', 'hit')
+            return entry
+        _METRICS.cache('results', 'miss')
+        return _RESULTS.put(key, version, build())
+
+    def _send_result(self, key, entry):
+        """Invia una voce della cache dei risultati, gzip se il client lo accetta."""
+        body = entry.body
+        headers = {'Vary': 'Accept-Encoding'}
+        if len(body) >= 1024 and 'gzip' in (self.headers.get('Accept-Encoding') or '').lower():
+            body = _RESULTS.gzipped(key, entry)
+            headers['Content-Encoding'] = 'gzip'
+        headers['Content-Length'] = str(len(body))
+        self._set_headers(200, extra_headers=headers)
+        self.wfile.write(body)
+
     def _set_headers(self, status=200, content_type='application/json', extra_headers=None):
         self.send_response(status)
         self.send_header('Content-Type', content_type)
@@ -504,6 +1890,42 @@ class APIHandler(BaseHTTPRequestHandler):
                 self.send_header(k, v)
         self.end_headers()
 
+    def _send_file(self, abs_path, content_type, extra_headers=None, body=True):
+        """Invia un file con supporto Range/206 (http_range.py). Il contenuto passa con
+        socket.sendfile (zero-copy, memoria costante); nel server asyncio, dove la risposta e'
+        bufferizzata, viene copiato a blocchi. False se il file non si puo' aprire."""
+        try:
+            fp = open(abs_path, 'rb')
+        except OSError:
+            return False
+        with fp:
+            st = os.fstat(fp.fileno())
+            status, offset, length, headers = http_range.plan(self.headers.get, st)
+            headers['Content-Length'] = str(length)
+            headers.update(extra_headers or {})
+            self._set_headers(status, content_type, extra_headers=headers)
+            if not body or not length:
+                return True
+            try:
+                if not self.buffered and isinstance(self.connection, socket.socket):
+                    self.wfile.flush()
+                    sent = self.connection.sendfile(fp, offset, length)
+                    if isinstance(self.wfile, metrics.CountingWriter):
+                        self.wfile.bytes += sent
+                else:
+                    fp.seek(offset)
+                    remaining = length
+                    while remaining > 0:
+                        chunk = fp.read(min(FILE_CHUNK, remaining))
+                        if not chunk:
+                            break
+                        remaining -= len(chunk)
+                        self.wfile.write(chunk)
+            except (BrokenPipeError, ConnectionResetError):
+                # client disconnesso a meta' download: riprendera' con Range
+                self.close_connection = True
+        return True
+
     def log_message(self, fmt, *args):
         # meno rumoroso
         try:
@@ -511,6 +1933,40 @@ class APIHandler(BaseHTTPRequestHandler):
         except Exception:
             pass
 
+    def _write_event(self, event, data, event_id=None):
+        msg = ''
+        if event_id is not None:
+            msg += f'id: {event_id}\n'
+        msg += f'event: {event}\ndata: {json.dumps(data)}\n\n'
+        self.wfile.write(msg.encode('utf-8'))
+        self.wfile.flush()
+
+    def _serve_events(self):
+        sub = _EVENTS.subscribe()
+        self.close_connection = True
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.send_header('X-Accel-Buffering', 'no')
+            self.end_headers()
+            # stato iniziale: il client confronta la versione con quella che ha gia'
+            version = _DW_CACHE['version']
+            self.wfile.write(f'retry: {int(SSE_HEARTBEAT * 1000)}\n'.encode('utf-8'))
+            self._write_event('hello', {'version': version, 'header': count_stats(refresh=False)}, event_id=version)
+            while True:
+                try:
+                    event, data = sub.get(timeout=SSE_HEARTBEAT)
+                except queue.Empty:
+                    self._write_event('heartbeat', {'version': _DW_CACHE['version'], 'ts': int(time.time())})
+                    continue
+                self._write_event(event, data, event_id=data.get('version'))
+        except (BrokenPipeError, ConnectionResetError, OSError):
+            pass
+        finally:
+            _EVENTS.unsubscribe(sub)
+
     def do_OPTIONS(self):
         self.send_response(204)
         self.send_header('Access-Control-Allow-Origin', '*')
@@ -522,100 +1978,42 @@ class APIHandler(BaseHTTPRequestHandler):
         parsed = urlparse(self.path)
         path = parsed.path
         qs = parse_qs(parsed.query or '')
-        # Root handler: serve index.html
-        if path == '/' or path == '/index.html':
-            try:
-                abs_path = os.path.join(PROJECT_ROOT, 'index.html')
-                with open(abs_path, 'rb') as fp:
-                    data = fp.read()
-                self._set_headers(200, 'text/html; charset=utf-8', extra_headers={'Content-Length': str(len(data))})
-                self.wfile.write(data)
-                return
-            except Exception:
-                self._set_headers(404)
-                self.wfile.write(json.dumps({'error': 'Not found'}).encode('utf-8'))
-                return
-        # Admin handler: serve admin.html
-        if path == '/admin' or path == '/admin.html':
-            try:
-                abs_path = os.path.join(PROJECT_ROOT, 'admin.html')
-                with open(abs_path, 'rb') as fp:
-                    data = fp.read()
-                self._set_headers(200, 'text/html; charset=utf-8', extra_headers={'Content-Length': str(len(data))})
-                self.wfile.write(data)
-                return
-            except Exception:
-                self._set_headers(404)
-                self.wfile.write(json.dumps({'error': 'Not found'}).encode('utf-8'))
-                return
-        # Stats handler: serve stats.html
-        if path == '/stats' or path == '/stats.html':
-            try:
-                abs_path = os.path.join(PROJECT_ROOT, 'stats.html')
-                with open(abs_path, 'rb') as fp:
-                    data = fp.read()
-                self._set_headers(200, 'text/html; charset=utf-8', extra_headers={'Content-Length': str(len(data))})
-                self.wfile.write(data)
-                return
-            except Exception:
-                self._set_headers(404)
-                self.wfile.write(json.dumps({'error': 'Not found'}).encode('utf-8'))
-                return
-        # Event Detail handler: serve event_detail.html
-        if path == '/event_detail' or path == '/event_detail.html':
-            try:
-                abs_path = os.path.join(PROJECT_ROOT, 'event_detail.html')
-                with open(abs_path, 'rb') as fp:
-                    data = fp.read()
-                self._set_headers(200, 'text/html; charset=utf-8', extra_headers={'Content-Length': str(len(data))})
-                self.wfile.write(data)
-                return
-            except Exception:
-                self._set_headers(404)
-                self.wfile.write(json.dumps({'error': 'Not found'}).encode('utf-8'))
-                return
-        # Alarm Detail handler: serve alarm_detail.html
-        if path == '/alarm_detail' or path == '/alarm_detail.html':
-            try:
-                abs_path = os.path.join(PROJECT_ROOT, 'alarm_detail.html')
-                with open(abs_path, 'rb') as fp:
-                    data = fp.read()
-                self._set_headers(200, 'text/html; charset=utf-8', extra_headers={'Content-Length': str(len(data))})
-                self.wfile.write(data)
-                return
-            except Exception:
-                self._set_headers(404)
-                self.wfile.write(json.dumps({'error': 'Not found'}).encode('utf-8'))
-                return
-        # LGD Detail handler: serve lgd_detail.html
-        if path == '/lgd_detail' or path == '/lgd_detail.html':
-            try:
-                abs_path = os.path.join(PROJECT_ROOT, 'lgd_detail.html')
-                with open(abs_path, 'rb') as fp:
-                    data = fp.read()
-                self._set_headers(200, 'text/html; charset=utf-8', extra_headers={'Content-Length': str(len(data))})
-                self.wfile.write(data)
-                return
-            except Exception:
+        # Pagine HTML (index, admin, stats, dettagli evento/allarme/LGD/nodo)
+        page = PAGES.get(path)
+        if page is not None:
+            if not self._send_file(os.path.join(PROJECT_ROOT, page), 'text/html; charset=utf-8'):
                 self._set_headers(404)
                 self.wfile.write(json.dumps({'error': 'Not found'}).encode('utf-8'))
-                return
-        # Node Detail handler: serve node_detail.html
-        if path == '/node_detail' or path == '/node_detail.html':
-            try:
-                abs_path = os.path.join(PROJECT_ROOT, 'node_detail.html')
-                with open(abs_path, 'rb') as fp:
-                    data = fp.read()
-                self._set_headers(200, 'text/html; charset=utf-8', extra_headers={'Content-Length': str(len(data))})
-                self.wfile.write(data)
-                return
-            except Exception:
-                self._set_headers(404)
-                self.wfile.write(json.dumps({'error': 'Not found'}).encode('utf-8'))
-                return
+            return
         if path == '/api/ping':
             self._set_headers(200)
-            self.wfile.write(json.dumps({'ok': True}).encode('utf-8'))
+            self.wfile.write(json.dumps({'ok': True, 'version': _DW_CACHE['version']}).encode('utf-8'))
+            return
+        # Metriche di processo: JSON (default) o testo Prometheus (?format=prometheus)
+        if path == '/api/metrics':
+            fmt = (qs.get('format', [''])[0] or '').strip().lower()
+            if fmt in ('prometheus', 'prom', 'text') or 'text/plain' in (self.headers.get('Accept') or ''):
+                body = _METRICS.prometheus(_metrics_gauges()).encode('utf-8')
+                self._set_headers(200, content_type='text/plain; version=0.0.4; charset=utf-8')
+            else:
+                snap = _METRICS.snapshot(_metrics_gauges())
+                snap['admission'] = _ADMISSION.stats()
+                snap['resultCache'] = _RESULTS.stats()
+                snap['changelog'] = _CHANGELOG.stats()
+                snap['memory'] = _BLOCKS.stats(files=len(_DW_CACHE['files']))
+                snap['memory']['rssBytes'] = snap['processRssBytes']
+                if _HISTORY is not None:
+                    snap['history'] = _HISTORY.stats()
+                body = json.dumps(snap).encode('utf-8')
+                self._set_headers(200)
+            self.wfile.write(body)
+            return
+        # Canale push SSE: versione del dataset, header e nodi cambiati ad ogni ingestione
+        if path == '/api/events':
+            self._serve_events()
+            return
+        if path.startswith('/api/admin/profiles'):
+            self._send_profile(path, qs)
             return
         if path == '/api/admin/users':
             users = load_users()
@@ -627,6 +2025,41 @@ class APIHandler(BaseHTTPRequestHandler):
             self._set_headers(200)
             self.wfile.write(json.dumps(stats).encode('utf-8'))
             return
+        # Bootstrap dashboard: header, grafici e prime pagine di lga/lge/lgd/lgd_metrics in una sola risposta
+        if path == '/api/bootstrap':
+            try:
+                try:
+                    top = int(qs.get('n', ['5'])[0])
+                except Exception:
+                    top = 5
+                try:
+                    limit = int(qs.get('limit', ['10000'])[0])
+                except Exception:
+                    limit = 10000
+                top = max(1, min(20, top))
+                limit = max(1, min(10000, limit))
+                since = _since_param(qs)
+                if since is not None and self._send_delta(path, ('lga', 'lge', 'lgdRestarts', 'lgd'), None, since, top):
+                    return
+                columnar = wire.requested(qs)
+                fallback = since is not None
+                version, body, body_gz = _get_bootstrap_cached(top, limit, columnar, fallback)
+                etag = f'W/"dw-{version}-{top}-{limit}{"-c" if columnar else ""}{"-f" if fallback else ""}"'
+                headers = {'ETag': etag, 'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+                if (self.headers.get('If-None-Match') or '').strip() == etag:
+                    self._set_headers(304, extra_headers=headers)
+                    return
+                if 'gzip' in (self.headers.get('Accept-Encoding') or '').lower():
+                    body = body_gz
+                    headers['Content-Encoding'] = 'gzip'
+                headers['Content-Length'] = str(len(body))
+                self._set_headers(200, extra_headers=headers)
+                self.wfile.write(body)
+                return
+            except Exception as e:
+                self._set_headers(500)
+                self.wfile.write(json.dumps({'error': 'Errore interno', 'detail': str(e)}).encode('utf-8'))
+                return
         if path == '/api/charts/summary':
             try:
                 top = int(qs.get('n', ['5'])[0])
@@ -636,130 +2069,101 @@ class APIHandler(BaseHTTPRequestHandler):
             self._set_headers(200)
             self.wfile.write(json.dumps(charts).encode('utf-8'))
             return
-        # Nuovo: dettagli LGA/LGE con filtri (per abilitare drilldown severità in backend)
-        if path == '/api/lga' or path == '/api/lge':
+        # Raggruppamento ad-hoc per una o due dimensioni (aggregate.py) con gli stessi filtri
+        # degli endpoint evento del dataset scelto; risultato in cache per versione
+        if path == '/api/aggregate':
+            arg = lambda name, default='': (qs.get(name, [default])[0] or default).strip()
             try:
-                parsed = _get_parsed_summary_cached()
-                key = 'lga' if path.endswith('/lga') else 'lge'
-                items = parsed.get(key, [])
-                severity = (qs.get('severity', [''])[0] or '').strip().upper()
-                node = (qs.get('node', [''])[0] or '').strip()
-                date_from = (qs.get('from', [''])[0] or '').strip()
-                date_to = (qs.get('to', [''])[0] or '').strip()
-                try:
-                    limit = int((qs.get('limit', ['200'])[0] or '200'))
-                except Exception:
-                    limit = 200
-                node_base = os.path.splitext(node)[0] if node else ''
-                node_log = (node_base + '.log') if node_base else ''
-                out = []
-                for it in items:
-                    if severity:
-                        s = (it.get('severity') or '').strip().upper()
-                        if s != severity:
-                            continue
-                    if node_base:
-                        fname = (it.get('fileName') or '').strip()
-                        if fname not in (node_base, node_log):
-                            continue
-                    di = (it.get('dateIso') or it.get('date') or '').strip()
-                    if date_from and di and di < date_from:
-                        continue
-                    if date_to and di and di > date_to:
-                        continue
-                    out.append(it)
-                    if len(out) >= max(1, min(10000, limit)):
-                        break
-                self._set_headers(200)
-                self.wfile.write(json.dumps({key: out}).encode('utf-8'))
+                endpoint = '/api/' + arg('dataset', 'lga')
+                if endpoint not in EVENT_ENDPOINTS:
+                    raise ValueError(f'dataset deve essere uno tra {", ".join(p[5:] for p in EVENT_ENDPOINTS)}')
+                key, params, _default_limit, _default_sort = EVENT_ENDPOINTS[endpoint]
+                by = arg('by', 'node')
+                site_map = correlation.load_site_map() if re.search(r'\b(site|region)\b', by) else None
+                dims = aggregate.dimensions(by, query_engine.field_name, site_map, aggregate.FIELDS.get(key))
+                order = arg('sort', 'count')
+                if order not in aggregate.SORTS:
+                    raise ValueError(f'sort deve essere uno tra {", ".join(aggregate.SORTS)}')
+                direction = arg('order').lower()
+                descending = {'asc': False, 'desc': True}.get(direction)
+                limit = max(1, min(10000, int(arg('limit', '20'))))
+                offset = max(0, int(arg('offset', '0')))
+                query = query_engine.from_params(qs, params)
+            except query_engine.QueryError as e:
+                self._set_headers(400)
+                self.wfile.write(json.dumps({'error': 'Query non valida', 'detail': str(e)}).encode('utf-8'))
                 return
-            except Exception as e:
-                self._set_headers(500)
-                self.wfile.write(json.dumps({'error': 'Errore interno', 'detail': str(e)}).encode('utf-8'))
+            except ValueError as e:
+                self._set_headers(400)
+                self.wfile.write(json.dumps({'error': 'Parametri non validi', 'detail': str(e)}).encode('utf-8'))
                 return
-        # Nuovo: dettagli LGD restarts filtrati per typeReason, nodo, data
-        if path == '/api/lgd':
             try:
-                parsed = _get_parsed_summary_cached()
-                items = parsed.get('lgdRestarts', [])
-                # Normalizza typeReason: senza spazi, case-insensitive
-                tr_q = (qs.get('typeReason', [''])[0] or '').strip()
-                norm_tr = re.sub(r"\s+", '', tr_q).lower()
-                node = (qs.get('node', [''])[0] or '').strip()
-                date_from = (qs.get('from', [''])[0] or '').strip()
-                date_to = (qs.get('to', [''])[0] or '').strip()
-                try:
-                    limit = int((qs.get('limit', ['1000'])[0] or '1000'))
-                except Exception:
-                    limit = 1000
-                node_base = os.path.splitext(node)[0] if node else ''
-                node_log = (node_base + '.log') if node_base else ''
-                out = []
-                for it in items:
-                    # Type/Reason match
-                    ev_tr = (it.get('typeReason') or it.get('restartTypeReason') or '').strip()
-                    if norm_tr:
-                        if re.sub(r"\s+", '', ev_tr).lower() != norm_tr:
-                            continue
-                    # Node match (se richiesto)
-                    if node_base:
-                        fname = (it.get('fileName') or '').strip()
-                        if fname not in (node_base, node_log):
-                            continue
-                    # Date range
-                    di = (it.get('dateIso') or it.get('date') or '').strip()
-                    if date_from and di and di < date_from:
-                        continue
-                    if date_to and di and di > date_to:
-                        continue
-                    out.append(it)
-                    if len(out) >= max(1, min(10000, limit)):
-                        break
-                # Ordina per data/ora decrescente
-                def to_ms(it):
-                    d = (it.get('dateIso') or it.get('date') or '')
-                    t = (it.get('time') or '00:00:00')
-                    try:
-                        return int(time.mktime(time.strptime(f"{d} {t}", "%Y-%m-%d %H:%M:%S")))
-                    except Exception:
-                        return 0
-                out.sort(key=to_ms, reverse=True)
-                self._set_headers(200)
-                self.wfile.write(json.dumps({'lgdRestarts': out}).encode('utf-8'))
+                dataset = _get_dataset_cached(key)
+
+                def build():
+                    t0 = time.perf_counter()
+                    positions = dataset.positions(query.where)
+                    groups = aggregate.group(dataset, positions, dims,
+                                             duration=parse_duration_sec if key == 'lgdRestarts' else None,
+                                             frame=_frame_of(key, dataset.rows))
+                    items = aggregate.rows(groups, dims)
+                    page = aggregate.top(items, order, limit, offset, descending)
+                    _METRICS.stage('aggregate', time.perf_counter() - t0)
+                    return json.dumps({
+                        'version': dataset.version,
+                        'dataset': endpoint[5:],
+                        'by': [d[0] for d in dims],
+                        'events': len(positions),
+                        'total': len(items),
+                        'offset': offset,
+                        'limit': limit,
+                        'groups': page,
+                        'tookMs': round((time.perf_counter() - t0) * 1000, 2),
+                    }).encode('utf-8')
+                cache_key = (path, key, tuple(d[0] for d in dims), query.cache_key(), order, descending, limit, offset)
+                self._send_result(cache_key, self._cached_result(cache_key, dataset.version, build))
                 return
             except Exception as e:
                 self._set_headers(500)
                 self.wfile.write(json.dumps({'error': 'Errore interno', 'detail': str(e)}).encode('utf-8'))
                 return
-        # Metriche LGD
-        if path == '/api/lgd_metrics':
+        # Dettagli LGA/LGE, restart LGD e metriche LGD: tutti passano dal motore di query comune.
+        # Parametri semplici con IN-list (a,b) e negazione (!a), piu' where=, sort=, fields=, offset=.
+        if path in EVENT_ENDPOINTS:
+            key, params, default_limit, default_sort = EVENT_ENDPOINTS[path]
             try:
-                items = _get_lgd_metrics_cached()
-                node = (qs.get('node', [''])[0] or '').strip()
-                metric_q = (qs.get('metric', [''])[0] or '').strip()
-                try:
-                    limit = int((qs.get('limit', ['2000'])[0] or '2000'))
-                except Exception:
-                    limit = 2000
-                node_base = os.path.splitext(node)[0] if node else ''
-                node_log = (node_base + '.log') if node_base else ''
-                out = []
-                for it in items:
-                    if node_base:
-                        fname = (it.get('fileName') or '').strip()
-                        if fname not in (node_base, node_log):
-                            continue
-                    if metric_q:
-                        m = (it.get('metric') or '').strip()
-                        def norm(s):
-                            return re.sub(r"\s+", ' ', (s or '').strip()).lower()
-                        if norm(m) != norm(metric_q):
-                            continue
-                    out.append(it)
-                    if len(out) >= max(1, min(10000, limit)):
-                        break
-                self._set_headers(200)
-                self.wfile.write(json.dumps({'lgd': out}).encode('utf-8'))
+                query = query_engine.from_params(qs, params, default_limit=default_limit)
+                if not query.sort and default_sort:
+                    query.sort = query_engine.Query.parse_sort(default_sort)
+                dataset = _get_dataset_cached(key)
+                since = _since_param(qs)
+                if since is not None and self._send_delta(path, (key,), query, since):
+                    return
+                # format=columnar: colonne con dizionari (wire.py) invece di una lista di oggetti
+                columnar = wire.requested(qs)
+
+                def build():
+                    t0 = time.perf_counter()
+                    out, total = query.run(dataset)
+                    out = _api_rows(key, out)
+                    t1 = time.perf_counter()
+                    result = {'version': dataset.version, key: wire.encode(out) if columnar else out}
+                    if columnar:
+                        result['format'] = wire.FORMAT
+                    if total is not None:
+                        result['total'] = total
+                    if since is not None:
+                        result['delta'] = False
+                    body = json.dumps(result).encode('utf-8')
+                    _METRICS.stage('query', t1 - t0)
+                    _METRICS.stage('serialize', time.perf_counter() - t1)
+                    return body
+                cache_key = (path, query.cache_key(), since is not None, columnar)
+                self._send_result(cache_key, self._cached_result(cache_key, dataset.version, build))
+                return
+            except query_engine.QueryError as e:
+                self._set_headers(400)
+                self.wfile.write(json.dumps({'error': 'Query non valida', 'detail': str(e)}).encode('utf-8'))
                 return
             except Exception as e:
                 self._set_headers(500)
@@ -772,28 +2176,328 @@ class APIHandler(BaseHTTPRequestHandler):
                 self._set_headers(400)
                 self.wfile.write(json.dumps({'error': 'Parametro "node" mancante'}).encode('utf-8'))
                 return
-            # Normalizza: accetta sia "CS0BE" che "CS0BE.log"
-            node_base = os.path.splitext(node)[0]
-            node_log = node_base + '.log'
+            # Normalizza: accetta sia "CS0BE" che "CS0BE.log"; piu' nodi separati da virgola
+            node_bases = [os.path.splitext(n.strip())[0] for n in node.split(',') if n.strip()]
             try:
-                parsed = _get_parsed_summary_cached()
-                def by_node(items):
-                    out = []
-                    for it in items or []:
-                        fname = (it.get('fileName') or '').strip()
-                        if not fname:
-                            continue
-                        if fname == node_base or fname == node_log:
-                            out.append(it)
-                    return out
-                result = {
-                    'fileName': node_log,
-                    'lga': by_node(parsed.get('lga')), 
-                    'lge': by_node(parsed.get('lge')), 
-                    'lgdRestarts': by_node(parsed.get('lgdRestarts'))
+                catalog = _get_catalog_cached()
+                query = query_engine.from_params(qs, {})
+
+                def build():
+                    result = {'fileName': node_bases[0] + '.log'}
+                    if len(node_bases) > 1:
+                        result['fileNames'] = [n + '.log' for n in node_bases]
+                    # blocchi per nodo dal catalogo (nell'ordine dei file, come nel dataset
+                    # aggregato): nessuna scansione degli eventi degli altri nodi
+                    records = {}
+                    for n in node_bases:
+                        rec = catalog.get(n)
+                        if rec is not None:
+                            records[rec['node']] = rec
+                    order = sorted(records, key=lambda b: records[b]['fileName'])
+                    for key in ('lga', 'lge', 'lgdRestarts'):
+                        rows = []
+                        for b in order:
+                            rows.extend(_node_rows(catalog, records[b], key))
+                        result[key] = _api_rows(key, query.run(query_engine.Dataset(rows, catalog.version,
+                                                                                    time_sorted=True))[0])
+                    result['inventory'] = [records[b] for b in order]
+                    return json.dumps(result).encode('utf-8')
+                # l'ordine dei nodi determina fileName/fileNames: fa parte della chiave
+                cache_key = (path, tuple(node_bases), query.cache_key())
+                self._send_result(cache_key, self._cached_result(cache_key, catalog.version, build))
+                return
+            except query_engine.QueryError as e:
+                self._set_headers(400)
+                self.wfile.write(json.dumps({'error': 'Query non valida', 'detail': str(e)}).encode('utf-8'))
+                return
+            except Exception as e:
+                self._set_headers(500)
+                self.wfile.write(json.dumps({'error': 'Errore interno', 'detail': str(e)}).encode('utf-8'))
+                return
+        # Inventario dei nodi (IP, MeContext, versione MOM, uptime, celle, contatto IP) dal catalogo
+        if path == '/api/nodes':
+            def arg(name, default=''):
+                return (qs.get(name, [default])[0] or default).strip()
+            try:
+                order = arg('sort', 'node')
+                desc = order.startswith('-')
+                order = order.lstrip('+-')
+                if order not in inventory.SORTS:
+                    raise ValueError(f'sort deve essere uno tra {", ".join(inventory.SORTS)} (prefisso - per decrescente)')
+                contact = arg('contact').lower()
+                if contact not in ('', 'ok', 'failed'):
+                    raise ValueError('contact deve essere ok oppure failed')
+                limit = max(1, min(5000, int(arg('limit', '100'))))
+                offset = max(0, int(arg('offset', '0')))
+                filters = {
+                    'node': tuple(n.strip() for n in arg('node').split(',') if n.strip()),
+                    'q': arg('q'),
+                    'site': arg('site'),
+                    'region': arg('region'),
+                    'ip': arg('ip'),
+                    'contact': contact,
+                    'mom': arg('mom'),
+                    'cell': arg('cell'),
+                    'cell_type': arg('cellType'),
                 }
-                self._set_headers(200)
-                self.wfile.write(json.dumps(result).encode('utf-8'))
+            except ValueError as e:
+                self._set_headers(400)
+                self.wfile.write(json.dumps({'error': 'Parametri non validi', 'detail': str(e)}).encode('utf-8'))
+                return
+            try:
+                catalog = _get_catalog_cached()
+
+                def build():
+                    recs = catalog.select(**filters)
+                    recs.sort(key=inventory.SORTS[order], reverse=desc)
+                    return json.dumps({
+                        'version': catalog.version,
+                        'total': len(recs),
+                        'offset': offset,
+                        'limit': limit,
+                        'nodes': recs[offset:offset + limit],
+                        'stats': catalog.stats(),
+                    }).encode('utf-8')
+                cache_key = (path, order, desc, limit, offset, tuple(sorted(filters.items())))
+                self._send_result(cache_key, self._cached_result(cache_key, catalog.version, build))
+                return
+            except Exception as e:
+                self._set_headers(500)
+                self.wfile.write(json.dumps({'error': 'Errore interno', 'detail': str(e)}).encode('utf-8'))
+                return
+        # Incidenti di sito/regione: disservizi sovrapposti o quasi simultanei su piu' nodi
+        if path == '/api/correlation/outages':
+            def arg(name, default=''):
+                return (qs.get(name, [default])[0] or default).strip()
+            try:
+                group = arg('group', 'site').lower()
+                if group not in correlation.GROUPS:
+                    raise ValueError(f'group deve essere uno tra {", ".join(correlation.GROUPS)}')
+                gap = max(0, min(86400, int(arg('gap', '60'))))
+                max_extend = max(0, min(30 * 86400, int(arg('maxExtend', str(correlation.MAX_EXTEND)))))
+                min_nodes = max(2, int(arg('minNodes', '2')))
+                limit = max(1, min(10000, int(arg('limit', '100'))))
+                order = arg('sort', 'nodes')
+                if order not in CORRELATION_SORTS:
+                    raise ValueError(f'sort deve essere uno tra {", ".join(CORRELATION_SORTS)}')
+            except ValueError as e:
+                self._set_headers(400)
+                self.wfile.write(json.dumps({'error': 'Parametri non validi', 'detail': str(e)}).encode('utf-8'))
+                return
+            date_from = arg('from')
+            date_to = arg('to')
+            site = arg('site')
+            reasons = [query_engine.normalize('typeReason', r) for r in arg('typeReason').split(',') if r.strip()]
+            try:
+                version, timelines = _get_outage_timelines_cached()
+
+                def build():
+                    t0 = time.perf_counter()
+                    lo = correlation.to_epoch(date_from, '00:00:00') if date_from else None
+                    hi = correlation.to_epoch(date_to, '23:59:59') if date_to else None
+                    def reason_match(reason):
+                        r = query_engine.normalize('typeReason', reason)
+                        return any(x in r for x in reasons)
+                    incidents = correlation.correlate(timelines, group=group, gap=gap, min_nodes=min_nodes,
+                                                      start=lo, end=hi, reason_match=reason_match if reasons else None,
+                                                      site_map=correlation.load_site_map(), only_group=site,
+                                                      max_extend=max_extend)
+                    sort_key, descending = CORRELATION_SORTS[order]
+                    incidents.sort(key=sort_key, reverse=descending)
+                    return json.dumps({
+                        'group': group,
+                        'gapSeconds': gap,
+                        'maxExtendSeconds': max_extend,
+                        'minNodes': min_nodes,
+                        'total': len(incidents),
+                        'incidents': incidents[:limit],
+                        'tookMs': round((time.perf_counter() - t0) * 1000, 2),
+                    }).encode('utf-8')
+                cache_key = (path, group, gap, max_extend, min_nodes, limit, order, date_from, date_to, site.upper(), tuple(sorted(reasons)))
+                self._send_result(cache_key, self._cached_result(cache_key, version, build))
+                return
+            except Exception as e:
+                self._set_headers(500)
+                self.wfile.write(json.dumps({'error': 'Errore interno', 'detail': str(e)}).encode('utf-8'))
+                return
+        # Disservizi per cella (PartialOutage scomposti): totali, top-N e intervalli per cella
+        if path == '/api/cells/outages':
+            def arg(name, default=''):
+                return (qs.get(name, [default])[0] or default).strip()
+            try:
+                order = arg('sort', 'downtime')
+                if order not in cell_outages.SORTS:
+                    raise ValueError(f'sort deve essere uno tra {", ".join(cell_outages.SORTS)}')
+                limit = max(1, min(10000, int(arg('limit', '20'))))
+                offset = max(0, int(arg('offset', '0')))
+                per_cell = max(0, min(1000, int(arg('intervals', '0'))))
+            except ValueError as e:
+                self._set_headers(400)
+                self.wfile.write(json.dumps({'error': 'Parametri non validi', 'detail': str(e)}).encode('utf-8'))
+                return
+            nodes = tuple(sorted({correlation.node_base(n) for n in arg('node').split(',') if n.strip()}))
+            sites = tuple(sorted({n.strip().upper() for n in arg('site').split(',') if n.strip()}))
+            cells = tuple(sorted({c.strip() for c in arg('cell').split(',') if c.strip()}))
+            reasons = tuple(sorted({r.strip().lower() for r in arg('reason').split(',') if r.strip()}))
+            rat = arg('rat')
+            date_from = arg('from')
+            date_to = arg('to')
+            try:
+                version, index = _get_cell_index_cached()
+                catalog = _get_catalog_cached()
+
+                def build():
+                    t0 = time.perf_counter()
+                    lo = correlation.to_epoch(date_from, '00:00:00') if date_from else None
+                    hi = correlation.to_epoch(date_to, '23:59:59') if date_to else None
+                    items = cell_outages.cell_totals(index, lo, hi, nodes=nodes, sites=sites, rat=rat, reasons=reasons)
+                    if cells:
+                        items = [x for x in items if x[0]['cellId'] in cells]
+                    page = cell_outages.top(items, order, limit, offset)
+                    out = []
+                    for row, tl, i, j in page:
+                        row = dict(row, cellName=cell_outages.cell_name(catalog.get(row['node']), row['rat'], row['cellId']))
+                        if per_cell:
+                            row['intervals'] = cell_outages.intervals(tl, i, j, reasons, per_cell)
+                        out.append(row)
+                    return json.dumps({
+                        'version': version,
+                        'total': len(items),
+                        'outages': sum(x[0]['outages'] for x in items),
+                        'downtimeSeconds': sum(x[0]['downtimeSeconds'] for x in items),
+                        'offset': offset,
+                        'limit': limit,
+                        'cells': out,
+                        'tookMs': round((time.perf_counter() - t0) * 1000, 2),
+                    }).encode('utf-8')
+                cache_key = (path, order, limit, offset, per_cell, nodes, sites, cells, reasons, rat.upper(), date_from, date_to)
+                self._send_result(cache_key, self._cached_result(cache_key, version, build))
+                return
+            except Exception as e:
+                self._set_headers(500)
+                self.wfile.write(json.dumps({'error': 'Errore interno', 'detail': str(e)}).encode('utf-8'))
+                return
+        # Join causale: allarmi/eventi dello stesso nodo entro +/- window minuti da ogni restart LGD
+        if path == '/api/correlation/alarms':
+            def arg(name, default=''):
+                return (qs.get(name, [default])[0] or default).strip()
+            try:
+                window = max(0, min(1440, int(arg('window', '10'))))
+                limit = max(1, min(10000, int(arg('limit', '200'))))
+                per_outage = max(0, min(1000, int(arg('perOutage', '50'))))
+                top = max(1, min(100, int(arg('top', '20'))))
+                requested = [t.strip().lower() for t in arg('types', 'lga,lge').split(',') if t.strip()]
+                unknown = [t for t in requested if t not in ('lga', 'lge')]
+                if unknown or not requested:
+                    raise ValueError('types deve contenere lga e/o lge separati da virgola'
+                                     + (f' (non validi: {", ".join(unknown)})' if unknown else ''))
+                kinds = tuple(k for k in ('lga', 'lge') if k in requested)
+            except ValueError as e:
+                self._set_headers(400)
+                self.wfile.write(json.dumps({'error': 'Parametri non validi', 'detail': str(e)}).encode('utf-8'))
+                return
+            nodes = [n.strip() for n in arg('node').split(',') if n.strip()]
+            date_from = arg('from')
+            date_to = arg('to')
+            title = arg('title')
+            only_matched = arg('matched', '1') != '0'
+            reasons = [query_engine.normalize('typeReason', r) for r in arg('typeReason').split(',') if r.strip()]
+            try:
+                version = _get_outage_timelines_cached()[0]
+
+                def build():
+                    t0 = time.perf_counter()
+                    _version, event_rows, joined = alarm_outage_join(window * 60, kinds, nodes, date_from, date_to,
+                                                                     reasons, title)
+                    titles = {kind: {} for kind in kinds}
+                    outages = []
+                    matched = 0
+                    for outage, start, matches in joined:
+                        hit = any(len(idxs) for _entry, idxs in matches.values())
+                        matched += hit
+                        for kind, (entry, idxs) in matches.items():
+                            if not idxs:
+                                continue
+                            counter = titles[kind]
+                            names = entry[2]
+                            # titoli distinti per disservizio (co-occorrenza, non numero di allarmi)
+                            found = set(names[idxs.start:idxs.stop]) if isinstance(idxs, range) else {names[i] for i in idxs}
+                            for t in found:
+                                counter[t] = counter.get(t, 0) + 1
+                        if hit or not only_matched:
+                            outages.append((start, outage, matches))
+                    outages.sort(key=lambda x: x[0], reverse=True)
+                    result = {
+                        'windowMinutes': window,
+                        'types': list(kinds),
+                        'totalOutages': len(joined),
+                        'matchedOutages': matched,
+                        'outages': [],
+                    }
+                    for start, outage, matches in outages[:limit]:
+                        rec = cell_outages.typed(outage)
+                        for kind, (entry, idxs) in matches.items():
+                            rec[kind + 'Count'] = len(idxs)
+                            rec[kind] = [dict(it, offsetSeconds=offset)
+                                         for it, offset in _joined_events(event_rows[kind], entry, idxs, start, per_outage)]
+                        result['outages'].append(rec)
+                    for kind, counter in titles.items():
+                        pairs = heapq.nlargest(top, counter.items(), key=lambda kv: kv[1])
+                        result[kind + 'TopTitles'] = [{'title': t, 'outages': n} for t, n in pairs]
+                    result['tookMs'] = round((time.perf_counter() - t0) * 1000, 2)
+                    return json.dumps(result).encode('utf-8')
+                cache_key = (path, window, limit, per_outage, top, kinds, tuple(sorted(correlation.node_base(n) for n in nodes)),
+                             date_from, date_to, title.lower(), only_matched, tuple(sorted(reasons)))
+                self._send_result(cache_key, self._cached_result(cache_key, version, build))
+                return
+            except Exception as e:
+                self._set_headers(500)
+                self.wfile.write(json.dumps({'error': 'Errore interno', 'detail': str(e)}).encode('utf-8'))
+                return
+        # Storico multi-batch: batch archiviati, query per periodo e disponibilita' di lungo periodo
+        if path.startswith('/api/history/'):
+            if _HISTORY is None:
+                self._set_headers(404)
+                self.wfile.write(json.dumps({'error': 'Storico disattivato (DW_HISTORY=0)'}).encode('utf-8'))
+                return
+            self._send_history(path, qs)
+            return
+        # Ricerca full-text su title/object/detail di LGA/LGE tramite indice invertito
+        if path == '/api/search':
+            try:
+                q = (qs.get('q', [''])[0] or '').strip()
+                if not q:
+                    self._set_headers(400)
+                    self.wfile.write(json.dumps({'error': 'Parametro "q" mancante'}).encode('utf-8'))
+                    return
+                kind = (qs.get('type', [''])[0] or '').strip().lower()
+                type_filter = {'lga': 'AL', 'al': 'AL', 'lge': 'EV', 'ev': 'EV'}.get(kind, '')
+                # stessi filtri degli endpoint evento (IN-list, negazione, where=, from=/to=)
+                query = query_engine.from_params(qs, SEARCH_PARAMS, default_limit=200)
+                if type_filter:
+                    query.and_where(query_engine.Cmp('type', '=', [type_filter]))
+                predicate = query.where.match if query.where is not None else None
+                index = _get_search_index_cached()
+                # node= semplice (senza negazione): solo i file indicati invece di tutto l'indice
+                node_clause = query_engine.param_clause('fileName', (qs.get('node', [''])[0] or ''))
+                files = None
+                if node_clause is not None and node_clause.op == 'in':
+                    files = [n for n in index.file_names()
+                             if query_engine.normalize('fileName', n) in node_clause.value_set]
+
+                def build():
+                    t0 = time.perf_counter()
+                    out, total = index.search(q, limit=query.limit, files=files, predicate=predicate,
+                                              offset=query.offset)
+                    took_ms = round((time.perf_counter() - t0) * 1000, 2)
+                    return json.dumps({'results': out, 'total': total, 'offset': query.offset, 'limit': query.limit,
+                                       'tookMs': took_ms}).encode('utf-8')
+                cache_key = (path, q, query.cache_key())
+                self._send_result(cache_key, self._cached_result(cache_key, _DW_CACHE['version'], build))
+                return
+            except query_engine.QueryError as e:
+                self._set_headers(400)
+                self.wfile.write(json.dumps({'error': 'Query non valida', 'detail': str(e)}).encode('utf-8'))
                 return
             except Exception as e:
                 self._set_headers(500)
@@ -824,7 +2528,7 @@ class APIHandler(BaseHTTPRequestHandler):
             return
         if path == '/export/status':
             job_id = (qs.get('id') or [''])[0]
-            info = JOBS.get(job_id)
+            info = _find_job(job_id)
             if not info:
                 self._set_headers(404)
                 self.wfile.write(json.dumps({'status': 'error', 'message': 'Job non trovato'}).encode('utf-8'))
@@ -837,63 +2541,42 @@ class APIHandler(BaseHTTPRequestHandler):
             }).encode('utf-8'))
             return
         if path == '/export/download':
-            job_id = (qs.get('id') or [''])[0]
-            info = JOBS.get(job_id)
-            if not info or info.get('status') != 'done' or not os.path.isfile(info.get('zip_path','')):
+            zip_path = _export_zip(qs)
+            if zip_path is None or not self._send_file(zip_path, 'application/zip', {
+                    'Content-Disposition': f'attachment; filename="{os.path.basename(zip_path)}"'}):
                 self._set_headers(404)
                 self.wfile.write(json.dumps({'error': 'File non pronto'}).encode('utf-8'))
-                return
-            zip_path = info['zip_path']
-            with open(zip_path, 'rb') as fp:
-                data = fp.read()
-            self._set_headers(200, 'application/zip', extra_headers={
-                'Content-Disposition': f'attachment; filename="{os.path.basename(zip_path)}"',
-                'Content-Length': str(len(data)),
-            })
-            self.wfile.write(data)
             return
         # Static files serving: serve index and assets from project root
-        try:
-            # Map root to index.html
-            rel = path.lstrip('/') or 'index.html'
-            rel = os.path.normpath(rel)
-            # Basic traversal protection
-            if rel.startswith('..'):
-                raise Exception('Traversal')
-            # Disallow backend and DW direct exposure
-            if rel.startswith('backend') or rel.startswith('DW'):
-                raise Exception('Forbidden')
-            # Allow only certain directories
-            first = rel.split(os.sep)[0] if rel else ''
-            allowed_dirs = ('', 'assets', 'exports')
-            if first not in allowed_dirs:
-                raise Exception('Forbidden')
-            abs_path = os.path.join(PROJECT_ROOT, rel)
-            if os.path.isfile(abs_path):
-                ext = os.path.splitext(abs_path)[1].lower()
-                content_types = {
-                    '.html': 'text/html; charset=utf-8',
-                    '.js': 'application/javascript; charset=utf-8',
-                    '.css': 'text/css; charset=utf-8',
-                    '.ico': 'image/x-icon',
-                    '.png': 'image/png',
-                    '.jpg': 'image/jpeg',
-                    '.jpeg': 'image/jpeg',
-                    '.svg': 'image/svg+xml',
-                    '.zip': 'application/zip',
-                }
-                ct = content_types.get(ext, 'application/octet-stream')
-                with open(abs_path, 'rb') as fp:
-                    data = fp.read()
-                self._set_headers(200, ct, extra_headers={'Content-Length': str(len(data))})
-                self.wfile.write(data)
+        abs_path = _static_path(path)
+        if abs_path is not None:
+            ct = STATIC_TYPES.get(os.path.splitext(abs_path)[1].lower(), 'application/octet-stream')
+            if self._send_file(abs_path, ct):
                 return
-        except Exception:
-            pass
         # Not found
         self._set_headers(404)
         self.wfile.write(json.dumps({'error': 'Not found'}).encode('utf-8'))
 
+    def do_HEAD(self):
+        # solo per i file (pagine, export, statici): i download manager leggono dimensione e
+        # Accept-Ranges prima di riprendere un download
+        parsed = urlparse(self.path)
+        path = parsed.path
+        target = None
+        if path in PAGES:
+            target = (os.path.join(PROJECT_ROOT, PAGES[path]), 'text/html; charset=utf-8', None)
+        elif path == '/export/download':
+            zip_path = _export_zip(parse_qs(parsed.query or ''))
+            if zip_path is not None:
+                target = (zip_path, 'application/zip',
+                          {'Content-Disposition': f'attachment; filename="{os.path.basename(zip_path)}"'})
+        else:
+            abs_path = _static_path(path)
+            if abs_path is not None:
+                target = (abs_path, STATIC_TYPES.get(os.path.splitext(abs_path)[1].lower(), 'application/octet-stream'), None)
+        if target is None or not self._send_file(*target, body=False):
+            self._set_headers(404, extra_headers={'Content-Length': '0'})
+
     def do_POST(self):
         parsed = urlparse(self.path)
         path = parsed.path
@@ -925,6 +2608,23 @@ class APIHandler(BaseHTTPRequestHandler):
             self._set_headers(200)
             self.wfile.write(json.dumps({'ok': True, 'user': found}).encode('utf-8'))
             return
+        # Re-ingestione completa di DW sotto cProfile (profilo consultabile da /api/admin/profiles/<id>)
+        if path == '/api/admin/profile/ingest':
+            if not _PROFILER.authorized(self.headers):
+                self._set_headers(403)
+                self.wfile.write(json.dumps({'error': 'Profilazione non abilitata'}).encode('utf-8'))
+                return
+            try:
+                profile_id, stats = _PROFILER.run(_reingest_all, 'ingest ' + DW_DIR, kind='ingest')
+                entry = _PROFILER.get(profile_id)
+                self._set_headers(200)
+                self.wfile.write(json.dumps({'ok': True, 'id': profile_id, 'durationMs': entry['durationMs'] if entry else None,
+                                             'stats': stats}).encode('utf-8'))
+                return
+            except Exception as e:
+                self._set_headers(500)
+                self.wfile.write(json.dumps({'error': 'Errore interno', 'detail': str(e)}).encode('utf-8'))
+                return
         if path == '/api/admin/users/create':
             users = load_users()
             username = (payload.get('username') or '').strip()
@@ -1063,6 +2763,7 @@ class APIHandler(BaseHTTPRequestHandler):
                         with open(dst, 'wb') as out:
                             out.write(data)
                         saved.append(filename)
+                _refresh_dw(force=True)
                 stats = count_stats()
                 total = 0
                 try:
@@ -1100,6 +2801,7 @@ class APIHandler(BaseHTTPRequestHandler):
                             deleted.append(fname)
                     except Exception:
                         continue
+                _refresh_dw(force=True)
                 stats = count_stats()
                 self._set_headers(200)
                 self.wfile.write(json.dumps({'ok': True, 'deleted': deleted, 'deletedCount': len(deleted), 'stats': stats}).encode('utf-8'))
@@ -1144,9 +2846,202 @@ class APIHandler(BaseHTTPRequestHandler):
         self.wfile.write(json.dumps({'error': 'Not found'}).encode('utf-8'))
 
 
+def _aio_routes():
+    """Route servite direttamente sul loop asyncio (senza thread): ping, SSE e download export.
+    Ogni route ritorna (status, keep_alive); timed() registra lo status nelle metriche."""
+    import asyncio
+    import aio_server
+
+    async def ping(req, writer, keep_alive):
+        await aio_server.send_json(writer, 200, {'ok': True, 'version': _DW_CACHE['version']}, keep_alive)
+        return 200, keep_alive
+
+    async def events(req, writer, keep_alive):
+        sub = aio_server.LoopQueue(asyncio.get_running_loop(), _EVENTS.max_queue)
+        _EVENTS.subscribe(sub)
+        try:
+            writer.write(aio_server.build_head(200, [
+                ('Content-Type', 'text/event-stream; charset=utf-8'),
+                ('Cache-Control', 'no-cache'),
+                ('Access-Control-Allow-Origin', '*'),
+                ('X-Accel-Buffering', 'no'),
+            ], keep_alive=False))
+            version = _DW_CACHE['version']
+            # count_stats puo' ricostruire l'header: fuori dal loop per non fermare le altre connessioni
+            header = await asyncio.get_running_loop().run_in_executor(None, lambda: count_stats(refresh=False))
+            hello = {'version': version, 'header': header}
+            writer.write(f'retry: {int(SSE_HEARTBEAT * 1000)}\nid: {version}\nevent: hello\ndata: {json.dumps(hello)}\n\n'.encode('utf-8'))
+            await writer.drain()
+            while True:
+                try:
+                    event, data = await sub.get(SSE_HEARTBEAT)
+                    msg = f'id: {data.get("version")}\nevent: {event}\ndata: {json.dumps(data)}\n\n'
+                except asyncio.TimeoutError:
+                    msg = f'event: heartbeat\ndata: {json.dumps({"version": _DW_CACHE["version"], "ts": int(time.time())})}\n\n'
+                writer.write(msg.encode('utf-8'))
+                await writer.drain()
+        except ConnectionError:
+            pass    # il client ha chiuso lo stream: fine normale
+        finally:
+            _EVENTS.unsubscribe(sub)
+        return 200, False
+
+    async def download(req, writer, keep_alive):
+        zip_path = _export_zip(parse_qs(urlparse(req.target).query or ''))
+        if zip_path is None:
+            await aio_server.send_json(writer, 404, {'error': 'File non pronto'}, keep_alive)
+            return 404, keep_alive
+        status, offset, length, extra = http_range.plan(lambda k: req.headers.get(k.lower()), os.stat(zip_path))
+        headers = [
+            ('Content-Type', 'application/zip'),
+            ('Access-Control-Allow-Origin', '*'),
+            ('Content-Disposition', f'attachment; filename="{os.path.basename(zip_path)}"'),
+        ] + list(extra.items())
+        if status == 416:
+            await aio_server.send(writer, status, headers, b'', keep_alive)
+        else:
+            await aio_server.send_file(writer, zip_path, headers, keep_alive, offset, length, status)
+        return status, keep_alive
+
+    def timed(route, fn):
+        async def wrapper(req, writer, keep_alive):
+            t0 = time.perf_counter()
+            _METRICS.request_started()
+            status = 500
+            try:
+                status, keep_alive = await fn(req, writer, keep_alive)
+                return keep_alive
+            finally:
+                _METRICS.request_finished(req.method, route, status, time.perf_counter() - t0, 0)
+        return wrapper
+
+    return {
+        '/api/ping': timed('/api/ping', ping),
+        '/api/events': timed('/api/events', events),
+        '/export/download': timed('/export/download', download),
+    }
+
+
+def _run_worker(sock, use_aio=False, concurrency=32):
+    """Processo worker pre-fork: serve HTTP sul socket condiviso leggendo lo snapshot del master."""
+    _PREFORK['role'] = 'worker'
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+    threading.Thread(target=_follow_snapshot, name='dw-snapshot', daemon=True).start()
+    if use_aio:
+        import aio_server
+        aio_server.serve(APIHandler, routes=_aio_routes(), max_concurrency=concurrency,
+                         admission=_ADMISSION if _ADMISSION.enabled else None, sock=sock)
+        return
+    server = ThreadingHTTPServer(sock.getsockname(), APIHandler, bind_and_activate=False)
+    server.socket.close()
+    server.socket = sock
+    server.server_name, server.server_port = sock.getsockname()[:2]
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+def serve_prefork(port, workers, use_aio=False, concurrency=32):
+    """Modalita' multi-processo: N worker sullo stesso socket in ascolto, ingestione nel master.
+    I worker vengono creati prima dell'ingestione (nessuna copia dei dati parsati nei figli) e
+    leggono lo snapshot mmap; il master lo riscrive ad ogni nuova versione e riavvia i worker morti.
+    """
+    import multiprocessing
+    _PREFORK['role'] = 'master'
+    _PREFORK['master_pid'] = os.getpid()
+    _PREFORK['requested'] = multiprocessing.Value('q', 0)
+    _PREFORK['done'] = multiprocessing.Value('q', 0, lock=False)
+    try:
+        os.remove(SNAPSHOT_PATH)   # mai servire lo snapshot di un'esecuzione precedente
+    except FileNotFoundError:
+        pass
+    sock = socket.create_server(('0.0.0.0', port), backlog=1024)
+    sock.setblocking(False)        # accept concorrente tra processi senza blocchi
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _run_worker(sock, use_aio, concurrency)
+            except KeyboardInterrupt:
+                pass
+            except Exception:
+                import traceback
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        return pid
+
+    children = {spawn() for _ in range(workers)}
+    wake = threading.Event()
+    signal.signal(signal.SIGUSR1, lambda *_: wake.set())
+    def _stop(*_):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, _stop)
+    try:
+        while True:
+            ticket = _PREFORK['requested'].value
+            try:
+                _refresh_dw(force=True)
+            except Exception:
+                pass
+            _PREFORK['done'].value = ticket
+            wake.wait(WATCH_INTERVAL)
+            wake.clear()
+            # riavvia i worker terminati
+            while children:
+                pid, _status = os.waitpid(-1, os.WNOHANG)
+                if pid == 0:
+                    break
+                children.discard(pid)
+                children.add(spawn())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+        for pid in children:
+            try:
+                os.waitpid(pid, 0)
+            except OSError:
+                pass
+        sock.close()
+
+
 if __name__ == '__main__':
+    import sys
     ensure_dirs()
     port = int(os.environ.get('PORT', '9000'))
+    use_aio = '--aio' in sys.argv or os.environ.get('DW_SERVER_MODE', '') == 'aio'
+    concurrency = int(os.environ.get('DW_AIO_CONCURRENCY', '32'))
+    # Pre-fork multi-processo: --workers N oppure DW_WORKERS=N (N > 1)
+    workers = int(os.environ.get('DW_WORKERS', '1'))
+    if '--workers' in sys.argv:
+        workers = int(sys.argv[sys.argv.index('--workers') + 1])
+    if workers > 1:
+        print(f"Backend server running at http://localhost:{port}/ (pre-fork, {workers} worker{', asyncio' if use_aio else ''})")
+        print(f"DW directory: {DW_DIR}")
+        print(f"Snapshot: {SNAPSHOT_PATH}")
+        serve_prefork(port, workers, use_aio, concurrency)
+        sys.exit(0)
+    # Il watcher indicizza DW all'avvio e poi notifica i cambiamenti via /api/events
+    if os.environ.get('DW_WATCH', '1') != '0':
+        start_watcher()
+    # Modalita' asyncio HTTP/1.1 keep-alive: --aio oppure DW_SERVER_MODE=aio
+    if use_aio:
+        import aio_server
+        print(f"Backend server running at http://localhost:{port}/ (asyncio, HTTP/1.1 keep-alive, concurrency={concurrency})")
+        print(f"DW directory: {DW_DIR}")
+        aio_server.serve(APIHandler, '0.0.0.0', port, routes=_aio_routes(), max_concurrency=concurrency,
+                         admission=_ADMISSION if _ADMISSION.enabled else None)
+        sys.exit(0)
     server = ThreadingHTTPServer(('0.0.0.0', port), APIHandler)
     print(f"Backend server running at http://localhost:{port}/ (threaded)")
     print(f"DW directory: {DW_DIR}")
@@ -0,0 +1,284 @@
+import os
+import json
+import mmap
+import bisect
+import struct
+from array import array
+
+# Snapshot read-only del dataset per la modalita' multi-processo (pre-fork).
+#
+# Il processo master ingerisce DW una sola volta e scrive qui i dataset in forma colonnare:
+# una tabella di stringhe distinte condivisa e, per ogni dataset e campo, un array uint32 di id
+# stringa. I worker mappano il file con mmap (pagine condivise nella page cache, nessuna copia
+# per processo) e leggono le righe tramite viste pigre che costruiscono i dict solo su richiesta.
+#
+# Layout:  MAGIC | u64 lunghezza header | header JSON | padding a 8 | dati
+#   dati: offsets stringhe (u64 x count+1) | blob UTF-8 | colonne (u32 x righe) per dataset/campo
+# La scrittura avviene su file temporaneo + os.replace: i worker che stanno ancora leggendo la
+# versione precedente mantengono valida la loro mappatura (inode non ancora rilasciato).
+#
+# Un dataset da scrivere puo' essere anche un Concat di blocchi: liste di dict e viste
+# (SnapshotRows.view) di uno snapshot precedente o di un ColumnBuffer, le cui colonne vengono
+# copiate rimappando gli id stringa senza materializzare le righe (budget di memoria,
+# block_cache.py).
+
+MAGIC = b'DWSNAP1\0'
+
+
+def _pad8(n):
+    return (8 - n % 8) % 8
+
+
+class ColumnBuffer:
+    """Tabella di stringhe e colonne di id in memoria, nella stessa forma dello snapshot: un blocco
+    di righe aggiunto con add() occupa 4 byte per campo e riga (le stringhe distinte sono condivise)
+    e resta leggibile come SnapshotRows. write_snapshot() la usa per comporre il file."""
+
+    def __init__(self):
+        self._ids = {}
+        self._strings = []
+        self._remap = {}   # id(sorgente) -> {id stringa sorgente: id stringa qui}
+
+    def __len__(self):
+        return len(self._strings)
+
+    def string(self, sid):
+        return self._strings[sid]
+
+    def _intern(self, s):
+        sid = self._ids.get(s)
+        if sid is None:
+            sid = self._ids[s] = len(self._strings)
+            self._strings.append(s)
+        return sid
+
+    def add(self, rows):
+        """Converte in colonne una lista di dict, una vista SnapshotRows (id rimappati senza
+        materializzare le righe) o un Concat di entrambe; i campi sono quelli della prima riga."""
+        parts = rows.parts if isinstance(rows, Concat) else (rows,)
+        fields = []
+        seen = set()
+        for it in rows[:1]:
+            for k in it.keys():
+                if k not in seen:
+                    seen.add(k)
+                    fields.append(k)
+        intern = self._intern
+        cols = []
+        for field in fields:
+            ids = array('I')
+            append = ids.append
+            for part in parts:
+                col = part.column(field) if isinstance(part, SnapshotRows) else None
+                if col is None:
+                    for it in part:
+                        v = it.get(field)
+                        append(intern('' if v is None else v))
+                elif part._snap is self:
+                    ids.extend(col)
+                else:
+                    memo = self._remap.setdefault(id(part._snap), {})
+                    value = part.value
+                    for sid in col:
+                        nid = memo.get(sid)
+                        if nid is None:
+                            nid = memo[sid] = intern(value(sid))
+                        append(nid)
+            cols.append(ids)
+        return SnapshotRows(self, fields, cols, len(rows))
+
+
+def write_snapshot(path, version, datasets, meta=None):
+    """Scrive atomicamente lo snapshot. datasets: {nome: lista di dict, SnapshotRows o Concat}.
+    Ritorna i byte scritti."""
+    buf = ColumnBuffer()
+    layout = {}
+    for name, rows in datasets.items():
+        view = buf.add(rows)
+        layout[name] = {'rows': len(view), 'fields': view.fields, 'cols': dict(zip(view.fields, view._cols))}
+    strings = buf._strings
+
+    blobs = [s.encode('utf-8') for s in strings]
+    offsets = array('Q', [0])
+    total = 0
+    for b in blobs:
+        total += len(b)
+        offsets.append(total)
+    blob = b''.join(blobs)
+
+    # offset relativi all'inizio della sezione dati
+    pos = 0
+    strings_offsets_at = pos
+    pos += len(offsets) * 8
+    blob_at = pos
+    pos += len(blob) + _pad8(len(blob))
+    header_ds = {}
+    for name, info in layout.items():
+        col_at = {}
+        for field, ids in info['cols'].items():
+            col_at[field] = pos
+            pos += len(ids) * 4 + _pad8(len(ids) * 4)
+        header_ds[name] = {'rows': info['rows'], 'fields': info['fields'], 'columns': col_at}
+    header = json.dumps({
+        'version': version,
+        'meta': meta or {},
+        'strings': {'count': len(blobs), 'offsets': strings_offsets_at, 'blob': blob_at},
+        'datasets': header_ds,
+    }).encode('utf-8')
+
+    tmp = f'{path}.{os.getpid()}.tmp'
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<Q', len(header)))
+        f.write(header)
+        f.write(b'\0' * _pad8(len(MAGIC) + 8 + len(header)))
+        f.write(offsets.tobytes())
+        f.write(blob)
+        f.write(b'\0' * _pad8(len(blob)))
+        for info in layout.values():
+            for ids in info['cols'].values():
+                data = ids.tobytes()
+                f.write(data)
+                f.write(b'\0' * _pad8(len(data)))
+        size = f.tell()
+    os.replace(tmp, path)
+    return size
+
+
+class Snapshot:
+    """Snapshot mappato in memoria (sola lettura)."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            self.signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        mm = self._mm
+        if mm[:len(MAGIC)] != MAGIC:
+            raise ValueError('snapshot non valido')
+        (hlen,) = struct.unpack('<Q', mm[len(MAGIC):len(MAGIC) + 8])
+        hstart = len(MAGIC) + 8
+        header = json.loads(mm[hstart:hstart + hlen].decode('utf-8'))
+        base = hstart + hlen + _pad8(hstart + hlen)
+        self.version = header['version']
+        self.meta = header['meta']
+        view = memoryview(mm)
+        count = header['strings']['count']
+        so = base + header['strings']['offsets']
+        self._offsets = view[so:so + (count + 1) * 8].cast('Q')
+        self._blob_at = base + header['strings']['blob']
+        self._strings = [None] * count
+        self._datasets = {}
+        for name, info in header['datasets'].items():
+            n = info['rows']
+            cols = []
+            for field in info['fields']:
+                at = base + info['columns'][field]
+                cols.append(view[at:at + n * 4].cast('I'))
+            self._datasets[name] = SnapshotRows(self, info['fields'], cols, n)
+
+    def string(self, sid):
+        s = self._strings[sid]
+        if s is None:
+            a = self._blob_at + self._offsets[sid]
+            b = self._blob_at + self._offsets[sid + 1]
+            s = self._mm[a:b].decode('utf-8')
+            self._strings[sid] = s
+        return s
+
+    def rows(self, name):
+        rows = self._datasets.get(name)
+        return rows if rows is not None else SnapshotRows(self, [], [], 0)
+
+    def names(self):
+        return list(self._datasets.keys())
+
+
+class SnapshotRows:
+    """Vista pigra di un dataset dello snapshot: si comporta come una lista di dict in sola lettura.
+    column(field)/value(id) permettono a query_engine di costruire indici senza materializzare righe.
+    """
+
+    def __init__(self, snap, fields, cols, n):
+        self._snap = snap
+        self.fields = list(fields)
+        self._cols = cols
+        self._by_field = dict(zip(self.fields, cols))
+        self._n = n
+
+    def __len__(self):
+        return self._n
+
+    def __bool__(self):
+        return self._n > 0
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._n))]
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError(i)
+        s = self._snap.string
+        return {f: s(col[i]) for f, col in zip(self.fields, self._cols)}
+
+    def __iter__(self):
+        s = self._snap.string
+        fields = self.fields
+        for ids in zip(*self._cols):
+            yield dict(zip(fields, map(s, ids)))
+
+    def column(self, field):
+        """Array di id stringa del campo (o None se il campo non esiste)."""
+        return self._by_field.get(field)
+
+    def value(self, sid):
+        return self._snap.string(sid)
+
+    def view(self, start, end):
+        """Righe [start, end) come nuova vista (slicing delle colonne mmap, nessuna copia)."""
+        start, end, _ = slice(start, end).indices(self._n)
+        end = max(start, end)
+        return SnapshotRows(self._snap, self.fields, [c[start:end] for c in self._cols], end - start)
+
+
+class Concat:
+    """Sequenza in sola lettura formata da piu' blocchi (liste o SnapshotRows) consecutivi."""
+
+    def __init__(self, parts):
+        self.parts = [p for p in parts if len(p)]
+        self._starts = []
+        n = 0
+        for p in self.parts:
+            self._starts.append(n)
+            n += len(p)
+        self._n = n
+
+    def __len__(self):
+        return self._n
+
+    def __bool__(self):
+        return self._n > 0
+
+    def __iter__(self):
+        for p in self.parts:
+            yield from p
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(self._n)
+            if step != 1:
+                return [self[j] for j in range(start, stop, step)]
+            out = []
+            for p, at in zip(self.parts, self._starts):
+                lo, hi = max(start - at, 0), min(stop - at, len(p))
+                if lo < hi:
+                    out.extend(p[lo:hi])
+            return out
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError(i)
+        k = bisect.bisect_right(self._starts, i) - 1
+        return self.parts[k][i - self._starts[k]]
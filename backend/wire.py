@@ -0,0 +1,100 @@
+# Formato colonnare opzionale per le risposte evento voluminose (format=columnar su /api/lga,
+# /api/lge, /api/lgd, /api/lgd_metrics e /api/bootstrap).
+#
+# Invece di una lista di oggetti (nomi dei campi e valori ripetuti in ogni riga) ogni dataset
+# diventa:
+#   {"rows": N, "fields": ["fileName", "dateIso", ...],
+#    "columns": {"fileName": [0, 0, 1, ...], "time": ["10:00:01", ...], ...},
+#    "dicts": {"fileName": ["CS01T.log", "CS01E.log", ...], ...},
+#    "missing": {"comment": [3, 17], ...}}
+# Le colonne con molti valori ripetuti (fileName, severity, title, object, typeReason, dateIso,
+# ...) sono codificate a dizionario: la colonna contiene indici nella tabella in "dicts". La
+# scelta e' per colonna e per risposta (almeno due occorrenze per valore distinto in media);
+# le altre colonne (es. time) restano valori semplici. null in una colonna e' il valore null
+# (es. percent delle righe LGD non parziali); le righe in cui un campo manca sono elencate in
+# "missing" (solo per i campi assenti in qualche riga). Il frontend ricostruisce le righe con
+# decodeColumnar() (index.html, alarm_detail.html).
+
+import operator
+
+FORMAT = 'columnar'
+
+# occorrenze medie per valore distinto oltre le quali una colonna viene codificata a dizionario
+DICT_MIN_REPEAT = 2
+
+
+def requested(qs):
+    """True se la richiesta chiede il formato colonnare (format=columnar)."""
+    return (qs.get('format', [''])[0] or '').strip().lower() == FORMAT
+
+
+_ABSENT = object()
+
+
+def _columns(rows):
+    """(campi, colonne, {campo: righe in cui manca}): trasposizione in un solo passaggio quando
+    tutte le righe hanno gli stessi campi (caso normale), altrimenti per campo con None dove il
+    campo manca."""
+    shapes = dict.fromkeys(tuple(it) for it in rows)
+    if len(shapes) == 1:
+        fields = list(next(iter(shapes)))
+        if len(fields) == 1:
+            return fields, [[it[fields[0]] for it in rows]], {}
+        return fields, list(zip(*map(operator.itemgetter(*fields), rows))), {}
+    fields = list(dict.fromkeys(f for shape in shapes for f in shape))
+    columns = []
+    missing = {}
+    for f in fields:
+        col = [it.get(f, _ABSENT) for it in rows]
+        gaps = [i for i, v in enumerate(col) if v is _ABSENT]
+        if gaps:
+            missing[f] = gaps
+            for i in gaps:
+                col[i] = None
+        columns.append(col)
+    return fields, columns, missing
+
+
+def encode(rows):
+    """Righe (lista di dict) -> blocco colonnare; decodificato da' le stesse righe."""
+    n = len(rows)
+    fields, values, missing = _columns(rows) if n else ([], [], {})
+    columns = {}
+    dicts = {}
+    for f, col in zip(fields, values):
+        try:
+            table = dict.fromkeys(col)
+        except TypeError:
+            # valori non hashable (liste, dict): colonna semplice
+            columns[f] = col
+            continue
+        table.pop(None, None)
+        if len(table) * DICT_MIN_REPEAT <= n:
+            index = {v: i for i, v in enumerate(table)}
+            index[None] = None
+            columns[f] = list(map(index.__getitem__, col))
+            dicts[f] = list(table)
+        else:
+            columns[f] = col
+    block = {'rows': n, 'fields': fields, 'columns': columns, 'dicts': dicts}
+    if missing:
+        block['missing'] = missing
+    return block
+
+
+def decode(block):
+    """Inverso di encode() (usato per verifiche e dai client Python)."""
+    n = block['rows']
+    rows = [{} for _ in range(n)]
+    missing = block.get('missing') or {}
+    for f in block['fields']:
+        col = block['columns'][f]
+        table = block['dicts'].get(f)
+        gaps = set(missing.get(f) or ())
+        for i, (row, v) in enumerate(zip(rows, col)):
+            if v is None:
+                if i not in gaps:
+                    row[f] = None
+                continue
+            row[f] = table[v] if table is not None else v
+    return rows
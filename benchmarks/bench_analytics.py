@@ -0,0 +1,183 @@
+"""Benchmark del motore analitico: percorsi in puro Python contro NumPy (backend/analytics.py).
+
+Genera in memoria N righe evento deterministiche (stesse distribuzioni di gen_amos_logs.py:
+titoli Zipf, severita', outage con durate, blocchi per nodo ordinati per tempo) e misura, sulle
+liste di dict e sulla vista colonnare dello snapshot mmap:
+  - conteggi per valore dei grafici (_value_counts / analytics.value_counts)
+  - somma delle durate per typeReason
+  - raggruppamenti di /api/aggregate (node, site+severity, day, title filtrato per severita')
+NumPy e' misurato a freddo (codifica delle colonne compresa) e a caldo (Frame gia' costruito);
+ogni risultato viene confrontato con quello in puro Python. Richiede NumPy installato.
+
+Uso:
+    python benchmarks/bench_analytics.py --rows 1000000 --out bench_analytics.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+
+import gen_amos_logs  # noqa: E402
+import aggregate  # noqa: E402
+import analytics  # noqa: E402
+import query_engine  # noqa: E402
+import server  # noqa: E402
+import snapshot  # noqa: E402
+
+# (nome, dimensioni di by=, filtro where)
+GROUPINGS = [
+    ('node', 'node', ''),
+    ('site,severity', 'site,severity', ''),
+    ('day', 'day', ''),
+    ('title|Major', 'title', 'severity = Major'),
+    ('typeReason+duration', 'typeReason', ''),
+]
+
+
+def generate_rows(count, seed):
+    """Righe evento per blocchi di nodo, ognuno ordinato per (dateIso, time)."""
+    rng = random.Random(seed)
+    per_node = 600
+    names = gen_amos_logs.node_names(max(1, count // per_node))
+    rows = []
+    for i, name in enumerate(names):
+        n = per_node if i < len(names) - 1 else count - len(rows)
+        stamps = sorted(gen_amos_logs._ts(rng) for _ in range(n))
+        for t in stamps:
+            title, obj, _detail, _w = gen_amos_logs._weighted(rng, gen_amos_logs.ALARM_TITLES)
+            reason = gen_amos_logs._weighted(rng, gen_amos_logs.OUTAGE_REASONS)[0]
+            rows.append({
+                'fileName': name + '.log',
+                'dateIso': t.strftime('%Y-%m-%d'),
+                'time': t.strftime('%H:%M:%S'),
+                'severity': gen_amos_logs._weighted(rng, gen_amos_logs.ALARM_SEVERITIES)[0].strip(),
+                'title': title,
+                'object': obj.format(cell=f'{name}{rng.randrange(1, 7)}', n=rng.randrange(1, 4)),
+                'typeReason': reason,
+                'duration': gen_amos_logs._fmt_duration(rng.randrange(5, 4 * 3600)),
+            })
+    return rows
+
+
+def timed(fn, repeat):
+    best = None
+    out = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return out, best
+
+
+def run_layout(rows, repeat):
+    """Misure per un layout di righe (lista di dict o SnapshotRows)."""
+    dataset = query_engine.Dataset(rows, 1, time_sorted=True)
+    results = []
+    for label, by, where in GROUPINGS:
+        dims = aggregate.dimensions(by, query_engine.field_name, {})
+        positions = dataset.positions(query_engine.parse_where(where))
+        duration = server.parse_duration_sec if label.endswith('duration') else None
+
+        def pure():
+            if label == 'typeReason+duration':
+                return server._value_counts(rows, 'typeReason', 'duration')
+            return aggregate.group(dataset, positions, dims, duration)
+
+        def vectorized(frame):
+            if label == 'typeReason+duration':
+                return analytics.sums(frame, 'typeReason', 'duration', server.parse_duration_sec)
+            return aggregate.group(dataset, positions, dims, duration, frame=frame)
+
+        expected, t_pure = timed(pure, repeat)
+        cold, t_cold = timed(lambda: vectorized(analytics.Frame(rows)), 1)
+        frame = analytics.Frame(rows)
+        vectorized(frame)
+        warm, t_warm = timed(lambda: vectorized(frame), repeat)
+        if label == 'typeReason+duration':
+            # riferimento: somme dai conteggi per (typeReason, duration) come nel grafico
+            totals = {}
+            for (v, d), n in expected.items():
+                totals[v] = totals.get(v, 0) + server.parse_duration_sec(d or '') * n
+            expected = totals
+        same = expected == cold == warm and list(expected) == list(warm)
+        results.append({
+            'grouping': label,
+            'rows': len(positions),
+            'groups': len(expected),
+            'pure_ms': round(t_pure * 1000, 1),
+            'numpy_cold_ms': round(t_cold * 1000, 1),
+            'numpy_warm_ms': round(t_warm * 1000, 1),
+            'speedup_warm': round(t_pure / t_warm, 1) if t_warm else None,
+            'identical': same,
+        })
+    counts_pure, t_pure = timed(lambda: server._value_counts(rows, 'title'), repeat)
+    frame = analytics.Frame(rows)
+    counts_np, t_cold = timed(lambda: analytics.value_counts(frame, ('title',)), 1)
+    counts_np, t_warm = timed(lambda: analytics.value_counts(frame, ('title',)), repeat)
+    results.append({
+        'grouping': 'value_counts(title)',
+        'rows': len(rows),
+        'groups': len(counts_pure),
+        'pure_ms': round(t_pure * 1000, 1),
+        'numpy_cold_ms': round(t_cold * 1000, 1),
+        'numpy_warm_ms': round(t_warm * 1000, 1),
+        'speedup_warm': round(t_pure / t_warm, 1) if t_warm else None,
+        'identical': counts_pure == counts_np and list(counts_pure) == list(counts_np),
+    })
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--rows', type=int, default=1000000)
+    ap.add_argument('--seed', type=int, default=7)
+    ap.add_argument('--repeat', type=int, default=3, help='ripetizioni misurate (si riporta la migliore)')
+    ap.add_argument('--out', default='')
+    args = ap.parse_args()
+    if analytics.np is None:
+        raise SystemExit('NumPy non installato: il benchmark confronta i due percorsi')
+
+    t0 = time.perf_counter()
+    rows = generate_rows(args.rows, args.seed)
+    print(f'{len(rows)} righe generate in {time.perf_counter() - t0:.1f}s', file=sys.stderr)
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'numpy': analytics.np.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'rows': len(rows),
+        'seed': args.seed,
+        'layouts': {},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.snapshot')
+        snapshot.write_snapshot(path, 1, {'lga': rows})
+        snap = snapshot.Snapshot(path)
+        for layout, data in (('dict', rows), ('snapshot', snap.rows('lga'))):
+            report['layouts'][layout] = run_layout(data, args.repeat)
+            for r in report['layouts'][layout]:
+                print(f"{layout:8s} {r['grouping']:22s} {r['rows']:9d} righe {r['groups']:7d} gruppi  "
+                      f"puro {r['pure_ms']:8.1f}ms  numpy freddo {r['numpy_cold_ms']:8.1f}ms  "
+                      f"caldo {r['numpy_warm_ms']:7.1f}ms  x{r['speedup_warm']}  "
+                      f"{'identico' if r['identical'] else 'DIVERSO'}", file=sys.stderr)
+        del snap
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""Benchmark HTTP: server threaded (HTTP/1.0) contro modalita' asyncio (HTTP/1.1 keep-alive).
+
+Avvia backend/server.py in ciascuna modalita', attende l'indicizzazione di DW e simula N client
+dashboard concorrenti (ping, header, grafici, pagine eventi) con connessioni persistenti lato
+client. Un client dedicato misura la latenza di /api/ping sotto carico.
+
+Uso:
+    python benchmarks/bench_http.py --clients 50 --duration 20 --out bench_http.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import subprocess
+import http.client
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER = os.path.join(ROOT, 'backend', 'server.py')
+
+DASHBOARD_MIX = [
+    '/api/ping',
+    '/api/stats/header',
+    '/api/charts/summary?n=5',
+    '/api/lga?limit=1000',
+    '/api/lge?limit=1000',
+    '/api/lgd?limit=1000',
+    '/api/lgd_metrics?limit=1000',
+]
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, int(round(p / 100.0 * (len(values) - 1)))))
+    return values[k]
+
+
+def summarize(latencies):
+    return {
+        'count': len(latencies),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'max_ms': round(max(latencies) * 1000, 2) if latencies else 0.0,
+    }
+
+
+def start_server(mode, port, env_extra=None):
+    env = dict(os.environ)
+    env['PORT'] = str(port)
+    env.update(env_extra or {})
+    args = [sys.executable, SERVER] + (['--aio'] if mode == 'aio' else [])
+    proc = subprocess.Popen(args, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 600
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=600)
+            conn.request('GET', '/api/stats/header')
+            resp = conn.getresponse()
+            resp.read()
+            conn.close()
+            if resp.status == 200:
+                return proc
+        except Exception:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f'server {mode} non pronto')
+
+
+def client_loop(port, paths, stop_at, results, errors, lock):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    local = {}
+    local_errors = 0
+    i = 0
+    while time.time() < stop_at:
+        path = paths[i % len(paths)]
+        i += 1
+        t0 = time.perf_counter()
+        try:
+            conn.request('GET', path)
+            resp = conn.getresponse()
+            resp.read()
+            if resp.status >= 400:
+                local_errors += 1
+                continue
+        except Exception:
+            local_errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+            continue
+        local.setdefault(path.split('?')[0], []).append(time.perf_counter() - t0)
+    conn.close()
+    with lock:
+        for k, v in local.items():
+            results.setdefault(k, []).extend(v)
+        errors[0] += local_errors
+
+
+def warm_up(port):
+    """Un giro del mix per costruire cache e indici prima della misura."""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=600)
+    for path in DASHBOARD_MIX:
+        conn.request('GET', path)
+        conn.getresponse().read()
+    conn.close()
+
+
+def run_load(port, clients, duration):
+    warm_up(port)
+    results = {}
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.time() + duration
+    threads = [threading.Thread(target=client_loop, args=(port, DASHBOARD_MIX, stop_at, results, errors, lock))
+               for _ in range(clients)]
+    # sonda di liveness: solo /api/ping, come fanno le pagine
+    ping_results = {}
+    probe = threading.Thread(target=client_loop, args=(port, ['/api/ping'], stop_at, ping_results, [0], lock))
+    t0 = time.time()
+    for t in threads + [probe]:
+        t.start()
+    for t in threads + [probe]:
+        t.join()
+    elapsed = time.time() - t0
+    all_lat = [x for v in results.values() for x in v]
+    return {
+        'clients': clients,
+        'duration_s': round(elapsed, 2),
+        'requests': len(all_lat),
+        'errors': errors[0],
+        'rps': round(len(all_lat) / elapsed, 1) if elapsed else 0.0,
+        'latency': summarize(all_lat),
+        'endpoints': {k: summarize(v) for k, v in sorted(results.items())},
+        'ping_under_load': summarize(ping_results.get('/api/ping', [])),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--clients', type=int, default=50)
+    ap.add_argument('--duration', type=float, default=20)
+    ap.add_argument('--modes', default='threaded,aio')
+    ap.add_argument('--port', type=int, default=9310)
+    ap.add_argument('--out', default='')
+    args = ap.parse_args()
+
+    report = {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': sys.version.split()[0], 'results': {}}
+    for n, mode in enumerate(m.strip() for m in args.modes.split(',') if m.strip()):
+        port = args.port + n
+        proc = start_server(mode, port)
+        try:
+            report['results'][mode] = run_load(port, args.clients, args.duration)
+        finally:
+            proc.terminate()
+            proc.wait(timeout=10)
+        r = report['results'][mode]
+        print(f"{mode:9s} rps={r['rps']:8.1f}  p50={r['latency']['p50_ms']:7.2f}ms  "
+              f"p99={r['latency']['p99_ms']:8.2f}ms  ping p99={r['ping_under_load']['p99_ms']:7.2f}ms  errors={r['errors']}")
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
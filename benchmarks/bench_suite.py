@@ -0,0 +1,240 @@
+"""Benchmark end-to-end su dati AMOS sintetici: ingestione, refresh e latenza degli endpoint.
+
+Per ogni dimensione (numero di nodi) genera i log con gen_amos_logs.py (riusati se gia' presenti)
+e avvia un processo separato che importa backend/server.py con DW_DIR puntato ai dati sintetici:
+  - cold: prima ingestione completa (MB/s, file/s)
+  - warm: refresh senza modifiche (solo stat di DW)
+  - incremental: refresh dopo l'append di righe all'1% dei file
+  - peak RSS del processo
+  - latenza p50/p99 per endpoint (prima richiesta riportata a parte: costruzione cache)
+Il risultato e' JSON confrontabile tra esecuzioni (--compare base.json stampa i rapporti).
+
+Uso:
+    python benchmarks/bench_suite.py --sizes 1000,10000 --out bench_suite.json
+    python benchmarks/bench_suite.py --sizes 1000 --compare bench_suite.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import http.client
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_http import summarize  # noqa: E402
+import gen_amos_logs  # noqa: E402
+
+ENDPOINTS = [
+    '/api/stats/header',
+    '/api/charts/summary?n=5',
+    '/api/lga?limit=1000',
+    '/api/lga?severity=Major,Critical&limit=1000',
+    '/api/lge?limit=1000',
+    '/api/lgd?limit=1000',
+    '/api/lgd?typeReason=PartialOutage(System)&limit=1000',
+    '/api/lgd_metrics?limit=2000',
+    '/api/node/summary?node={node}',
+    '/api/search?q=%22link%20failure%22&limit=200',
+    '/api/bootstrap?limit=1000',
+]
+
+
+def _rss_peak_mb():
+    try:
+        import resource
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1)
+    except Exception:
+        return None
+
+
+def _append_lines(paths):
+    """Aggiunge un allarme in coda ai file; ritorna le dimensioni originali per il ripristino."""
+    sizes = {}
+    for p in paths:
+        sizes[p] = os.path.getsize(p)
+        with open(p, 'a', encoding='utf-8') as f:
+            f.write('2025-10-08;10:00:00;AL  ;Major ;ENodeBFunction=1;External Link Failure;benchmark append\n')
+    return sizes
+
+
+def _restore(sizes):
+    for p, size in sizes.items():
+        with open(p, 'r+b') as f:
+            f.truncate(size)
+
+
+def run_worker(dw_dir, requests):
+    """Misure in-process su una directory DW; ritorna il dict dei risultati."""
+    os.environ['DW_DIR'] = dw_dir
+    # storico e snapshot in una directory temporanea: i dati sintetici non finiscono nello
+    # storico reale (backend/history) e l'ingestione a freddo non paga l'archiviazione
+    scratch = tempfile.mkdtemp(prefix='dw_bench_')
+    os.environ['DW_HISTORY'] = '0'
+    os.environ['DW_HISTORY_DIR'] = os.path.join(scratch, 'history')
+    os.environ['DW_SNAPSHOT'] = os.path.join(scratch, 'dw.snapshot')
+    sys.path.insert(0, os.path.join(ROOT, 'backend'))
+    import server
+    from http.server import ThreadingHTTPServer
+
+    names = sorted(n for n in os.listdir(dw_dir) if n.lower().endswith('.log'))
+    total_bytes = sum(os.path.getsize(os.path.join(dw_dir, n)) for n in names)
+    res = {'files': len(names), 'bytes': total_bytes}
+
+    t0 = time.perf_counter()
+    server._refresh_dw(force=True)
+    cold = time.perf_counter() - t0
+    res['cold'] = {
+        'seconds': round(cold, 3),
+        'mb_per_s': round(total_bytes / 1e6 / cold, 2) if cold else 0.0,
+        'files_per_s': round(len(names) / cold, 1) if cold else 0.0,
+    }
+    res['rows'] = server.count_stats(refresh=False)
+    res['peak_rss_mb_after_ingest'] = _rss_peak_mb()
+
+    warm = []
+    for _ in range(5):
+        t0 = time.perf_counter()
+        server._refresh_dw(force=True)
+        warm.append(time.perf_counter() - t0)
+    res['warm_refresh'] = summarize(warm)
+
+    touched = [os.path.join(dw_dir, n) for n in names[::100]]
+    sizes = _append_lines(touched)
+    try:
+        t0 = time.perf_counter()
+        server._refresh_dw(force=True)
+        res['incremental_refresh'] = {'files': len(touched), 'ms': round((time.perf_counter() - t0) * 1000, 2)}
+    finally:
+        _restore(sizes)
+        server._refresh_dw(force=True)
+
+    server.APIHandler.log_message = lambda self, fmt, *args: None
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), server.APIHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    port = httpd.server_address[1]
+    node = os.path.splitext(names[len(names) // 2])[0] if names else ''
+    endpoints = {}
+    try:
+        for tpl in ENDPOINTS:
+            path = tpl.format(node=node)
+            lat = []
+            first = None
+            size = 0
+            for i in range(requests + 1):
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=600)
+                t0 = time.perf_counter()
+                conn.request('GET', path)
+                resp = conn.getresponse()
+                body = resp.read()
+                dt = time.perf_counter() - t0
+                conn.close()
+                if resp.status != 200:
+                    raise RuntimeError(f'{path}: HTTP {resp.status}')
+                if i == 0:
+                    first = dt
+                    size = len(body)
+                else:
+                    lat.append(dt)
+            entry = summarize(lat)
+            entry['first_ms'] = round(first * 1000, 2)
+            entry['bytes'] = size
+            endpoints[tpl] = entry
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+    res['endpoints'] = endpoints
+    res['peak_rss_mb'] = _rss_peak_mb()
+    shutil.rmtree(scratch, ignore_errors=True)
+    return res
+
+
+def ensure_dataset(data_dir, nodes, seed):
+    out = os.path.join(data_dir, f'dw_{nodes}_s{seed}')
+    marker = os.path.join(out, '.generated.json')
+    if os.path.isfile(marker):
+        return out
+    t0 = time.perf_counter()
+    files, size = gen_amos_logs.generate(out, nodes, seed)
+    with open(marker, 'w', encoding='utf-8') as f:
+        json.dump({'nodes': nodes, 'seed': seed, 'files': files, 'bytes': size,
+                   'seconds': round(time.perf_counter() - t0, 1)}, f)
+    return out
+
+
+def compare(base, current):
+    """Stampa i rapporti corrente/base delle metriche principali (per dimensione)."""
+    base_by_n = {r['nodes']: r for r in base.get('results', [])}
+    for r in current.get('results', []):
+        b = base_by_n.get(r['nodes'])
+        if not b:
+            continue
+        print(f"--- {r['nodes']} nodi (rapporto corrente/base, <1 = meglio per i tempi)")
+        def ratio(a, c):
+            return f'{(c / a):.2f}x' if a else 'n/a'
+        print(f"  cold seconds        {ratio(b['cold']['seconds'], r['cold']['seconds'])}")
+        print(f"  warm refresh p50    {ratio(b['warm_refresh']['p50_ms'], r['warm_refresh']['p50_ms'])}")
+        print(f"  incremental refresh {ratio(b['incremental_refresh']['ms'], r['incremental_refresh']['ms'])}")
+        print(f"  peak RSS            {ratio(b['peak_rss_mb'] or 0, r['peak_rss_mb'] or 0)}")
+        for ep, e in r['endpoints'].items():
+            be = b['endpoints'].get(ep)
+            if be:
+                print(f"  {ep[:48]:48s} p50 {ratio(be['p50_ms'], e['p50_ms'])}  p99 {ratio(be['p99_ms'], e['p99_ms'])}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--sizes', default='1000', help='numeri di nodi separati da virgola (es. 1000,10000,100000)')
+    ap.add_argument('--seed', type=int, default=7)
+    ap.add_argument('--requests', type=int, default=20, help='richieste misurate per endpoint')
+    ap.add_argument('--data-dir', default=os.path.join(ROOT, 'benchmarks', 'data'))
+    ap.add_argument('--out', default='')
+    ap.add_argument('--compare', default='', help='JSON di una esecuzione precedente')
+    ap.add_argument('--worker', default='', help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.requests)))
+        return
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'seed': args.seed,
+        'results': [],
+    }
+    for nodes in [int(x) for x in args.sizes.split(',') if x.strip()]:
+        dw_dir = ensure_dataset(args.data_dir, nodes, args.seed)
+        # processo separato: peak RSS e cache non contaminati dalle dimensioni precedenti
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', dw_dir,
+                               '--requests', str(args.requests)], cwd=ROOT, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f'worker {nodes} nodi fallito:\n{proc.stderr[-2000:]}')
+        res = json.loads(proc.stdout.strip().splitlines()[-1])
+        res['nodes'] = nodes
+        report['results'].append(res)
+        print(f"{nodes:7d} nodi  {res['bytes'] / 1e6:8.1f} MB  cold {res['cold']['seconds']:7.2f}s "
+              f"({res['cold']['mb_per_s']:.1f} MB/s, {res['cold']['files_per_s']:.0f} file/s)  "
+              f"warm {res['warm_refresh']['p50_ms']:.1f}ms  incr {res['incremental_refresh']['ms']:.1f}ms  "
+              f"RSS {res['peak_rss_mb']} MB", file=sys.stderr)
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(json.load(f), report)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text)
+    elif not args.compare:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
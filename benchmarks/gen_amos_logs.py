@@ -0,0 +1,277 @@
+"""Generatore deterministico di log AMOS/MoShell sintetici (stesso formato dei file in DW/).
+
+Ogni nodo produce un file <NODO>.log con banner, rumore MOM, sezioni hget delle celle,
+`lgdc` (tabella availability + riepilogo Period=30 days), `lgac` e `lgec`. Le distribuzioni
+imitano il batch reale: pochi titoli dominanti (Zipf), storm di allarmi Minor/Cleared su pochi
+nodi, outage parziali per cella e qualche nodo irraggiungibile ("Checking ip contact...Not OK").
+A parita' di --seed l'output e' identico byte per byte, indipendentemente dal numero di processi.
+
+Uso:
+    python benchmarks/gen_amos_logs.py --nodes 1000 --out /tmp/dw_1k [--seed 7] [--workers 8]
+"""
+import os
+import sys
+import random
+import argparse
+import datetime
+from multiprocessing import Pool
+
+BANNER = r"""                        __  __  ____   _____
+                  /\   |  \/  |/ __ \ / ____|
+                 /  \  | \  / | |  | | (___
+                / /\ \ | |\/| | |  | |\___ \
+               / ____ \| |  | | |__| |____) |
+              /_/    \_\_|  |_|\____/|_____/
+              OSS Framework for MoShell-25.0h
+  Copyright (c) Ericsson AB 2001-2025 - All Rights Reserved
+
+
+""" + ('\x1b[1;31mWARNING: \x1b[0mthe AMOS version currently running is more than 22 weeks old and is unsupported.\n'
+       'Please upgrade as soon as possible to the latest released version, available from your local Ericsson support.\n')
+
+SEP = '=' * 113
+# id di batch sintetico, distinto da quelli reali in DW (lo storico archivia per batch)
+BATCH_TS = '2025-10-08_10-30-32_00000'
+END_DATE = datetime.datetime(2025, 10, 8, 10, 30, 32)
+PERIOD_DAYS = 30
+
+# (titolo, oggetto, dettaglio, peso) — pesi Zipf-like come nel batch reale
+ALARM_TITLES = [
+    ('Inter Node Feature Incompatibility', 'ENodeBFunction=1', 'Incompatible feature configuration between eNodeBs. AI: {n}', 300),
+    ('Inter Node Carrier Aggregation Service Unavailable', 'EUtranCellFDD={cell}', 'CA partner unavailable. AI: {n}', 105),
+    ('Service Unavailable', 'EUtranCellFDD={cell}', 'Cell is not operational.', 51),
+    ('External Link Failure', 'ENodeBFunction=1', 'X2 link problem to one or several neighbouring eNodeBs. AI: PLMN ID-eNB ID 1 = 2221-{n}', 38),
+    ('External Alarm', 'EquipmentSupportFunction=1,AlarmPort={n}', 'Door open', 21),
+    ('Service Degraded', 'EUtranCellFDD={cell}', 'Reduced capacity.', 19),
+    ('No Connection', 'AntennaUnitGroup={n},AntennaNearUnit=RET_1800', 'Antenna near unit controller occupied.', 17),
+    ('PLMN Service Redundancy Lost', 'GNBCUCPFunction=1', 'One of the PLMN links is down.', 10),
+    ('PLMN Service Unavailable', 'GNBCUCPFunction=1', 'All PLMN links are down.', 5),
+    ('Sync PTP Time Reachability Fault', 'RadioEquipmentClockReference=1', 'PTP time source not reachable.', 4),
+    ('External Link to GNodeB Failure', 'ENodeBFunction=1', 'X2 link to gNodeB down. AI: {n}', 4),
+    ('Sync Frequency PDV Problem', 'RadioEquipmentClockReference=1', 'Packet delay variation too high.', 3),
+    ('Link Failure', 'FieldReplaceableUnit=RRU-{n},RfPort=A', 'Link degraded.', 2),
+    ('Temperature Exceptional Taken Out of Service', 'FieldReplaceableUnit=BB-1', 'Board temperature critical.', 1),
+    ('Resource Allocation Failure Service Degraded', 'EUtranCellFDD={cell}', 'Out of resources.', 1),
+]
+ALARM_SEVERITIES = [('Minor ', 48), ('Major ', 6), ('Critical', 1), ('Warning', 1)]
+
+ALERTS = [
+    ('Radio Interface Connectivity Disturbance Alert', 'RiLink=S{n}-1', 'Near end port:FieldReplaceableUnit=BB-1,RiPort=E (transportType=NOT_SET). SUPPRESSED', 72),
+    ('Cell Service Unavailable Auto Recovery Initiated Alert', 'EUtranCellFDD={cell}', '', 11),
+    ('Cell Service Available Auto Recovery Successful Alert', 'EUtranCellFDD={cell}', '', 8),
+    ('Radio Restart Alert', 'FieldReplaceableUnit=RRU-{n}', '', 7),
+    ('System Restart Alert', 'ManagedElement=1', '', 2),
+]
+
+OUTAGE_REASONS = [('PartialOutage(System)', 60), ('PartialOutage(Manual)', 29), ('PartialOutage(Transmission)', 10), ('SpontaneousCold(Other:PowerReset)', 3), ('ManualCold(1)', 1)]
+
+
+def _weighted(rng, items):
+    total = sum(w for *_, w in items)
+    x = rng.random() * total
+    for it in items:
+        x -= it[-1]
+        if x <= 0:
+            return it
+    return items[-1]
+
+
+def node_names(count):
+    """Nomi nodo stile DW (sito + suffisso RAT: T/E/L), 1-3 nodi per sito, deterministici."""
+    names = []
+    site = 0
+    rng = random.Random(count)
+    while len(names) < count:
+        base = _b36(site).rjust(4, '0')
+        prefix = 'CS' if site % 3 == 0 else ('RL' if site % 3 == 1 else 'SC')
+        code = prefix + base[-3:] if site < 36 ** 3 else prefix + base
+        for suffix in 'TEL'[:rng.choice((1, 2, 2, 3))]:
+            names.append(code + suffix)
+            if len(names) == count:
+                break
+        site += 1
+    return names
+
+
+def _b36(n):
+    digits = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    out = ''
+    while True:
+        n, r = divmod(n, 36)
+        out = digits[r] + out
+        if n == 0:
+            return out
+
+
+def _fmt_duration(sec):
+    if sec < 60:
+        return f'{sec}s'
+    h, rem = divmod(sec, 3600)
+    m, s = divmod(rem, 60)
+    return f'{sec}s ({h}h{m}m)' if h else f'{sec}s ({m}m{s}s)'
+
+
+def _ts(rng):
+    t = END_DATE - datetime.timedelta(seconds=rng.randrange(PERIOD_DAYS * 86400))
+    return t
+
+
+def generate_node(name, seed):
+    """Ritorna il testo completo del log del nodo (deterministico per (name, seed))."""
+    rng = random.Random(f'{seed}:{name}')
+    ip = f'19.31.{rng.randrange(256)}.{rng.randrange(1, 255)}'
+    pid = rng.randrange(1000000, 1400000)
+    out = [f'Logging to file /mta_fs/UserFiles/37258710/amosbatch/{BATCH_TS}/{name}.log\n', BANNER,
+           f'\n$amosrb_pid = {pid}\n\n']
+    if rng.random() < 0.01:
+        out.append(f'Checking ip contact...Not OK\nUnable to connect to {ip}:22\nCannot connect to MO service, exiting...\n')
+        out.append(f'Output has been logged to file /mta_fs/UserFiles/37258710/amosbatch/{BATCH_TS}/{name}.log\n')
+        return ''.join(out)
+    mom = f'MSRBS_NODE_MODEL_25.Q1_{rng.randrange(100000, 999999)}.224.73_bf81'
+    stamp = f'251007-12:30:{rng.randrange(10, 59)}+0200 {ip} 25.0h {mom} stopfile=/tmp/{pid}'
+    connected = f'Connected to {ip} (SubNetwork=BBMM_rckomc_R,MeContext={name},ManagedElement={name})\n'
+    out.append('Checking ip contact...OK\n\nHELP MENU            : h\nBASIC MO COMMANDS    : m\nOTHER MO COMMANDS    : n\n'
+               'OTHER COMMANDS       : o\nPM COMMANDS          : p\nQUIT                 : q\n\n')
+    out.append(f'{name}> lt all\n\n{stamp}\nLooking up temporary_amos account... OK.\n\n$ssh_pid = {pid + 1}\n\n')
+    out.append(connected)
+    out.append(f'\nChecking MOM version...{mom}\n')
+    out.append(f'Parsing MOM (cached): /ericsson/log/amos/moshell_logfiles/tempfiles/{mom}.xml.cache.gz ....\n')
+    out.append('Parsing file /opt/ericsson/amos/moshell/commonjars/pm/PARAM_MSRBSG2_25.Q1.txt ' + '.' * rng.randrange(40, 90) + 'Done.\n')
+    out.append(connected)
+    mos = rng.randrange(8000, 30000)
+    out.append(f'\nLast MO: {mos}. Loaded {mos} MOs. Total: {mos + 1} MOs.\n\n')
+
+    # celle
+    site = name[:-1]
+    cells = []
+    out.append(f'{name}> hget EUtranCellFDD ^cellid\n\n{stamp}\n\n{SEP}\nMO                   cellId\n{SEP}\n')
+    for band in range(rng.choice((1, 2, 3, 4))):
+        cell_id = rng.choice((21, 31, 41, 61, 161)) + band
+        cell = f'{site}{"ETL"[band % 3]}{band + 1}'
+        cells.append((cell, cell_id))
+        out.append(f'EUtranCellFDD={cell} {cell_id:<6}\n')
+    out.append(f'{SEP}\nTotal: {len(cells)} MOs\n\n')
+
+    # lgdc: availability log
+    out.append(f'{name}> lgdc -m 30d\n\n{stamp}\n\nStartdate=20250907.103032, Enddate=20251008.103032\n'
+               'Executing action LogM.exportAvailabilityLog()\n...\n'
+               f'{SEP}\nMO     actionId result      resultInfo\n{SEP}\nLogM=1 8962     1 (SUCCESS)           \n'
+               'Parsing availabilityLog.....Done.\n..\n'
+               'Date;Time;RestartType;SwVersion;SwRelease;RCSDowntime;ApplicationDowntime;TNDowntime;RATsDowntime;ExtraInfo;ExtraInfo2\n')
+    n_outages = int(rng.paretovariate(1.3) * 4) - 4 if rng.random() < 0.85 else 0
+    outages = []
+    counts = {'upgrade': 0, 'manual': 0, 'spont': 0, 'partial': 0}
+    down = {'upgrade': 0, 'manual': 0, 'spont': 0, 'partial': 0}
+    for _ in range(min(n_outages, 400)):
+        reason = _weighted(rng, OUTAGE_REASONS)[0]
+        ts = _ts(rng)
+        sec = int(rng.lognormvariate(2.5, 1.6)) + 1
+        if reason.startswith('PartialOutage'):
+            cell, cid = rng.choice(cells)
+            pct = rng.choice((100, 100, 100, 50, 33, 25, 11, 8))
+            line = f'{ts:%Y-%m-%d;%H:%M:%S};{reason};{pct}% Lrat Cell {cid}; ();{_fmt_duration(sec)};;;;;\n'
+            bucket = 'partial'
+        elif reason.startswith('Spontaneous'):
+            line = (f'{ts:%Y-%m-%d;%H:%M:%S};{reason};; ();{_fmt_duration(sec)};{_fmt_duration(sec + 190)};'
+                    f'{_fmt_duration(sec)};L={sec + 195}s ;Requested: RankCold Other PowerReset Performed: RankCold Other PowerReset;'
+                    'Lrat LRAT Traffic Control active\n')
+            bucket = 'spont'
+        else:
+            line = f'{ts:%Y-%m-%d;%H:%M:%S};{reason};CXP2010174/2_R27J08;CXP2010174/2_R27J08 (25.Q1);{_fmt_duration(sec)};;;;;\n'
+            bucket = 'manual'
+        counts[bucket] += 1
+        down[bucket] += sec
+        outages.append((ts, line))
+    outages.sort()
+    out.extend(line for _, line in outages)
+    uptime = rng.randrange(3600, 90 * 86400)
+    out.append(f'\nNode uptime since last restart: {uptime} seconds\n')
+    out.append('-' * 102 + '\nPeriod=30 days       NodeUpgrade      NodeManual       NodeSpontaneous  AllNodeRestarts  PartialOutages  \n'
+               + '-' * 102 + '\n')
+    all_n = counts['upgrade'] + counts['manual'] + counts['spont']
+    all_d = down['upgrade'] + down['manual'] + down['spont']
+    cols_n = [counts['upgrade'], counts['manual'], counts['spont'], all_n, counts['partial']]
+    cols_d = [down['upgrade'], down['manual'], down['spont'], all_d, down['partial']]
+    def row(label, values):
+        return f'{label:<21}' + ''.join(f'{v:<17}' for v in values) + '\n'
+    out.append(row('Number Of outages', cols_n))
+    out.append(row('Total downtime', [_fmt_duration(d) if d else '0s' for d in cols_d]))
+    out.append(row('Downtime per day', [_fmt_duration(d // PERIOD_DAYS) if d else '0s' for d in cols_d]))
+    out.append(row('Downtime per outage', [_fmt_duration(d // n) if n else '0s' for d, n in zip(cols_d, cols_n)]))
+
+    # lgac: allarmi, con storm su una minoranza di nodi (coda pesante)
+    out.append(f'\n{name}> lgac -m 30d\n\n{stamp}\n\nStartdate=20250907.103042, Enddate=20251008.103042\n'
+               'Date;Time;Log;Severity;Object;Event;Cause;AdditionalText;AckState;Id;NotificationId;CorrelatedAlarms\n'
+               f'Executing action Log.export()\n..\nLog=AlarmLog                    actionId=8963\n......\n{SEP}\n'
+               f'MO                  actionId result      resultInfo\n{SEP}\nLogM=1,Log=AlarmLog 8963     1 (SUCCESS)           \n')
+    n_raise = int(rng.paretovariate(1.1) * 40) - 30
+    if rng.random() < 0.03:
+        n_raise *= rng.randrange(10, 40)   # storm
+    alarms = []
+    for _ in range(max(1, min(n_raise, 6000))):
+        title, obj, detail, _w = _weighted(rng, ALARM_TITLES)
+        cell = rng.choice(cells)[0]
+        n = rng.randrange(1, 999999)
+        obj = obj.format(cell=cell, n=rng.randrange(1, 64))
+        detail = detail.format(n=n)
+        sev = _weighted(rng, ALARM_SEVERITIES)[0]
+        ts = _ts(rng)
+        alarms.append((ts, f'{ts:%Y-%m-%d;%H:%M:%S};AL  ;{sev};{obj};{title};{detail}\n'))
+        if rng.random() < 0.9:
+            tc = ts + datetime.timedelta(seconds=int(rng.expovariate(1 / 900.0)) + 1)
+            alarms.append((tc, f'{tc:%Y-%m-%d;%H:%M:%S};AL  ;Cleared;{obj};{title};{detail}\n'))
+    alarms.sort(key=lambda a: a[0])
+    out.extend(line for _, line in alarms)
+
+    # lgec: alert
+    out.append(f'\n{name}> lgec -m 30d\n\n{stamp}\n\nStartdate=20250907.103050, Enddate=20251008.103050\n'
+               'Date;Time;Log;Severity;Object;Event;Cause;AdditionalText;AckState;Id;NotificationId;CorrelatedAlarms\n'
+               f'Executing action Log.export()\n..\nLog=AlertLog                    actionId=8964\n...\n{SEP}\n'
+               f'MO                  actionId result      resultInfo\n{SEP}\nLogM=1,Log=AlertLog 8964     1 (SUCCESS)           \n')
+    alerts = []
+    for _ in range(max(0, int(rng.paretovariate(1.2) * 12) - 10)):
+        title, obj, detail, _w = _weighted(rng, ALERTS)
+        obj = obj.format(cell=rng.choice(cells)[0], n=rng.randrange(1, 300))
+        ts = _ts(rng)
+        alerts.append((ts, f'{ts:%Y-%m-%d;%H:%M:%S};EV  ;Warning;{obj};{title};{detail}\n'))
+    alerts.sort(key=lambda a: a[0])
+    out.extend(line for _, line in alerts)
+    out.append(f'\nBye...\nOutput has been logged to file /mta_fs/UserFiles/37258710/amosbatch/{BATCH_TS}/{name}.log\n')
+    return ''.join(out)
+
+
+def _write_node(args):
+    out_dir, name, seed = args
+    text = generate_node(name, seed)
+    data = text.encode('utf-8')
+    with open(os.path.join(out_dir, name + '.log'), 'wb') as f:
+        f.write(data)
+    return len(data)
+
+
+def generate(out_dir, nodes, seed=7, workers=None):
+    """Genera `nodes` file in out_dir. Ritorna (numero file, byte totali)."""
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = [(out_dir, name, seed) for name in node_names(nodes)]
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or nodes < 200:
+        sizes = [_write_node(j) for j in jobs]
+    else:
+        with Pool(workers) as pool:
+            sizes = pool.map(_write_node, jobs, chunksize=64)
+    return len(sizes), sum(sizes)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--nodes', type=int, default=1000)
+    ap.add_argument('--out', required=True)
+    ap.add_argument('--seed', type=int, default=7)
+    ap.add_argument('--workers', type=int, default=0)
+    args = ap.parse_args()
+    files, size = generate(args.out, args.nodes, args.seed, args.workers or None)
+    print(f'{files} file, {size / 1e6:.1f} MB in {args.out}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
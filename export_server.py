@@ -234,10 +234,42 @@ class Handler(http.server.BaseHTTPRequestHandler):
         self._set_headers(404)
         self.wfile.write(json.dumps({'error': 'Not Found'}).encode('utf-8'))
 
+def aio_routes():
+    """Route native per la modalita' asyncio: download a blocchi senza occupare thread."""
+    import aio_server
+
+    async def download(req, writer, keep_alive):
+        qs = parse_qs(urlparse(req.target).query)
+        job_id = (qs.get('id') or [''])[0]
+        with jobs_lock:
+            info = jobs.get(job_id)
+        if not info or info.get('status') != 'done' or not info.get('file_path') or not os.path.isfile(info['file_path']):
+            await aio_server.send_json(writer, 404, {'error': 'File non pronto'}, keep_alive)
+            return keep_alive
+        fp = info['file_path']
+        await aio_server.send_file(writer, fp, [
+            ('Content-Type', 'application/zip'),
+            ('Access-Control-Allow-Origin', ALLOWED_ORIGIN),
+            ('Content-Disposition', f'attachment; filename="{os.path.basename(fp)}"'),
+            ('Cache-Control', 'no-cache'),
+        ], keep_alive)
+        return keep_alive
+
+    return {'/export/download': download}
+
+
 if __name__ == '__main__':
     import sys
-    if len(sys.argv) >= 2:
-        PORT = int(sys.argv[1])
+    args = [a for a in sys.argv[1:] if a != '--aio']
+    if args:
+        PORT = int(args[0])
+    # Modalita' asyncio HTTP/1.1 keep-alive (stessa implementazione del backend)
+    if '--aio' in sys.argv:
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+        import aio_server
+        print(f'Export server running on http://127.0.0.1:{PORT} (asyncio, HTTP/1.1 keep-alive)')
+        aio_server.serve(Handler, '', PORT, routes=aio_routes())
+        sys.exit(0)
     with socketserver.ThreadingTCPServer(('', PORT), Handler) as httpd:
         print(f'Export server running on http://127.0.0.1:{PORT}')
         try: